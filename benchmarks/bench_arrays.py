@@ -0,0 +1,96 @@
+"""Cost of the large double lists of Geppetto models.
+
+A model with a single ``TimeSeries`` of N samples is built, saved as XMI and
+loaded again, with the values stored in PyEcore lists, in
+``model.arrays.DoubleArray`` and in ``DoubleArray`` saved with the
+``GeppettoXMIOptions.PACKED_ARRAYS`` option. The samples are given as a
+NumPy array, the memory column is the memory allocated to build the model
+from it (measured with ``tracemalloc``).
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_arrays
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.arrays import enable_arrays, disable_arrays
+from model.xmi import GeppettoXMIResource, GeppettoXMIOptions
+
+STORAGES = ['list', 'array', 'packed']
+
+
+def new_rset():
+    rset = ResourceSet()
+    pygeppetto.register(rset)
+    rset.resource_factory['xmi'] = GeppettoXMIResource
+    return rset
+
+
+def build(samples):
+    root = pygeppetto.GeppettoModel()
+    variable = pygeppetto.Variable()
+    variable.id = 'trace'
+    root.variables.append(variable)
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.value = pygeppetto.TimeSeries()
+    variable.initialValues.append(initial_value)
+    initial_value.value.value = samples
+    return root
+
+
+def measure(storage, samples, directory):
+    if storage == 'list':
+        disable_arrays()
+    else:
+        enable_arrays()
+    options = {GeppettoXMIOptions.PACKED_ARRAYS: storage == 'packed'}
+    path = os.path.join(directory, storage + '.xmi')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    root = build(samples.tolist() if storage == 'list' else samples)
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    resource = new_rset().create_resource(URI(path))
+    resource.append(root)
+    start = time.perf_counter()
+    resource.save(options=options)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_rset().get_resource(URI(path))
+    load_time = time.perf_counter() - start
+    return build_time, memory, save_time, os.path.getsize(path), load_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--samples', type=int, default=1000000)
+    args = parser.parse_args()
+
+    samples = numpy.random.RandomState(0).normal(size=args.samples)
+    line = '{:<8} {:>9} {:>10} {:>9} {:>10} {:>9}'
+    print(line.format('storage', 'build ms', 'memory MB', 'save ms',
+                      'size MB', 'load ms'))
+    with tempfile.TemporaryDirectory() as directory:
+        for storage in STORAGES:
+            build_time, memory, save_time, size, load_time = \
+                measure(storage, samples, directory)
+            print(line.format(storage, '{:.1f}'.format(build_time * 1000),
+                              '{:.1f}'.format(memory / 2 ** 20),
+                              '{:.1f}'.format(save_time * 1000),
+                              '{:.1f}'.format(size / 2 ** 20),
+                              '{:.1f}'.format(load_time * 1000)))
+    disable_arrays()
+
+
+if __name__ == '__main__':
+    main()
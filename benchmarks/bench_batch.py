@@ -0,0 +1,57 @@
+"""Scaling of the parallel loading of many XMI files.
+
+Copies of ``BigCA1.net.nml.xmi`` are loaded one after the other in the same
+process, then with ``model.batch.load_files()`` and an increasing number of
+worker processes (from 2 up to the number of CPUs).
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_batch --files 16
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pyecore.resources import URI
+from model.batch import load_files, new_resource_set
+
+MODEL = 'tests/xmi-data/BigCA1.net.nml.xmi'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.files):
+            paths.append(os.path.join(directory, 'model{}.xmi'.format(i)))
+            shutil.copyfile(MODEL, paths[-1])
+
+        start = time.perf_counter()
+        rset = new_resource_set()
+        for path in paths:
+            rset.get_resource(URI(path))
+        sequential = time.perf_counter() - start
+        line = '{:<12} {:>9} {:>8}'
+        print(line.format('processes', 'time s', 'speedup'))
+        print(line.format('sequential', '{:.2f}'.format(sequential), '1.00'))
+
+        cpus = os.cpu_count() or 1
+        processes = 2
+        while True:
+            start = time.perf_counter()
+            results = load_files(paths, processes=processes)
+            elapsed = time.perf_counter() - start
+            assert all(x.error is None for x in results)
+            print(line.format(processes, '{:.2f}'.format(elapsed),
+                              '{:.2f}'.format(sequential / elapsed)))
+            if processes >= cpus:
+                break
+            processes = min(2 * processes, cpus)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Copies of a loaded model with ``model.clone``.
+
+A model is loaded from its XMI file, a variable instance of its last type is
+added (as Geppetto does), then the model is copied:
+
+* through a binary snapshot (``model.snapshot``, encoded then decoded), the
+  fastest generic copy of the package (``copy.deepcopy`` does not work on
+  the PyEcore objects),
+* with ``clone()``,
+* with a copy-on-write ``Fork``, then by the edit of the first type of its
+  library (with the types that refer to it).
+
+The time of each copy is reported, or the memory it allocates
+(``tracemalloc``, which slows the copies down) with ``--memory``.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_clone --model BigCA1 [--memory]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.clone import clone, Fork
+from model.snapshot import encode_snapshot, decode_snapshot
+
+
+def load(name):
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.get_resource(URI('tests/xmi-data/{}.net.nml.xmi'
+                                      .format(name)))
+    root = resource.contents[0]
+    network = pygeppetto.Variable()
+    network.id = 'network'
+    network.types.append(root.libraries[0].types[-1])
+    root.variables.append(network)
+    return resource
+
+
+def measured(function, memory=False):
+    """Gives the result of function and the time it took (ms), or the memory
+    it allocated (MB).
+    """
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    measure = 1000 * (time.perf_counter() - start)
+    if memory:
+        measure = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        tracemalloc.stop()
+    return result, measure
+
+
+def snapshot_copy(resource):
+    copy = resource.resource_set.create_resource(URI('copy.snapshot'))
+    decode_snapshot(copy, encode_snapshot(resource))
+    return copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default='BigCA1')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure the memory instead of the time')
+    args = parser.parse_args()
+
+    resource = load(args.model)
+    root = resource.contents[0]
+    edited = root.libraries[0].types[0]
+
+    line = '{:<20} {:>10.2f}'
+    print('{:<20} {:>10}'.format('copy', 'MB' if args.memory else 'ms'))
+    results = []
+    for name, function in [
+            ('snapshot', lambda: snapshot_copy(resource)),
+            ('clone', lambda: clone(root)),
+            ('fork', lambda: Fork(root))]:
+        result, measure = measured(function, args.memory)
+        results.append(result)
+        print(line.format(name, measure))
+    fork = results[-1]
+    _, measure = measured(lambda: fork.edit(edited), args.memory)
+    print(line.format('fork edit', measure))
+    print('{} of {} types copied in the fork'.format(
+        len(fork.model.libraries[0].types), len(root.libraries[0].types)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Connectivity queries on a connection heavy model.
+
+A synthetic network (``benchmarks.generators.connections``) is queried with
+``model.connectivity.ConnectivityGraph`` and by walking the model for each
+query, as the clients used to do: the fan-out of endpoints, the in degree
+histogram and the 2 hops neighbourhood of an endpoint. The cost of the
+graph construction (walking the model and compiling the arrays) and of the
+incremental updates (adding and removing connections) is measured as well.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_connectivity --scale 10
+"""
+import argparse
+import time
+from collections import Counter
+from itertools import chain
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.connectivity import ConnectivityGraph
+from model.values import Connectivity
+from .generators import connections, new_pointer, new_variable, initial_value
+
+
+def model_connections(root):
+    return [x for x in chain([root], root.eAllContents())
+            if isinstance(x, pygeppetto.Connection)]
+
+
+def walk_fan_out(root, path):
+    return [x for x in model_connections(root)
+            if x.a.getInstancePath() == path]
+
+
+def walk_histogram(root):
+    degrees = Counter(x.b.getInstancePath() for x in model_connections(root))
+    return Counter(degrees.values())
+
+
+def walk_neighbourhood(root, path, hops):
+    arcs = {}
+    for connection in model_connections(root):
+        a, b = connection.a.getInstancePath(), connection.b.getInstancePath()
+        arcs.setdefault(a, set()).add(b)
+    reached, frontier = {path}, {path}
+    for _ in range(hops):
+        frontier = {y for x in frontier for y in arcs.get(x, ())} - reached
+        reached |= frontier
+    return reached - {path}
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return 1000 * (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', type=float, default=5)
+    args = parser.parse_args()
+
+    root = connections(args.scale)
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.create_resource(URI('connections.xmi'))
+    resource.append(root)
+    graph = ConnectivityGraph.of(resource)
+    build = timed(lambda: len(graph))
+    compile_time = timed(graph.csr)
+    print('{} connections, {} endpoints'.format(len(graph.connections),
+                                                len(graph)))
+    print('build {:.1f} ms, compile {:.1f} ms'.format(build, compile_time))
+
+    path = graph.path(0)
+    line = '{:<24} {:>12} {:>12}'
+    print(line.format('query', 'walk ms', 'graph ms'))
+    for name, walk, query, repeat in [
+            ('fan-out', lambda: walk_fan_out(root, path),
+             lambda: graph.fan_out(path), 1000),
+            ('in degree histogram', lambda: walk_histogram(root),
+             lambda: graph.degree_histogram('in'), 100),
+            ('2 hops neighbourhood', lambda: walk_neighbourhood(root, path, 2),
+             lambda: graph.neighbourhood(path, 2), 100)]:
+        print(line.format(name, '{:.2f}'.format(timed(walk)),
+                          '{:.3f}'.format(timed(query, repeat))))
+
+    network = root.libraries[0].types[-1]
+    projection = root.libraries[0].types[-2]
+    population = network.variables[0]
+    connection_type = root.libraries[1].types[-1]
+    added = []
+
+    def add():
+        connection = pygeppetto.Connection()
+        connection.connectivity = Connectivity.DIRECTIONAL
+        connection.a = new_pointer(population, population.types[0].arrayType,
+                                   len(added))
+        connection.b = new_pointer(population, population.types[0].arrayType,
+                                   0)
+        variable = new_variable('added{}'.format(len(added)),
+                                connection_type)
+        initial_value(variable, connection_type, connection)
+        projection.variables.append(variable)
+        added.append(variable)
+        graph.fan_out(connection.a)
+
+    print('add + fan-out {:.3f} ms'.format(timed(add, 1000)))
+    print('remove + fan-out {:.3f} ms'.format(timed(
+        lambda: (projection.variables.remove(added.pop()),
+                 graph.fan_out(path)), 1000)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Fetching variables from a data source with ``model.fetch.Fetcher``.
+
+A local HTTP server stands in for the data source, it answers each request
+after a latency (the round trip to a remote service). The benchmark fetches
+the same ids one request per id on a new connection, as a client without
+the fetch layer would do, then with the fetcher (batched requests on pooled
+connections), and again from its cache.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_fetch --ids 200
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.datasources import SimpleQuery
+from model.fetch import Fetcher
+from model.json import dumps, loads
+
+
+def data_model(url):
+    root = pygeppetto.GeppettoModel()
+    library = pygeppetto.GeppettoLibrary()
+    library.id = 'fetched'
+    root.libraries.append(library)
+    source = pygeppetto.DataSource()
+    source.id = 'source'
+    source.url = url
+    source.targetLibrary = library
+    query = SimpleQuery()
+    query.id = 'fetch'
+    query.query = 'fetch'
+    source.fetchVariableQuery = query
+    root.dataSources.append(source)
+    rset = pygeppetto.register(ResourceSet())
+    rset.create_resource(URI('model.xmi')).append(root)
+    return root
+
+
+def serve(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(
+                int(self.headers['Content-Length'])))
+            time.sleep(latency)
+            types = []
+            for identifier in body['ids']:
+                composite = pygeppetto.CompositeType()
+                composite.id = identifier
+                types.append(composite)
+            payload = dumps(*types).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def naive(source, ids):
+    host, port = source.url.split('/')[2].split(':')
+    for identifier in ids:
+        connection = HTTPConnection(host, int(port))
+        connection.request('POST', '/', json.dumps(
+            {'query': 'fetch', 'ids': [identifier], 'parameters': {}}))
+        response = connection.getresponse()
+        loads(response.read().decode('utf-8'))
+        connection.close()
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return 1000 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ids', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    server = serve(args.latency)
+    url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    source = data_model(url).dataSources[0]
+    ids = ['type{}'.format(i) for i in range(args.ids)]
+    fetcher = Fetcher(batch_size=args.batch_size)
+
+    async def fetch():
+        await fetcher.fetch_many(source, ids)
+
+    print('{} ids, {:.0f} ms latency'.format(args.ids, 1000 * args.latency))
+    print('{:<24} {:>10}'.format('fetch', 'ms'))
+    print('{:<24} {:>10.1f}'.format('one request per id',
+                                    timed(lambda: naive(source, ids))))
+    print('{:<24} {:>10.1f}'.format('batched and pooled',
+                                    timed(lambda: asyncio.run(fetch()))))
+    print('{:<24} {:>10.1f}'.format('cached',
+                                    timed(lambda: asyncio.run(fetch()))))
+    print('{} requests'.format(fetcher.requests))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
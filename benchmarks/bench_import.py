@@ -0,0 +1,54 @@
+"""Import time of the ``model`` package.
+
+The package is imported in a fresh interpreter, with and without the lazy
+import (``PYGEPPETTO_LAZY_IMPORT``), and the time to the import and to the
+first use of the API (creating a ``GeppettoModel``) are measured in the
+interpreter. The medians of the runs are reported.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_import
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import model
+imported = time.perf_counter()
+model.GeppettoModel()
+used = time.perf_counter()
+print(json.dumps([imported - start, used - start]))
+'''
+MODES = ['eager', 'lazy']
+
+
+def measure(mode):
+    environment = dict(os.environ)
+    environment['PYGEPPETTO_LAZY_IMPORT'] = '1' if mode == 'lazy' else '0'
+    output = subprocess.check_output([sys.executable, '-c', CHILD],
+                                     env=environment)
+    return json.loads(output.decode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args()
+
+    line = '{:<6} {:>10} {:>12}'
+    print(line.format('mode', 'import ms', 'first use ms'))
+    for mode in MODES:
+        runs = [measure(mode) for _ in range(args.repeat)]
+        print(line.format(
+            mode, '{:.1f}'.format(1000 * statistics.median(x[0] for x in runs)),
+            '{:.1f}'.format(1000 * statistics.median(x[1] for x in runs))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""JSON export of the Geppetto models compared with XMI.
+
+For each bundled XMI file, the loaded model is written and read again as XMI
+(``model.xmi.GeppettoXMIResource``) and as JSON (``model.json``). The
+``reflective`` format is the JSON built by walking the model with
+``eAllStructuralFeatures()`` and ``getattr`` (the references as URI
+fragments), as the clients used to do, it is only written. The times are the
+best of several runs.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.json import GeppettoJSONResource
+from model.xmi import GeppettoXMIResource
+
+FILES = ['tests/xmi-data/MediumNet.net.nml.xmi',
+         'tests/xmi-data/BigCA1.net.nml.xmi']
+FORMATS = ['xmi', 'json', 'reflective']
+
+
+def new_rset():
+    rset = ResourceSet()
+    pygeppetto.register(rset)
+    rset.resource_factory['xmi'] = GeppettoXMIResource
+    rset.resource_factory['json'] = GeppettoJSONResource
+    return rset
+
+
+def as_dict(obj):
+    data = {'eClass': obj.eClass.name}
+    for feature in obj.eClass.eAllStructuralFeatures():
+        if feature.derived or feature.transient or not obj.eIsSet(feature):
+            continue
+        value = getattr(obj, feature.name)
+        values = value if feature.many else [value]
+        if feature.is_attribute:
+            values = [x if x is None or isinstance(x, (str, int, float))
+                      else str(x) for x in values]
+        elif feature.containment:
+            values = [as_dict(x) for x in values if x is not None]
+        elif feature.eOpposite and feature.eOpposite.containment:
+            continue
+        else:
+            values = [x.eURIFragment() for x in values if x is not None]
+        data[feature.name] = values if feature.many else \
+            (values[0] if values else None)
+    return data
+
+
+def save(resource, fmt, path):
+    if fmt == 'xmi':
+        resource.save(output=URI(path))
+    elif fmt == 'json':
+        GeppettoJSONResource.save(resource, output=URI(path))
+    else:
+        with open(path, 'w') as f:
+            json.dump([as_dict(x) for x in resource.contents], f)
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    line = '{:<24} {:<10} {:>9} {:>9} {:>9}'
+    print(line.format('file', 'format', 'save ms', 'size MB', 'load ms'))
+    with tempfile.TemporaryDirectory() as directory:
+        for filename in FILES:
+            resource = new_rset().get_resource(URI(filename))
+            name = os.path.basename(filename)
+            for fmt in FORMATS:
+                path = os.path.join(directory, 'model.' + fmt)
+                save_time = best(lambda: save(resource, fmt, path),
+                                 args.repeat)
+                load_time = '-'
+                if fmt != 'reflective':
+                    load_time = '{:.1f}'.format(1000 * best(
+                        lambda: new_rset().get_resource(URI(path)),
+                        args.repeat))
+                print(line.format(name, fmt,
+                                  '{:.1f}'.format(save_time * 1000),
+                                  '{:.2f}'.format(os.path.getsize(path)
+                                                  / 2 ** 20),
+                                  load_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Memory used by the Geppetto values, with and without ``model.compact``.
+
+For each bundled XMI file, the size of the objects of
+``model.compact.COMPACT_CLASSES`` (the object, its dict and everything it is
+the only one to refer to: values, ``EValue``, lists and sets, strings...) is
+measured before and after ``compact()``, and divided by the number of
+objects. The total memory allocated for the model (``tracemalloc``) is
+measured as well, for the model loaded normally, the model compacted after
+the load, the model loaded with ``enable_compact()`` then compacted, and the
+model with its strings interned (``model.canonical``).
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_memory
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from itertools import chain
+from pyecore.ecore import EObject
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.canonical import canonicalize
+from model.compact import COMPACT_CLASSES, CompactValue, compact, \
+                          enable_compact, disable_compact
+
+FILES = ['tests/xmi-data/MediumNet.net.nml.xmi',
+         'tests/xmi-data/BigCA1.net.nml.xmi']
+
+
+def load(filename):
+    rset = pygeppetto.register(ResourceSet())
+    return rset.get_resource(URI(filename))
+
+
+def values_of(resource):
+    return [x for root in resource.contents
+            for x in chain([root], root.eAllContents())
+            if isinstance(x, COMPACT_CLASSES)]
+
+
+def owned_size(value, seen):
+    # the other model objects and the classes (features...) are not counted
+    if value is None or id(value) in seen or \
+            isinstance(value, (EObject, type)):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(owned_size(x, seen) for x in value)
+    elif isinstance(value, dict):
+        size += sum(owned_size(k, seen) + owned_size(v, seen)
+                    for k, v in value.items())
+    elif isinstance(value, CompactValue):
+        size += owned_size(value._value, seen)
+    elif hasattr(value, '__dict__'):
+        size += owned_size(value.__dict__, seen)
+    return size
+
+
+def bytes_per_object(objects):
+    seen = set()
+    total = sum(sys.getsizeof(x) + owned_size(x.__dict__, seen)
+                for x in objects)
+    return total / len(objects)
+
+
+def traced(function):
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def load_then_compact(filename):
+    resource = load(filename)
+    compact(resource)
+    return resource
+
+
+def load_compact(filename):
+    enable_compact()
+    try:
+        resource = load(filename)
+    finally:
+        disable_compact()
+    compact(resource)
+    return resource
+
+
+def load_canonical(filename):
+    resource = load(filename)
+    canonicalize(resource)
+    return resource
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.parse_args()
+
+    line = '{:<24} {:>8} {:>9} {:>9} {:>6} {:>9}'
+    print(line.format('file', 'objects', 'B/object', 'compact', 'ratio',
+                      'ms'))
+    totals = []
+    for filename in FILES:
+        name = os.path.basename(filename)
+        resource = load(filename)
+        objects = values_of(resource)
+        before = bytes_per_object(objects)
+        start = time.perf_counter()
+        compact(resource)
+        duration = time.perf_counter() - start
+        after = bytes_per_object(objects)
+        print(line.format(name, len(objects), '{:.0f}'.format(before),
+                          '{:.0f}'.format(after),
+                          '{:.2f}'.format(before / after),
+                          '{:.1f}'.format(1000 * duration)))
+        del resource, objects
+
+        sizes = []
+        for build in (load, load_then_compact, load_compact,
+                      load_canonical):
+            result, size = traced(lambda: build(filename))
+            sizes.append(size)
+            del result
+        totals.append((name, sizes))
+
+    print()
+    line = '{:<24} {:>9} {:>9} {:>9} {:>9}'
+    print(line.format('file (MB)', 'loaded', 'compact', 'enabled',
+                      'interned'))
+    for name, sizes in totals:
+        print(line.format(name, *('{:.2f}'.format(x / 2 ** 20)
+                                  for x in sizes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Query execution with ``model.queries.QueryEngine``.
+
+The data source is simulated in process: each query waits for a latency
+(the round trip to the data source) and produces its rows with a cost per
+row. The benchmark measures:
+
+* the runnable queries run one after the other and concurrently
+  (``run_queries()``),
+* the time to the first row of a query chain, when the steps are pipelined
+  and when each step waits for all the rows of the previous one,
+* the count of a query with its ``countQuery`` and by producing the rows.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_queries
+"""
+import argparse
+import asyncio
+import time
+from model.datasources import SimpleQuery, CompoundQuery, DataSource, \
+                              BooleanOperator
+from model.queries import QueryBackend, QueryEngine
+
+
+class SimulatedBackend(QueryBackend):
+    def __init__(self, latency, rows, row_cost):
+        self.latency = latency
+        self.rows = rows
+        self.row_cost = row_cost
+
+    def execute(self, query, variable, rows):
+        time.sleep(self.latency)
+        for row in rows if rows is not None else [{'ID': 0}]:
+            for i in range(self.rows):
+                time.sleep(self.row_cost)
+                yield {'ID': '{}.{}'.format(row['ID'], i)}
+
+    def count(self, query, variable, rows):
+        time.sleep(self.latency)
+        return self.rows
+
+
+def new_query(identifier, source):
+    query = SimpleQuery()
+    query.id = identifier
+    query.query = identifier
+    query.countQuery = identifier
+    query.runForCount = True
+    source.queries.append(query)
+    return query
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return 1000 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--queries', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=20)
+    args = parser.parse_args()
+
+    backend = SimulatedBackend(args.latency, args.rows, args.latency / 100)
+    engine = QueryEngine(backends={None: backend})
+    source = DataSource()
+    runnables = [(new_query('query{}'.format(i), source), None,
+                  BooleanOperator.OR) for i in range(args.queries)]
+    line = '{:<32} {:>10}'
+    print(line.format('{} runnable queries'.format(args.queries), 'ms'))
+    print(line.format('sequential', '{:.1f}'.format(timed(
+        lambda: [list(engine.execute(q, v)) for q, v, _ in runnables]))))
+    print(line.format('concurrent', '{:.1f}'.format(timed(
+        lambda: asyncio.run(engine.run_queries(runnables))))))
+
+    chain = CompoundQuery()
+    chain.id = 'chain'
+    chain.queryChain.extend(new_query('step{}'.format(i), source)
+                            for i in range(3))
+    source.queries.append(chain)
+
+    def materialized():
+        rows = None
+        for step in chain.queryChain:
+            rows = list(engine.execute(step, None, rows))
+        return rows[0]
+
+    print(line.format('first row of a 3 steps chain', 'ms'))
+    print(line.format('pipelined', '{:.1f}'.format(timed(
+        lambda: next(engine.execute(chain))))))
+    print(line.format('step by step', '{:.1f}'.format(timed(materialized))))
+
+    query = runnables[0][0]
+    print(line.format('count', 'ms'))
+    print(line.format('countQuery', '{:.1f}'.format(timed(
+        lambda: engine.count(query)))))
+    print(line.format('rows', '{:.1f}'.format(timed(
+        lambda: sum(1 for _ in engine.execute(query))))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Recording of simulation samples in an ``ExperimentState``.
+
+An experiment state records V variables, the simulation gives S samples of
+all of them. The benchmark compares:
+
+* ``objects``: a ``VariableValue`` (pointer and ``Quantity``) per sample
+  and variable, the way the samples used to be streamed,
+* ``lists``: each value appended to the ``TimeSeries`` of its variable,
+* ``recorder``: ``model.recording.Recorder.append()`` per sample,
+* ``recorder block``: ``Recorder.extend()`` per block of 1000 samples,
+
+then the reads of the recorder: a UI poll (the last tenth of the run,
+downsampled to 1000 points, for every variable) and the materialization of
+the time series of all the variables.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_recording --variables 50 --samples 2000
+"""
+import argparse
+import time
+import numpy
+import model as pygeppetto
+from model.recording import Recorder
+
+BLOCK = 1000
+
+
+def experiment_state(variables):
+    state = pygeppetto.ExperimentState()
+    for i in range(variables):
+        variable = pygeppetto.Variable()
+        variable.id = 'v{}'.format(i)
+        element = pygeppetto.PointerElement()
+        element.variable = variable
+        variable_value = pygeppetto.VariableValue()
+        variable_value.pointer = pygeppetto.Pointer()
+        variable_value.pointer.elements.append(element)
+        variable_value.value = pygeppetto.TimeSeries()
+        state.recordedVariables.append(variable_value)
+    return state
+
+
+def record_objects(state, times, values):
+    recorded = list(state.recordedVariables)
+    samples = []
+    for row in values:
+        for variable_value, value in zip(recorded, row.tolist()):
+            sample = pygeppetto.VariableValue()
+            sample.pointer = pygeppetto.Pointer()
+            sample.pointer.path = variable_value.pointer.getInstancePath()
+            sample.value = pygeppetto.Quantity()
+            sample.value.value = value
+            samples.append(sample)
+    return samples
+
+
+def record_lists(state, times, values):
+    series = [x.value.value for x in state.recordedVariables]
+    for row in values:
+        for samples, value in zip(series, row.tolist()):
+            samples.append(value)
+
+
+def record_samples(state, times, values):
+    recorder = Recorder(state)
+    for time_, row in zip(times.tolist(), values):
+        recorder.append(time_, row)
+    return recorder
+
+
+def record_blocks(state, times, values):
+    recorder = Recorder(state)
+    for start in range(0, len(times), BLOCK):
+        recorder.extend(times[start:start + BLOCK],
+                        values[start:start + BLOCK])
+    return recorder
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, 1000 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--variables', type=int, default=50)
+    parser.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args()
+
+    times = numpy.arange(args.samples) * 0.025
+    rng = numpy.random.default_rng(0)
+    values = rng.normal(-65, 5, (args.samples, args.variables))
+    print('{} variables, {} samples'.format(args.variables, args.samples))
+    line = '{:<20} {:>10.1f}'
+    print('{:<20} {:>10}'.format('recording', 'ms'))
+    for name, function in [('objects', record_objects),
+                           ('lists', record_lists),
+                           ('recorder', record_samples),
+                           ('recorder block', record_blocks)]:
+        recorder, elapsed = timed(function,
+                                  experiment_state(args.variables), times,
+                                  values)
+        print(line.format(name, elapsed))
+
+    # the reads of the last recorder (the blocks)
+    print('{:<20} {:>10}'.format('reading', 'ms'))
+    start = times[-1] * 0.9
+    _, elapsed = timed(lambda: [recorder.read(x, start=start, max_points=1000)
+                                for x in range(recorder.slots)])
+    print(line.format('poll', elapsed))
+    _, elapsed = timed(recorder.materialize)
+    print(line.format('materialize', elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Reverse reference lookups with ``model.references.ReferenceIndex``.
+
+For every object referred to by the ``groupElements`` of the visual values,
+the ``key`` of the initial values and the ``type`` of the query criteria, the
+benchmark compares the referrers found by walking the model
+(``eAllContents()``) against ``ReferenceIndex.referrers()``. It also gives
+the time to build the index, and the time to add and remove V variables
+that refer to a type, without and with the index listening to the resource.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_references --model BigCA1
+"""
+import argparse
+import time
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.references import ReferenceIndex
+
+REFERENCES = [('groupElements', pygeppetto.VisualValue.groupElements),
+              ('key', pygeppetto.TypeToValueMap.key),
+              ('criteria', pygeppetto.QueryMatchingCriteria.type)]
+
+
+def load(name):
+    rset = pygeppetto.register(ResourceSet())
+    return rset.get_resource(URI('tests/xmi-data/{}.net.nml.xmi'
+                                 .format(name)))
+
+
+def targets(resource, reference):
+    found = set()
+    for root in resource.contents:
+        for eobject in root.eAllContents():
+            if reference in eobject.eClass.eAllReferences():
+                value = eobject.eGet(reference)
+                found.update(value if reference.many else [value])
+    found.discard(None)
+    return list(found)
+
+
+def scan(resource, reference, target):
+    referrers = []
+    for root in resource.contents:
+        for eobject in root.eAllContents():
+            if reference not in eobject.eClass.eAllReferences():
+                continue
+            value = eobject.eGet(reference)
+            if target in value if reference.many else value is target:
+                referrers.append(eobject)
+    return referrers
+
+
+def lookup(index, reference, target):
+    return index.referrers(target, reference)
+
+
+def update(resource, variables):
+    root = resource.contents[0]
+    type_ = root.libraries[0].types[0]
+    for i in range(variables):
+        variable = pygeppetto.Variable()
+        variable.id = 'variable{}'.format(i)
+        variable.types.append(type_)
+        root.variables.append(variable)
+    for variable in list(root.variables)[-variables:]:
+        root.variables.remove(variable)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return 1000 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default='BigCA1')
+    parser.add_argument('--lookups', type=int, default=20,
+                        help='scanned lookups per reference (the slow path)')
+    parser.add_argument('--variables', type=int, default=2000)
+    args = parser.parse_args()
+
+    resource = load(args.model)
+    index = ReferenceIndex.of(resource)
+    print('{:<14} {:>12.1f} ms'.format('build', timed(index._check)))
+    print('{:<14} {:>8} {:>14} {:>14}'.format('ms / lookup', 'targets',
+                                              'scan', 'index'))
+    for name, reference in REFERENCES:
+        found = targets(resource, reference)
+        if not found:
+            continue
+        sample = found[:args.lookups]
+        scanned = timed(lambda: [scan(resource, reference, x)
+                                 for x in sample])
+        indexed = timed(lambda: [lookup(index, reference, x) for x in found])
+        for target in sample:
+            assert (set(scan(resource, reference, target)) ==
+                    set(lookup(index, reference, target)))
+        print('{:<14} {:>8} {:>14.3f} {:>14.5f}'.format(
+            name, len(found), scanned / len(sample), indexed / len(found)))
+
+    other = load(args.model)
+    print('{:<14} {:>12} {:>12}'.format('ms', 'no index', 'index'))
+    print('{:<14} {:>12.1f} {:>12.1f}'.format(
+        'update', timed(update, other, args.variables),
+        timed(update, resource, args.variables)))
+
+
+if __name__ == '__main__':
+    main()
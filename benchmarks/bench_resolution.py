@@ -0,0 +1,87 @@
+"""Resolution cost of the references of the bundled XMI files.
+
+Every reference of the XMI files (``types``, ``superType``,
+``groupElements``...) is a URI fragment. This benchmark resolves all of them
+as the XMI loaders would, with the stock PyEcore resolution (walking the
+containment tree for each reference or memoizing the walked paths) and with
+``model.index.ModelIndex`` (the time includes the construction of the
+index).
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_resolution
+"""
+import argparse
+import time
+from itertools import chain
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.index import ModelIndex
+
+FILES = ['tests/xmi-data/MediumNet.net.nml.xmi',
+         'tests/xmi-data/BigCA1.net.nml.xmi']
+
+
+def reference_fragments(root):
+    """Gives the fragments of all the references of the model."""
+    fragments = []
+    for obj in chain([root], root.eAllContents()):
+        for feature in obj.eClass.eAllReferences():
+            if feature.containment or feature.derived or feature.eOpposite:
+                continue
+            value = obj.eGet(feature)
+            values = value if feature.many else [value]
+            fragments.extend(x.eURIFragment() for x in values if x)
+    return fragments
+
+
+def navigation(resource, fragments):
+    resource.cache_enabled = False
+    return [resource.resolve(x) for x in fragments]
+
+
+def memoized(resource, fragments):
+    resource.cache_enabled = True
+    resource._resolve_mem = {}
+    return [resource.resolve(x) for x in fragments]
+
+
+def index(resource, fragments):
+    index = ModelIndex(resource)
+    resource.listeners.remove(index)
+    return [index.get(x) for x in fragments]
+
+
+RESOLVERS = [navigation, memoized, index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rset = ResourceSet()
+    pygeppetto.register(rset)
+
+    line = '{:<24} {:<11} {:>7} {:>7} {:>10} {:>8}'
+    print(line.format('file', 'resolution', 'refs', 'paths', 'total ms',
+                      'us/ref'))
+    for path in FILES:
+        resource = rset.get_resource(URI(path))
+        fragments = reference_fragments(resource.contents[0])
+        for resolver in RESOLVERS:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                resolved = resolver(resource, fragments)
+                times.append(time.perf_counter() - start)
+            assert all(x is not None for x in resolved)
+            best = min(times)
+            print(line.format(path.split('/')[-1], resolver.__name__,
+                              len(fragments), len(set(fragments)),
+                              '{:.1f}'.format(best * 1000),
+                              '{:.2f}'.format(best * 1e6 / len(fragments))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Query results by row (``QueryResults``) and by column
+(``model.results.ResultTable``).
+
+Synthetic results (an id, a name, a size and a flag per row) are built as
+``QueryResult`` rows and as a table, then the benchmark measures the random
+access to the values (``getValue()``), a filter followed by a sort, and the
+export of the results for a transfer: ``SerializableQueryResult`` rows
+against the Arrow buffers of the columns.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_results --rows 50000
+"""
+import argparse
+import random
+import time
+import model as pygeppetto
+from model.datasources import QueryResult
+from model.results import ResultTable
+
+HEADER = ['ID', 'name', 'size', 'active']
+
+
+def results(count, seed=0):
+    rng = random.Random(seed)
+    results = pygeppetto.QueryResults()
+    results.id = 'results'
+    results.header.extend(HEADER)
+    for i in range(count):
+        result = QueryResult()
+        result.values.extend(['n{}'.format(i), 'neuron{}'.format(i % 1000),
+                              rng.random() * 100, rng.random() < 0.5])
+        results.results.append(result)
+    return results
+
+
+def row_value(results, field, row):
+    """The lookup the clients used to do."""
+    return results.results[row].values[list(results.header).index(field)]
+
+
+def rows_filter_sort(results):
+    size = list(results.header).index('size')
+    rows = [x for x in results.results if x.values[size] < 50]
+    return sorted(rows, key=lambda x: x.values[size])
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return 1000 * (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    query_results = results(args.rows)
+    print('{} rows'.format(args.rows))
+    print('build the table {:.1f} ms'.format(timed(
+        lambda: ResultTable.from_results(query_results))))
+    table = ResultTable.of(query_results)
+    rng = random.Random(1)
+    lookups = [(rng.choice(HEADER), rng.randrange(args.rows))
+               for _ in range(10000)]
+    line = '{:<28} {:>10} {:>10}'
+    print(line.format('operation', 'rows ms', 'table ms'))
+    print(line.format(
+        '10000 getValue',
+        '{:.2f}'.format(timed(lambda: [row_value(query_results, *x)
+                                       for x in lookups])),
+        '{:.2f}'.format(timed(lambda: [query_results.getValue(*x)
+                                       for x in lookups]))))
+    print(line.format(
+        'filter + sort',
+        '{:.2f}'.format(timed(lambda: rows_filter_sort(query_results))),
+        '{:.2f}'.format(timed(lambda: table.filter(
+            table.column('size') < 50).sort('size')))))
+    print(line.format(
+        'export',
+        '{:.2f}'.format(timed(lambda: table.to_results(serializable=True))),
+        '{:.2f}'.format(timed(lambda: [table.buffers(x) for x in HEADER]))))
+
+
+if __name__ == '__main__':
+    main()
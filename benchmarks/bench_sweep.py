@@ -0,0 +1,124 @@
+"""Parameter sweeps with ``model.sweep.ParameterSweep``.
+
+The parameters of the channels and synapses of a model (a variable of the
+model for each type that has parameters) are swept over R random rows. The
+benchmark compares, for all the rows:
+
+* ``lookup``: the parameters looked up by instance path (``PathIndex``) and
+  set through PyEcore for each row, against ``ParameterSweep.run()``,
+* ``states``: an ``ExperimentState`` built through PyEcore for each row,
+  against ``ParameterSweep.states()`` (the state of the sweep, updated for
+  each row) and ``ParameterSweep.state()`` (a copy per row),
+* ``serialize``: the state of each row serialized to JSON
+  (``model.json``), in the calling process and with ``ParameterSweep.map()``
+  in a pool of processes.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_sweep --rows 2000 --processes 4
+"""
+import argparse
+import time
+import numpy
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.json import dumps
+from model.paths import PathIndex
+from model.sweep import ParameterSweep
+
+
+def load(name):
+    """Gives the model and the instance paths of its parameters."""
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.get_resource(URI('tests/xmi-data/{}.net.nml.xmi'
+                                      .format(name)))
+    root = resource.contents[0]
+    paths = []
+    for type_ in list(root.libraries[0].types):
+        parameters = [x.id for x in getattr(type_, 'variables', ())
+                      if any(isinstance(y, pygeppetto.ParameterType)
+                             for y in x.types)]
+        if not parameters:
+            continue
+        variable = pygeppetto.Variable()
+        variable.id = type_.id
+        variable.types.append(type_)
+        root.variables.append(variable)
+        paths.extend('{}.{}'.format(type_.id, x) for x in parameters)
+    return root, paths
+
+
+def lookup_rows(model, paths, matrix):
+    index = PathIndex.of(model.eResource)
+    for row in matrix.tolist():
+        for path, value in zip(paths, row):
+            variable = index.variable(path)
+            variable.initialValues[0].value.value = value
+
+
+def sweep_rows(sweep, matrix):
+    for _ in sweep.run(matrix):
+        pass
+
+
+def build_states(model, paths, matrix):
+    index = PathIndex.of(model.eResource)
+    for row in matrix.tolist():
+        state = pygeppetto.ExperimentState()
+        for path, value in zip(paths, row):
+            variable_value = pygeppetto.VariableValue()
+            variable_value.pointer = index.pointer(path)
+            variable_value.value = pygeppetto.PhysicalQuantity()
+            variable_value.value.value = value
+            state.setParameters.append(variable_value)
+
+
+def sweep_states(sweep, matrix):
+    for _ in sweep.states(matrix):
+        pass
+
+
+def copy_states(sweep, matrix):
+    for row in matrix:
+        sweep.state(row)
+
+
+def serialize(sweep, index, row):
+    return len(dumps(next(sweep.states(row))))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return 1000 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default='MediumNet')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    model, paths = load(args.model)
+    sweep = ParameterSweep(model, paths)
+    matrix = numpy.random.default_rng(0).random((args.rows, len(paths)))
+    print('{} parameters, {} rows'.format(len(paths), args.rows))
+    line = '{:<12} {:>12.1f} {:>12.1f} {:>12}'
+    print('{:<12} {:>12} {:>12} {:>12}'.format('ms', 'pyecore', 'sweep',
+                                               'sweep copy'))
+    print(line.format('lookup', timed(lookup_rows, model, paths, matrix),
+                      timed(sweep_rows, sweep, matrix), ''))
+    print(line.format('states', timed(build_states, model, paths, matrix),
+                      timed(sweep_states, sweep, matrix),
+                      '{:.1f}'.format(timed(copy_states, sweep, matrix))))
+    print('{:<12} {:>12} {:>12}'.format(
+        'ms', '1 process', '{} processes'.format(args.processes)))
+    print(line.format(
+        'serialize',
+        timed(sweep.map, serialize, matrix, 1),
+        timed(sweep.map, serialize, matrix, args.processes), ''))
+
+
+if __name__ == '__main__':
+    main()
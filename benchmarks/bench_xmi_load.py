@@ -0,0 +1,121 @@
+"""Throughput benchmark of the Geppetto streaming XMI loader.
+
+Compares the stock PyEcore XMI loader with ``model.xmi.GeppettoXMIResource``
+on the bundled XMI files, with and without the lazy loading of the library
+types (``lazy`` loader, the time is the time to the first query), and with
+the reload of a binary snapshot of the same model (``snapshot`` loader, see
+``model.snapshot``). Each measure runs in a fresh interpreter so the
+reported peak memory (max RSS) is not polluted by previous loads.
+
+Run it from the repository root::
+
+    $ python -m benchmarks.bench_xmi_load
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+FILES = ['tests/xmi-data/MediumNet.net.nml.xmi',
+         'tests/xmi-data/BigCA1.net.nml.xmi']
+LOADERS = ['pyecore', 'geppetto', 'lazy', 'snapshot']
+
+
+def load(loader, path):
+    from pyecore.resources import URI
+    from model.xmi import GeppettoXMIResource, GeppettoXMIOptions
+    from model.snapshot import GeppettoSnapshotResource
+
+    rset = new_rset()
+    options = {}
+    if loader in ('geppetto', 'lazy'):
+        rset.resource_factory['xmi'] = GeppettoXMIResource
+    if loader == 'lazy':
+        options[GeppettoXMIOptions.LAZY_TYPES] = True
+    if loader == 'snapshot':
+        rset.resource_factory['snapshot'] = GeppettoSnapshotResource
+
+    start = time.perf_counter()
+    root = rset.get_resource(URI(path), options=options).contents[0]
+    elapsed = time.perf_counter() - start
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    nb_objects = 1 + sum(1 for _ in root.eAllContents())
+    return {'loader': loader,
+            'file': os.path.basename(path).replace('.snapshot', ''),
+            'seconds': elapsed,
+            'objects': nb_objects,
+            'MB/s': os.path.getsize(path) / elapsed / 2 ** 20,
+            'objects/s': nb_objects / elapsed,
+            'max_rss_kB': max_rss}
+
+
+def new_rset():
+    from pyecore.resources import ResourceSet
+    import model as pygeppetto
+
+    rset = ResourceSet()
+    pygeppetto.register(rset)
+    return rset
+
+
+def make_snapshot(path, output):
+    from pyecore.resources import URI
+    from model.snapshot import save_snapshot
+
+    save_snapshot(new_rset().get_resource(URI(path)), URI(output))
+
+
+def snapshot_of(path, directory):
+    # the snapshot is built in another interpreter, the peak memory of the
+    # interpreter is inherited by the measuring interpreters
+    output = os.path.join(directory, os.path.basename(path) + '.snapshot')
+    cmd = [sys.executable, '-m', 'benchmarks.bench_xmi_load',
+           '--snapshot', path, output]
+    subprocess.check_call(cmd)
+    return output
+
+
+def measure(loader, path):
+    cmd = [sys.executable, '-m', 'benchmarks.bench_xmi_load',
+           '--child', loader, path]
+    output = subprocess.check_output(cmd)
+    return json.loads(output.decode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', nargs=2, metavar=('LOADER', 'FILE'),
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--snapshot', nargs=2, metavar=('FILE', 'OUTPUT'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(load(*args.child)))
+        return
+    if args.snapshot:
+        make_snapshot(*args.snapshot)
+        return
+
+    line = '{:<24} {:<9} {:>8} {:>9} {:>12} {:>12}'
+    print(line.format('file', 'loader', 'seconds', 'MB/s', 'objects/s',
+                      'max RSS kB'))
+    with tempfile.TemporaryDirectory() as directory:
+        for path in FILES:
+            snapshot = snapshot_of(path, directory)
+            for loader in LOADERS:
+                source = snapshot if loader == 'snapshot' else path
+                runs = [measure(loader, source) for _ in range(args.repeat)]
+                best = min(runs, key=lambda x: x['seconds'])
+                print(line.format(best['file'], loader,
+                                  '{:.3f}'.format(best['seconds']),
+                                  '{:.2f}'.format(best['MB/s']),
+                                  '{:.0f}'.format(best['objects/s']),
+                                  max(x['max_rss_kB'] for x in runs)))
+
+if __name__ == '__main__':
+    main()
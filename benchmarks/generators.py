@@ -0,0 +1,250 @@
+"""Synthetic Geppetto models for the benchmarks.
+
+Each generator builds a model with the shape of the models produced by the
+NeuroML conversion, scaled by a factor (1 gives a few MB of XMI, about the size of
+``BigCA1.net.nml.xmi``, 10 about the size of a large connectivity model like
+``LargeConns.net.nml.xmi``):
+
+* ``connections``: populations of cells (``ArrayType``) and projections made
+  of thousands of ``Connection`` values, each one with two ``Pointer``,
+* ``morphology``: cells with a detailed morphology (``CompositeVisualType``
+  of ``Cylinder`` values) and visual groups with parameters,
+* ``types``: a large library of types with ``superType`` hierarchies and
+  variables referring to each other.
+
+The models are deterministic (a seeded ``random.Random``). They are saved
+with::
+
+    $ python -m benchmarks.generators SHAPE SCALE OUTPUT
+"""
+import argparse
+import random
+import model as pygeppetto
+from model.values import Connectivity
+
+SHAPES = ['connections', 'morphology', 'types']
+
+
+def new_node(cls, identifier, name=None):
+    node = cls()
+    node.id = identifier
+    node.name = name or identifier
+    return node
+
+
+def new_variable(identifier, *types):
+    variable = new_node(pygeppetto.Variable, identifier)
+    variable.types.extend(types)
+    return variable
+
+
+def initial_value(variable, key, value):
+    entry = pygeppetto.TypeToValueMap()
+    entry.key = key
+    entry.value = value
+    variable.initialValues.append(entry)
+
+
+def common_library():
+    """Gives the common library and its types by id."""
+    library = new_node(pygeppetto.GeppettoLibrary, 'common',
+                       'Geppetto Common Library')
+    classes = [('Parameter', pygeppetto.ParameterType),
+               ('StateVariable', pygeppetto.StateVariableType),
+               ('Visual', pygeppetto.VisualType),
+               ('Pointer', pygeppetto.PointerType),
+               ('Connection', pygeppetto.ConnectionType)]
+    types = {}
+    for identifier, cls in classes:
+        types[identifier] = new_node(cls, identifier)
+        library.types.append(types[identifier])
+    return library, types
+
+
+def new_model(name):
+    root = pygeppetto.GeppettoModel()
+    root.name = name
+    library = new_node(pygeppetto.GeppettoLibrary, 'neuroml')
+    root.libraries.append(library)
+    common, common_types = common_library()
+    root.libraries.append(common)
+    return root, library, common_types
+
+
+def new_quantity(value, unit):
+    quantity = pygeppetto.PhysicalQuantity()
+    quantity.value = value
+    quantity.scalingFactor = 1
+    quantity.unit = pygeppetto.Unit()
+    quantity.unit.unit = unit
+    return quantity
+
+
+def new_cell(library, common, identifier, rng, channels=5):
+    cell = new_node(pygeppetto.CompositeType, identifier)
+    for i in range(channels):
+        variable = new_variable('channel{}'.format(i), common['Parameter'])
+        initial_value(variable, common['Parameter'],
+                      new_quantity(rng.uniform(0, 1), 'S_per_cm2'))
+        cell.variables.append(variable)
+    library.types.append(cell)
+    return cell
+
+
+def new_pointer(population, cell, index):
+    pointer = pygeppetto.Pointer()
+    element = pygeppetto.PointerElement()
+    element.variable = population
+    element.type = cell
+    element.index = index
+    pointer.elements.append(element)
+    pointer.path = '{}[{}]'.format(population.id, index)
+    return pointer
+
+
+def connections(scale=1, seed=0):
+    """Populations of cells connected by projections."""
+    rng = random.Random(seed)
+    root, library, common = new_model('connections')
+    network = new_node(pygeppetto.CompositeType, 'network')
+    populations = []
+    for i in range(4):
+        cell = new_cell(library, common, 'cell{}'.format(i), rng)
+        size = max(2, int(50 * scale))
+        array = new_node(pygeppetto.ArrayType, 'population{}_{}'
+                         .format(i, size))
+        array.size = size
+        array.arrayType = cell
+        library.types.append(array)
+        population = new_variable('population{}'.format(i), array)
+        network.variables.append(population)
+        populations.append((population, cell, size))
+
+    connection_type = common['Connection']
+    for i in range(8):
+        projection = new_node(pygeppetto.CompositeType,
+                              'projection{}'.format(i))
+        pre, post = rng.sample(populations, 2)
+        for j in range(int(800 * scale)):
+            connection = pygeppetto.Connection()
+            connection.connectivity = Connectivity.DIRECTIONAL
+            connection.a = new_pointer(pre[0], pre[1], rng.randrange(pre[2]))
+            connection.b = new_pointer(post[0], post[1],
+                                       rng.randrange(post[2]))
+            variable = new_variable('connection{}'.format(j),
+                                    connection_type)
+            initial_value(variable, connection_type, connection)
+            projection.variables.append(variable)
+        library.types.append(projection)
+        network.variables.append(new_variable(projection.id, projection))
+    library.types.append(network)
+    root.variables.append(new_variable('network', network))
+    return root
+
+
+def new_point(x, y, z):
+    point = pygeppetto.Point()
+    point.x, point.y, point.z = x, y, z
+    return point
+
+
+def new_morphology(identifier, common, segments, rng):
+    morphology = new_node(pygeppetto.CompositeVisualType, identifier)
+    regions = new_node(pygeppetto.VisualGroup, 'Cell_Regions',
+                       'Cell Regions')
+    for region, color in [('soma_group', '0X0066FF'),
+                          ('dendrite_group', '0X99CC00'),
+                          ('axon_group', '0XFF6600')]:
+        element = new_node(pygeppetto.VisualGroupElement, region)
+        element.defaultColor = color
+        regions.visualGroupElements.append(element)
+    density = new_node(pygeppetto.VisualGroup, 'density')
+    density.lowSpectrumColor = '0XFF0000'
+    density.highSpectrumColor = '0XFFFF00'
+    morphology.visualGroups.extend([regions, density])
+
+    position = (0.0, 0.0, 0.0)
+    for i in range(segments):
+        identifier = 'Seg{}'.format(i)
+        distal = tuple(x + rng.uniform(-5, 5) for x in position)
+        cylinder = pygeppetto.Cylinder()
+        cylinder.position = new_point(*position)
+        cylinder.distal = new_point(*distal)
+        cylinder.bottomRadius = rng.uniform(0.2, 1)
+        cylinder.topRadius = rng.uniform(0.2, 1)
+        region = regions.visualGroupElements[0 if i == 0 else
+                                             1 + (i % 5 == 0)]
+        cylinder.groupElements.append(region)
+        variable = new_variable(identifier, common['Visual'])
+        initial_value(variable, common['Visual'], cylinder)
+        morphology.variables.append(variable)
+        if i % 2:
+            element = new_node(pygeppetto.VisualGroupElement, identifier)
+            element.parameter = new_quantity(rng.uniform(0, 1), 'S_per_cm2')
+            density.visualGroupElements.append(element)
+        position = distal if rng.random() < 0.9 else (0.0, 0.0, 0.0)
+    return morphology
+
+
+def morphology(scale=1, seed=0):
+    """Cells with a detailed morphology."""
+    rng = random.Random(seed)
+    root, library, common = new_model('morphology')
+    for i in range(max(1, int(4 * scale))):
+        cell = new_cell(library, common, 'cell{}'.format(i), rng)
+        visual = new_morphology('morphology{}'.format(i), common, 600, rng)
+        library.types.append(visual)
+        cell.visualType = visual
+        root.variables.append(new_variable('cell{}'.format(i), cell))
+    return root
+
+
+def types(scale=1, seed=0):
+    """A large library of types in hierarchies."""
+    rng = random.Random(seed)
+    root, library, common = new_model('types')
+    all_types = []
+    for i in range(int(3000 * scale)):
+        type_ = new_node(pygeppetto.CompositeType, 'type{}'.format(i))
+        if all_types and rng.random() < 0.8:
+            type_.superType.append(rng.choice(all_types[-50:]))
+        for j in range(3):
+            referenced = rng.choice(all_types) if all_types \
+                else common['Parameter']
+            variable = new_variable('variable{}'.format(j), referenced)
+            if rng.random() < 0.3:
+                initial_value(variable, common['Parameter'],
+                              new_quantity(rng.uniform(0, 1), 'mV'))
+            type_.variables.append(variable)
+        library.types.append(type_)
+        all_types.append(type_)
+    for type_ in all_types[-10:]:
+        root.variables.append(new_variable(type_.id + '_instance', type_))
+    return root
+
+
+GENERATORS = {'connections': connections, 'morphology': morphology,
+              'types': types}
+
+
+def generate(shape, scale, output):
+    """Builds the shape model and saves it as XMI in output."""
+    from pyecore.resources import ResourceSet, URI
+
+    rset = ResourceSet()
+    resource = rset.create_resource(URI(output))
+    resource.append(GENERATORS[shape](scale))
+    resource.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('shape', choices=SHAPES)
+    parser.add_argument('scale', type=float)
+    parser.add_argument('output')
+    args = parser.parse_args()
+    generate(args.shape, args.scale, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark suite: load, save, traverse, resolve and roundtrip.
+
+Each operation is measured on the bundled XMI files and on synthetic models
+(see ``benchmarks.generators``), in a fresh interpreter for each run so the
+peak memory (max RSS, which includes the load of the model) of a run is not
+polluted by the previous ones:
+
+* ``load``: reading the XMI,
+* ``save``: writing the loaded model as XMI,
+* ``traverse``: iterating over ``eAllContents()`` of the loaded model,
+* ``resolve``: resolving the URI fragments of all the references of the
+  loaded model,
+* ``roundtrip``: load, modify the root, save and load again.
+
+The best time of the runs is reported. The results are written as JSON
+along with the commit, the versions and the platform, so the results of two
+commits can be compared::
+
+    $ python -m benchmarks.suite --output before.json
+    $ git checkout other-commit
+    $ python -m benchmarks.suite --output after.json --compare before.json
+
+Run it from the repository root.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BUNDLED = ['tests/xmi-data/MediumNet.net.nml.xmi',
+           'tests/xmi-data/BigCA1.net.nml.xmi']
+OPERATIONS = ['load', 'save', 'traverse', 'resolve', 'roundtrip']
+LOADERS = ['pyecore', 'geppetto']
+
+
+def new_rset(loader):
+    from pyecore.resources import ResourceSet
+    import model as pygeppetto
+    from model.xmi import GeppettoXMIResource
+
+    rset = ResourceSet()
+    pygeppetto.register(rset)
+    if loader == 'geppetto':
+        rset.resource_factory['xmi'] = GeppettoXMIResource
+    return rset
+
+
+def run(operation, loader, path):
+    """Measures operation on the model at path, gives the result."""
+    from pyecore.resources import URI
+    from benchmarks.bench_resolution import reference_fragments
+
+    start = time.perf_counter()
+    model = new_rset(loader).get_resource(URI(path))
+    elapsed = time.perf_counter() - start
+    root = model.contents[0]
+    with tempfile.TemporaryDirectory() as directory:
+        output = URI(os.path.join(directory, 'output.xmi'))
+        if operation == 'save':
+            start = time.perf_counter()
+            model.save(output=output)
+            elapsed = time.perf_counter() - start
+        elif operation == 'traverse':
+            start = time.perf_counter()
+            for _ in root.eAllContents():
+                pass
+            elapsed = time.perf_counter() - start
+        elif operation == 'resolve':
+            fragments = reference_fragments(root)
+            model.__dict__.pop('_model_index', None)
+            model._resolve_mem = {}
+            start = time.perf_counter()
+            for fragment in fragments:
+                model.resolve(fragment)
+            elapsed = time.perf_counter() - start
+        elif operation == 'roundtrip':
+            start = time.perf_counter()
+            model = new_rset(loader).get_resource(URI(path))
+            model.contents[0].name = 'roundtrip'
+            model.save(output=output)
+            new_rset(loader).get_resource(output)
+            elapsed = time.perf_counter() - start
+    return {'seconds': elapsed,
+            'max_rss_kB': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'objects': 1 + sum(1 for _ in root.eAllContents())}
+
+
+def measure(operation, loader, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        cmd = [sys.executable, '-m', 'benchmarks.suite',
+               '--child', operation, loader, path]
+        runs.append(json.loads(subprocess.check_output(cmd).decode()))
+    return {'seconds': min(x['seconds'] for x in runs),
+            'runs': [x['seconds'] for x in runs],
+            'max_rss_kB': max(x['max_rss_kB'] for x in runs),
+            'objects': runs[0]['objects'],
+            'bytes': os.path.getsize(path)}
+
+
+def generate(shape, scale, directory):
+    # generated in another interpreter, the peak memory of the interpreter
+    # is inherited by the measuring interpreters
+    output = os.path.join(directory, '{}-{:g}.xmi'.format(shape, scale))
+    if not os.path.exists(output):
+        subprocess.check_call([sys.executable, '-m', 'benchmarks.generators',
+                               shape, str(scale), output])
+    return output
+
+
+def metadata(args):
+    import numpy
+    import pyecore
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         stderr=subprocess.DEVNULL)
+        commit = commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'pyecore': getattr(pyecore, '__version__', None),
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'repeat': args.repeat}
+
+
+def key(result):
+    return result['model'], result['operation'], result['loader']
+
+
+def main():
+    from benchmarks.generators import SHAPES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1,
+                        help='scale of the synthetic models (10 for models '
+                             'of the size of LargeConns)')
+    parser.add_argument('--shapes', nargs='*', choices=SHAPES,
+                        default=SHAPES)
+    parser.add_argument('--operations', nargs='*', choices=OPERATIONS,
+                        default=OPERATIONS)
+    parser.add_argument('--loaders', nargs='*', choices=LOADERS,
+                        default=LOADERS)
+    parser.add_argument('--no-bundled', action='store_true',
+                        help='only measure the synthetic models')
+    parser.add_argument('--models', metavar='DIRECTORY',
+                        help='keep the synthetic models in DIRECTORY')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help='results of a previous run to compare with')
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run(*args.child)))
+        return
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as stream:
+            previous = {key(x): x for x in json.load(stream)['results']}
+
+    line = '{:<28} {:<10} {:<9} {:>9} {:>11} {:>8}'
+    print(line.format('model', 'operation', 'loader', 'seconds',
+                      'max RSS kB', 'ratio'))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        directory = args.models or directory
+        os.makedirs(directory, exist_ok=True)
+        paths = [] if args.no_bundled else list(BUNDLED)
+        paths += [generate(x, args.scale, directory) for x in args.shapes]
+        for path in paths:
+            for operation in args.operations:
+                for loader in args.loaders:
+                    result = measure(operation, loader, path, args.repeat)
+                    result.update(model=os.path.basename(path),
+                                  operation=operation, loader=loader)
+                    results.append(result)
+                    before = previous.get(key(result))
+                    ratio = '' if before is None else '{:.2f}'.format(
+                        result['seconds'] / before['seconds'])
+                    print(line.format(result['model'], operation, loader,
+                                      '{:.3f}'.format(result['seconds']),
+                                      result['max_rss_kB'], ratio))
+
+    with open(args.output, 'w') as stream:
+        json.dump({'metadata': metadata(args), 'results': results}, stream,
+                  indent=2)
+    print('Results written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
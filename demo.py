@@ -5,9 +5,7 @@ import model as pygeppetto
 rset = ResourceSet()
 
 # Register all the EPackages of pygeppetto inside the ResourceSet
-rset.metamodel_registry[pygeppetto.nsURI] = pygeppetto
-for subpack in pygeppetto.eSubpackages:
-    rset.metamodel_registry[subpack.nsURI] = subpack
+pygeppetto.register(rset)
 
 model_url = URI('tests/xmi-data/MediumNet.net.nml.xmi')  # > 3100 objects
 resource = rset.get_resource(model_url)  # We load the model
@@ -1,120 +1,61 @@
-import pyecore.ecore as Ecore
-from .model import getEClassifier, eClassifiers
-from .model import name, nsURI, nsPrefix, eClass
-from .model import GeppettoModel, Node, GeppettoLibrary, LibraryManager, ExperimentState, VariableValue, Tag, DomainModel, ModelFormat, ExternalDomainModel, FileFormat, StringToStringMap, ISynchable
-from .types import Type, VisualType, CompositeType, PointerType, QuantityType, ParameterType, StateVariableType, DynamicsType, ArgumentType, ExpressionType, HTMLType, TextType, URLType, PointType, ArrayType, CompositeVisualType, ConnectionType, ImageType
-from .values import Pointer, Value, VisualValue, Composite, Quantity, Dynamics, Argument, Expression, HTML, Text, URL, Point, ArrayValue, VisualGroup, Image, StringToValueMap, Unit, PointerElement, PhysicalQuantity, Function, FunctionPlot, VisualGroupElement, SkeletonTransformation, ArrayElement, TimeSeries, Cylinder, SkeletonAnimation, Connection
-from .variables import Variable, TypeToValueMap
-from .datasources import DataSource, Query, DataSourceLibraryConfiguration, QueryMatchingCriteria, AQueryResult, ProcessQuery, CompoundQuery, CompoundRefQuery, QueryResults
-from . import model
-from . import types
-from . import values
-from . import variables
-from . import datasources
+"""Geppetto model API.
+
+The classes of the metamodel are defined in the subpackages, the references
+between them are wired by ``model._metamodel``. By default, importing the
+package imports all of it. When the ``PYGEPPETTO_LAZY_IMPORT`` environment
+variable is set (to anything but ``0``), importing the package does not
+import anything, the metamodel is imported and wired the first time one of
+its names (``model.GeppettoModel``...) or one of the subpackages
+(``model.values``...) is used. This makes the start of the tools that only
+import the package cheaper.
+
+``register()`` registers the packages in a ``ResourceSet``::
+
+    from pyecore.resources import ResourceSet
+    import model as pygeppetto
+
+    rset = pygeppetto.register(ResourceSet())
+"""
+import os
+import sys
+from importlib import import_module
 
 __all__ = ['GeppettoModel', 'Node', 'GeppettoLibrary', 'LibraryManager', 'ExperimentState', 'VariableValue', 'Tag', 'DomainModel', 'ModelFormat', 'ExternalDomainModel', 'FileFormat', 'StringToStringMap', 'ISynchable']
 
-eSubpackages = [types, values, variables, datasources]
-eSuperPackage = None
+LAZY_IMPORT = os.environ.get('PYGEPPETTO_LAZY_IMPORT', '0') != '0'
+
+
+def __getattr__(name):
+    metamodel = import_module('._metamodel', __name__)
+    try:
+        value = getattr(metamodel, name)
+    except AttributeError:
+        raise AttributeError('module {!r} has no attribute {!r}'
+                             .format(__name__, name)) from None
+    globals()[name] = value
+    return value
 
-# Non opposite EReferences
-GeppettoModel.variables.eType = Variable
-GeppettoModel.libraries.eType = GeppettoLibrary
-GeppettoModel.tags.eType = Tag
-GeppettoModel.dataSources.eType = DataSource
-GeppettoModel.queries.eType = Query
-Node.tags.eType = Tag
-GeppettoLibrary.types.eType = Type
-GeppettoLibrary.sharedTypes.eType = Type
-LibraryManager.libraries.eType = GeppettoLibrary
-ExperimentState.recordedVariables.eType = VariableValue
-ExperimentState.setParameters.eType = VariableValue
-VariableValue.pointer.eType = Pointer
-VariableValue.value.eType = Value
-Tag.tags.eType = Tag
-DomainModel.format.eType = ModelFormat
-Type.superType.eType = Type
-Type.visualType.eType = VisualType
-Type.domainModel.eType = DomainModel
-VisualType.defaultValue.eType = VisualValue
-CompositeType.variables.eType = Variable
-CompositeType.defaultValue.eType = Composite
-PointerType.defaultValue.eType = Pointer
-QuantityType.defaultValue.eType = Quantity
-ParameterType.defaultValue.eType = Quantity
-StateVariableType.defaultValue.eType = Quantity
-DynamicsType.defaultValue.eType = Dynamics
-ArgumentType.defaultValue.eType = Argument
-ExpressionType.defaultValue.eType = Expression
-HTMLType.defaultValue.eType = HTML
-TextType.defaultValue.eType = Text
-URLType.defaultValue.eType = URL
-PointType.defaultValue.eType = Point
-ArrayType.arrayType.eType = Type
-ArrayType.defaultValue.eType = ArrayValue
-CompositeVisualType.variables.eType = Variable
-CompositeVisualType.visualGroups.eType = VisualGroup
-ConnectionType.variables.eType = Variable
-ConnectionType.defaultValue.eType = Composite
-ImageType.defaultValue.eType = Image
-Composite.value.eType = StringToValueMap
-StringToValueMap.value.eType = Value
-PhysicalQuantity.unit.eType = Unit
-TimeSeries.unit.eType = Unit
-Pointer.elements.eType = PointerElement
-Pointer.point.eType = Point
-PointerElement.variable.eType = Variable
-PointerElement.type.eType = Type
-Dynamics.initialCondition.eType = PhysicalQuantity
-Dynamics.dynamics.eType = Function
-Function.arguments.eType = Argument
-Function.expression.eType = Expression
-Function.functionPlot.eType = FunctionPlot
-VisualValue.groupElements.eType = VisualGroupElement
-VisualValue.position.eType = Point
-Cylinder.distal.eType = Point
-SkeletonAnimation.skeletonTransformationSeries.eType = SkeletonTransformation
-VisualGroupElement.parameter.eType = Quantity
-VisualGroup.visualGroupElements.eType = VisualGroupElement
-Connection.a.eType = Pointer
-Connection.b.eType = Pointer
-ArrayElement.position.eType = Point
-ArrayElement.initialValue.eType = Value
-ArrayValue.elements.eType = ArrayElement
-Variable.anonymousTypes.eType = Type
-Variable.initialValues.eType = TypeToValueMap
-Variable.position.eType = Point
-TypeToValueMap.key.eType = Type
-TypeToValueMap.value.eType = Value
-DataSource.libraryConfigurations.eType = DataSourceLibraryConfiguration
-DataSource.queries.eType = Query
-DataSource.dependenciesLibrary.eType = GeppettoLibrary
-DataSource.targetLibrary.eType = GeppettoLibrary
-DataSource.fetchVariableQuery.eType = Query
-DataSourceLibraryConfiguration.library.eType = GeppettoLibrary
-Query.matchingCriteria.eType = QueryMatchingCriteria
-Query.returnType.eType = Type
-ProcessQuery.parameters.eType = StringToStringMap
-CompoundQuery.queryChain.eType = Query
-CompoundRefQuery.queryChain.eType = Query
-QueryResults.results.eType = AQueryResult
-QueryMatchingCriteria.type.eType = Type
 
-# opposite EReferences
-Type.referencedVariables.eType = Variable
-Variable.types.eType = Type
-Variable.types.eOpposite = Type.referencedVariables
+def load():
+    """Imports and wires the whole metamodel (see the module docstring)."""
+    metamodel = import_module('._metamodel', __name__)
+    for name, value in vars(metamodel).items():
+        if not name.startswith('__'):
+            globals().setdefault(name, value)
 
 
-# Manage all other EClassifiers (EEnum, EDatatypes...)
-otherClassifiers = [FileFormat]
-for classif in otherClassifiers:
-    eClassifiers[classif.name] = classif
-    classif._container = model
+def register(rset):
+    """Registers the Geppetto packages in the metamodel registry of rset.
 
-for classif in eClassifiers.values():
-    eClass.eClassifiers.append(classif.eClass)
+    Gives rset.
+    """
+    load()
+    package = sys.modules[__name__]
+    rset.metamodel_registry[package.nsURI] = package
+    for subpack in package.eSubpackages:
+        rset.metamodel_registry[subpack.nsURI] = subpack
+    return rset
 
-for subpack in eSubpackages:
-    eClass.eSubpackages.append(subpack.eClass)
 
+if not LAZY_IMPORT:
+    load()
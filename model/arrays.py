@@ -0,0 +1,270 @@
+"""Array-backed values for the large double lists of Geppetto models.
+
+``TimeSeries.value`` and ``SkeletonTransformation.skeletonTransformation``
+can hold millions of samples. By default PyEcore keeps them as lists of
+Python floats, ``enable_arrays()`` makes them contiguous float64 buffers
+instead (for the objects whose value is created afterwards)::
+
+    import numpy
+    from model.arrays import enable_arrays
+
+    enable_arrays()
+    series = pygeppetto.TimeSeries()
+    series.value = numpy.linspace(0, 1, 1000000)  # bulk copy
+    series.value.array  # NumPy view of the samples, without copy
+    series.value[10]  # the usual list operations work as well
+
+``DoubleArray`` behaves like the PyEcore lists it replaces (same
+notifications, same ``_isset`` update), the values of an existing object can
+be converted with ``as_array()``. The NumPy view given by ``array`` is
+only valid until the next size change, and writing through it is not
+notified.
+
+``pack_doubles()`` and ``unpack_doubles()`` give the packed form of a double
+list (``base64:`` followed by the base64 of the little-endian float64
+values), used by the ``GeppettoXMIOptions.PACKED_ARRAYS`` XMI option.
+"""
+from base64 import b64decode, b64encode
+from numbers import Real
+import numpy
+from pyecore.ecore import EDouble
+from pyecore.notification import Notification, Kind
+from pyecore.valuecontainer import ECollection, BadValueError
+from .values import TimeSeries, SkeletonTransformation
+
+__all__ = ['DoubleArray', 'ARRAY_FEATURES', 'enable_arrays',
+           'disable_arrays', 'as_array', 'pack_doubles', 'unpack_doubles',
+           'is_packed', 'PACKED_PREFIX']
+
+ARRAY_FEATURES = (TimeSeries.value,
+                  SkeletonTransformation.skeletonTransformation)
+PACKED_PREFIX = 'base64:'
+PACKED_DTYPE = numpy.dtype('<f8')
+
+
+class DoubleArray(ECollection):
+    """Many EDouble feature value stored in a float64 buffer.
+
+    The buffer grows geometrically, appending values is amortized constant
+    time. Unlike the PyEcore ordered sets, the values are not required to
+    be unique.
+    """
+    __hash__ = None
+
+    @classmethod
+    def create(cls, owner, feature):
+        return cls(owner, feature)
+
+    def __init__(self, owner, efeature=None):
+        super().__init__(owner, efeature)
+        self._data = numpy.empty(0)
+        self._size = 0
+
+    @property
+    def array(self):
+        """NumPy view of the values (no copy)."""
+        return self._data[:self._size]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.array
+        if dtype is not None and values.dtype != dtype:
+            return values.astype(dtype)
+        return values.copy() if copy else values
+
+    def tolist(self):
+        return self.array.tolist()
+
+    def _as_values(self, values):
+        try:
+            values = numpy.asarray(values, dtype=numpy.float64)
+        except (TypeError, ValueError):
+            raise BadValueError(values, EDouble, self.feature)
+        if values.ndim != 1:
+            raise BadValueError(values, EDouble, self.feature)
+        return values
+
+    def _as_value(self, value):
+        if not isinstance(value, Real):
+            raise BadValueError(value, EDouble, self.feature)
+        return float(value)
+
+    def _reserve(self, size):
+        if size > len(self._data):
+            data = numpy.empty(max(size, 2 * len(self._data), 16))
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+
+    def _extend(self, values):
+        """Appends the float64 values, without any notification."""
+        size = self._size + len(values)
+        self._reserve(size)
+        self._data[self._size:size] = values
+        self._size = size
+
+    def _notify(self, kind, new=None, old=None):
+        self.owner.notify(Notification(new=new, old=old, feature=self.feature,
+                                       kind=kind))
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return iter(self.array.tolist())
+
+    def __contains__(self, value):
+        return bool((self.array == value).any())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.array[index].tolist()
+        return float(self.array[index])
+
+    def __eq__(self, other):
+        if isinstance(other, DoubleArray):
+            other = other.array
+        try:
+            return len(self) == len(other) \
+                and bool((self.array == numpy.asarray(other)).all())
+        except (TypeError, ValueError):
+            return False
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.tolist())
+
+    def index(self, value):
+        positions = numpy.flatnonzero(self.array == value)
+        if not len(positions):
+            raise ValueError('{} is not in the array'.format(value))
+        return int(positions[0])
+
+    def count(self, value):
+        return int((self.array == value).sum())
+
+    def append(self, value, update_opposite=True):
+        value = self._as_value(value)
+        self._extend((value,))
+        self._notify(Kind.ADD, new=value)
+        self.owner._isset[self.feature] = None
+
+    def extend(self, values):
+        array = self._as_values(values)
+        self._extend(array)
+        self._notify(Kind.ADD_MANY, new=values)
+        self.owner._isset[self.feature] = None
+
+    update = extend
+
+    def insert(self, index, value):
+        value = self._as_value(value)
+        values = self.array
+        index = min(max(index + len(values) if index < 0 else index, 0),
+                    len(values))
+        self._reserve(self._size + 1)
+        data = self._data
+        data[index + 1:self._size + 1] = data[index:self._size].copy()
+        data[index] = value
+        self._size += 1
+        self._notify(Kind.ADD, new=value)
+        self.owner._isset[self.feature] = None
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            removed = self[index]
+            values = self._as_values(value)
+            if index.step in (None, 1):
+                start, stop, _ = index.indices(self._size)
+                stop = max(start, stop)
+                data = numpy.concatenate((self._data[:start], values,
+                                          self._data[stop:self._size]))
+                self._data, self._size = data, len(data)
+            else:  # extended slice, the sizes must be the same
+                self.array[index] = values
+            if len(removed) > 1:
+                self._notify(Kind.REMOVE_MANY, old=removed)
+            elif removed:
+                self._notify(Kind.REMOVE, old=removed[0])
+            if len(values) > 1:
+                self._notify(Kind.ADD_MANY, new=value)
+            elif len(values):
+                self._notify(Kind.ADD, new=float(values[0]))
+        else:
+            value = self._as_value(value)
+            self.array[index] = value
+            self._notify(Kind.ADD, new=value)
+        self.owner._isset[self.feature] = None
+
+    def __delitem__(self, index):
+        removed = self[index]
+        keep = numpy.ones(self._size, dtype=bool)
+        keep[index] = False
+        data = self.array[keep]
+        self._data, self._size = data, len(data)
+        if not isinstance(index, slice):
+            self._notify(Kind.REMOVE, old=removed)
+        elif removed:
+            self._notify(Kind.REMOVE_MANY, old=removed)
+
+    def pop(self, index=-1):
+        value = self[index]
+        del self[index]
+        return value
+
+    def remove(self, value, update_opposite=True):
+        del self[self.index(value)]
+
+    def clear(self):
+        if not self._size:
+            return
+        old = self.array.copy()
+        self._data = numpy.empty(0)
+        self._size = 0
+        self._notify(Kind.REMOVE_MANY, old=old)
+
+
+def enable_arrays(*features):
+    """Stores the values of the features (``ARRAY_FEATURES`` by default) in
+    ``DoubleArray`` for the objects created afterwards.
+    """
+    for feature in features or ARRAY_FEATURES:
+        feature.derived_class = DoubleArray
+
+
+def disable_arrays(*features):
+    """Goes back to the PyEcore lists for the features (``ARRAY_FEATURES`` by
+    default).
+    """
+    for feature in features or ARRAY_FEATURES:
+        feature.derived_class = ECollection
+
+
+def as_array(eobject, name):
+    """Converts the value of the name feature of eobject into a
+    ``DoubleArray`` (keeping its values) and gives it.
+    """
+    values = eobject.__getattribute__(name)
+    if isinstance(values, DoubleArray):
+        return values
+    feature = eobject.eClass.findEStructuralFeature(name)
+    array = DoubleArray(eobject, feature)
+    array._extend(array._as_values(list(values)))
+    eobject.__dict__[name] = array
+    return array
+
+
+def is_packed(value):
+    return value.startswith(PACKED_PREFIX)
+
+
+def pack_doubles(values):
+    """Gives the packed form of a double list."""
+    if isinstance(values, DoubleArray):
+        values = values.array
+    data = numpy.asarray(values, dtype=PACKED_DTYPE).tobytes()
+    return PACKED_PREFIX + b64encode(data).decode('ascii')
+
+
+def unpack_doubles(value):
+    """Gives the float64 NumPy array of a packed double list."""
+    data = b64decode(value[len(PACKED_PREFIX):])
+    return numpy.frombuffer(data, dtype=PACKED_DTYPE) \
+                .astype(numpy.float64)
@@ -0,0 +1,134 @@
+"""Parallel loading of many Geppetto XMI files.
+
+``load_files()`` parses the XMI files in a pool of processes, each file with
+the streaming loader (``model.xmi.GeppettoXMIResource``). A worker does not
+send the loaded objects back (pickling an object graph is as slow as
+parsing it), it sends the binary snapshot of the model (see
+``model.snapshot``), which the calling process decodes without any parsing.
+As the snapshots are decoded while the other files are still parsed, the
+load time of a batch goes down almost linearly with the number of processes,
+until the decoding of the snapshots in the calling process dominates::
+
+    from model.batch import load_files
+
+    for result in load_files(paths, rset):
+        if result.error is not None:
+            print(result.error)  # path, type and message of the error
+        else:
+            root = result.resource.contents[0]
+
+The resources are added to the resource set (a new one with the Geppetto
+packages registered if none is given), as if they were loaded with
+``rset.get_resource()``. The references between the files are resolved
+through the resource set.
+"""
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pyecore.resources import ResourceSet, URI
+from . import register
+from .snapshot import encode_snapshot, decode_snapshot
+from .xmi import GeppettoXMIResource
+
+__all__ = ['load_files', 'LoadResult', 'LoadError']
+
+
+class LoadError(Exception):
+    """Error raised while a file was loaded, possibly in another process.
+
+    The traceback of the original error is given by ``remote_traceback``.
+    """
+    def __init__(self, path, error_type, message, remote_traceback=None):
+        super().__init__(path, error_type, message)
+        self.path = path
+        self.error_type = error_type
+        self.message = message
+        self.remote_traceback = remote_traceback
+
+    def __str__(self):
+        return '{}: {}: {}'.format(self.path, self.error_type, self.message)
+
+
+class LoadResult(object):
+    """Outcome of the load of a file: its resource or its error."""
+    __slots__ = ('path', 'resource', 'error')
+
+    def __init__(self, path, resource=None, error=None):
+        self.path = path
+        self.resource = resource
+        self.error = error
+
+    def __repr__(self):
+        return '<LoadResult {} {}>'.format(
+            self.path, 'error' if self.error is not None else 'loaded')
+
+
+def new_resource_set():
+    rset = register(ResourceSet())
+    rset.resource_factory['xmi'] = GeppettoXMIResource
+    return rset
+
+
+def _error(path, error):
+    return LoadError(path, type(error).__name__, str(error),
+                     traceback.format_exc())
+
+
+def _load_snapshot(path, options):
+    # runs in a worker, the errors are sent back as values as they are not
+    # all picklable
+    try:
+        resource = new_resource_set().get_resource(URI(path),
+                                                   options=options)
+        return encode_snapshot(resource), None
+    except Exception as e:
+        error = _error(path, e)
+        return None, (error.error_type, error.message,
+                      error.remote_traceback)
+
+
+def _add_resource(rset, path, data):
+    resource = rset.create_resource(URI(path))
+    try:
+        decode_snapshot(resource, data)
+    except Exception:
+        rset.remove_resource(resource)
+        raise
+    return resource
+
+
+def load_files(paths, resource_set=None, processes=None, options=None):
+    """Loads the XMI files of paths in processes worker processes.
+
+    Gives a ``LoadResult`` for each path, in the order of paths. The
+    options are the load options of each file. With a single process, the
+    files are loaded in the calling process.
+    """
+    paths = list(paths)
+    rset = resource_set if resource_set is not None else new_resource_set()
+    register(rset)
+    results = [LoadResult(path) for path in paths]
+    processes = min(processes or os.cpu_count() or 1, len(paths))
+    if processes <= 1:
+        for result in results:
+            try:
+                result.resource = rset.get_resource(URI(result.path),
+                                                    options=options)
+            except Exception as e:
+                result.error = _error(result.path, e)
+        return results
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(_load_snapshot, path, options): result
+                   for path, result in zip(paths, results)}
+        for future in as_completed(futures):
+            result = futures[future]
+            try:
+                data, error = future.result()
+                if error is not None:
+                    result.error = LoadError(result.path, *error)
+                else:
+                    result.resource = _add_resource(rset, result.path, data)
+            except Exception as e:
+                result.error = _error(result.path, e)
+    return results
@@ -0,0 +1,174 @@
+"""Canonicalization of the strings of the loaded models.
+
+The Geppetto models repeat the same strings thousands of times: the ids and
+names (``bqmodel_isDescribedBy``, ``Description``...), the unit symbols, the
+texts of the annotations... and each occurrence read from a file is a new
+string. ``canonicalize()`` replaces each string value of the model objects
+by its interned copy (``sys.intern()``), so all the occurrences of a string
+share the same object, in a model and between all the models of the
+process::
+
+    from model.canonical import canonicalize
+
+    report = canonicalize(resource)
+    print(report)  # bytes saved for each class
+
+The values are replaced without notification, they are equal to the
+previous ones. The ids of the resource (``uuid_dict``) are interned as well.
+The content of the types a lazy resource has not built yet is left
+untouched (see ``model.xmi.GeppettoXMIOptions.LAZY_TYPES``), the streaming
+loader interns the strings while reading with the
+``GeppettoXMIOptions.INTERN_STRINGS`` option.
+
+The objects themselves are not shared: the ``Unit`` and ``Text`` values are
+contained by their owner, and the reference lists (``groupElements``...)
+notify their owner, so only their content is. ``model.compact`` shrinks
+these objects.
+"""
+import sys
+from pyecore.valuecontainer import EList, EOrderedSet, PyEcoreValue
+from .compact import CompactValue
+
+__all__ = ['canonicalize', 'CanonicalReport', 'Savings']
+
+# the holders of the feature values in the objects dictionary
+HOLDERS = (PyEcoreValue, CompactValue)
+
+
+class Savings(object):
+    """Strings replaced by their interned copy for a class."""
+    __slots__ = ('objects', 'strings', 'bytes')
+
+    def __init__(self):
+        self.objects = 0
+        self.strings = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        return '<Savings {} objects, {} strings, {} bytes>'.format(
+            self.objects, self.strings, self.bytes)
+
+
+class CanonicalReport(dict):
+    """``Savings`` of a canonicalization for each class name."""
+    @property
+    def bytes(self):
+        return sum(x.bytes for x in self.values())
+
+    @property
+    def strings(self):
+        return sum(x.strings for x in self.values())
+
+    def __str__(self):
+        line = '{:<28} {:>8} {:>8} {:>10}'
+        lines = [line.format('class', 'objects', 'strings', 'bytes')]
+        for name, savings in sorted(self.items(),
+                                    key=lambda x: -x[1].bytes):
+            lines.append(line.format(name, savings.objects, savings.strings,
+                                     savings.bytes))
+        lines.append(line.format('total', '', self.strings, self.bytes))
+        return '\n'.join(lines)
+
+
+def intern_string(value, savings=None):
+    """Gives the interned copy of value and counts it in savings if value is
+    a duplicate.
+    """
+    interned = sys.intern(value)
+    if interned is not value and savings is not None:
+        savings.strings += 1
+        savings.bytes += sys.getsizeof(value)
+    return interned
+
+
+def canonicalize(*targets, report=None):
+    """Interns the string values of targets (resources, or objects and their
+    content).
+
+    Gives the ``CanonicalReport`` of the strings replaced, the counts are
+    added to report if given.
+    """
+    report = CanonicalReport() if report is None else report
+    for target in targets:
+        if hasattr(target, 'contents'):
+            _canonicalize_ids(target)
+            roots = target.contents
+        else:
+            roots = [target]
+        for root in roots:
+            for obj in _walk(root):
+                _canonicalize(obj, report)
+    return report
+
+
+def _walk(root):
+    # the content of the deferred types is not built
+    stack = [root]
+    pop = stack.pop
+    push = stack.extend
+    while stack:
+        obj = pop()
+        yield obj
+        for value in obj.__dict__.values():
+            if not isinstance(value, HOLDERS):
+                continue
+            feature = value.feature
+            if not feature.is_reference or not feature.containment:
+                continue
+            if feature.many:
+                push(value)
+            else:
+                content = value._get()
+                if content is not None:
+                    stack.append(content)
+
+
+def _savings(report, obj):
+    name = obj.eClass.name
+    try:
+        return report[name]
+    except KeyError:
+        savings = report[name] = Savings()
+        return savings
+
+
+def _canonicalize(obj, report):
+    savings = _savings(report, obj)
+    savings.objects += 1
+    attributes = obj.__dict__
+    if isinstance(attributes.get('_internal_id'), str):
+        attributes['_internal_id'] = intern_string(
+            attributes['_internal_id'], savings)
+    for value in attributes.values():
+        if not isinstance(value, HOLDERS):
+            continue
+        feature = value.feature
+        if not feature.is_attribute:
+            continue
+        if not feature.many:
+            if type(value._value) is str:
+                value._value = intern_string(value._value, savings)
+        elif isinstance(value, EList):
+            for i, item in enumerate(value):
+                if type(item) is str:
+                    list.__setitem__(value, i, intern_string(item, savings))
+        elif isinstance(value, EOrderedSet):
+            # the items and the keys of their index (equal to them)
+            items, indexes = value.items, value.map
+            for i, item in enumerate(items):
+                if type(item) is str:
+                    interned = items[i] = intern_string(item, savings)
+                    indexes[interned] = indexes.pop(item)
+
+
+def _canonicalize_ids(resource):
+    ids = getattr(resource, 'uuid_dict', None)
+    if not ids:
+        return
+    # the ids are the values of the id attributes, they are not counted
+    # twice
+    canonical = {}
+    for key, eobject in ids.items():
+        canonical[intern_string(key) if type(key) is str else key] = eobject
+    ids.clear()
+    ids.update(canonical)
@@ -0,0 +1,486 @@
+"""Copies of Geppetto models and of their subtrees.
+
+``clone()`` copies an object and its content. The objects are built
+directly, like the snapshot decoder does, instead of going through the
+PyEcore setters, and the references between the copied objects are remapped
+to the copies with the map of the copies (original -> copy). The references
+to objects that are not copied (_e.g_: the library types of a cloned
+variable) keep their target::
+
+    from model.clone import clone
+
+    session_model = clone(base_model)
+    network_copy = clone(network_type)
+
+``Fork`` gives a copy-on-write copy of a ``GeppettoModel``: the variables,
+data sources, queries and tags are copied, while the types of the
+libraries stay shared with the base model, listed in the ``sharedTypes`` of
+the libraries of the fork. A shared type is copied in the fork, and the
+references of the fork are moved to the copy, on its first edit::
+
+    from model.clone import Fork
+
+    fork = Fork(base_model)
+    fork.model  # the GeppettoModel of the fork
+    soma = fork.edit(soma)  # the copy of soma in the fork, can be modified
+    soma.initialValues[0].value.value = -70
+
+The types that refer to an edited type are copied as well, so the fork
+keeps a consistent view. The shared objects are not modified by the fork:
+the references from the fork to the objects of the base model are recorded
+by the fork instead of the base side (their ``referencedVariables`` or their
+inverse references), and the modifications of a shared type made in the
+base model are seen by all the forks. This holds for the PyEcore
+modifications of the objects of the fork as well (the objects added to the
+fork included)::
+
+    variable.types.remove(shared_type)  # the shared type is not modified
+    variable.types.append(other_type)  # same
+    fork.edit(other_type)  # variable refers to the copy
+"""
+import gc
+from itertools import chain
+from ordered_set import OrderedSet
+from pyecore.ecore import EProxy
+from pyecore.valuecontainer import EValue, ECollection
+from .model import GeppettoModel, GeppettoLibrary
+from .types import Type
+from .snapshot import (feature_kind, all_features, value_factory, fill,
+                       contain, REFERENCE, CONTAINMENT, MANY)
+from .arrays import DoubleArray
+
+__all__ = ['clone', 'Copier', 'Fork']
+
+# the references kept as the opposite of another one, they are rebuilt when
+# the other one is copied
+BACK_REFERENCES = (Type.referencedVariables,)
+
+
+def clone(eobject, mapping=None):
+    """Gives a copy of eobject and of its content.
+
+    mapping is the map of the copies (original -> copy), filled by the
+    copy; the references to the objects it holds are remapped as well.
+    """
+    copier = Copier(mapping)
+    copy = copier.copy(eobject)
+    copier.copy_references()
+    return copy
+
+
+class _ClassPlan(object):
+    """How the features of an EClass are copied."""
+    __slots__ = ('attributes', 'containments', 'references')
+
+    def __init__(self, eclass):
+        self.attributes = []
+        self.containments = []
+        self.references = []
+        for feature in all_features(eclass):
+            if feature in BACK_REFERENCES:
+                continue
+            kind = feature_kind(feature)
+            if kind is None:
+                continue
+            entry = (feature, feature.name, bool(kind & MANY),
+                     value_factory(feature))
+            if kind & ~MANY == CONTAINMENT:
+                self.containments.append(entry)
+            elif kind & ~MANY == REFERENCE:
+                self.references.append(entry)
+            else:
+                self.attributes.append(entry)
+
+
+class Copier(object):
+    """Copies objects and their content, see ``clone()``.
+
+    ``copy()`` copies the objects and their attributes, the references are
+    set by ``copy_references()`` once all the copies exist. The objects of
+    shared (and their content) are not copied.
+
+    The references to the objects that are not copied are recorded on their
+    side (opposite or inverse references) only if link_external.
+    """
+    _plans = {}
+
+    def __init__(self, mapping=None, shared=(), link_external=True):
+        self.mapping = {} if mapping is None else mapping
+        self.shared = shared
+        self.link_external = link_external
+        self.external = []  # (copy, feature, target) to shared objects
+        self._references = []
+
+    @classmethod
+    def plan(cls, eclass):
+        try:
+            return cls._plans[eclass]
+        except KeyError:
+            plan = cls._plans[eclass] = _ClassPlan(eclass)
+            return plan
+
+    def copy(self, eobject):
+        """Gives the copy of eobject and of its content, without their
+        references.
+        """
+        # building the objects creates lots of containers, the garbage
+        # collector would try to collect them over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._copy(eobject)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _copy(self, eobject):
+        mapping = self.mapping
+        shared = self.shared
+        references = self._references
+        copy = eobject.eClass.python_class()
+        mapping[eobject] = copy
+        stack = [(eobject, copy)]
+        pending = []
+        while stack:
+            original, copy = stack.pop()
+            plan = self.plan(original.eClass)
+            isset = original._isset
+            attributes = copy.__dict__
+            # the features are set in the same order as in the original
+            copy._isset.update(dict.fromkeys(isset))
+            for feature, name, many, new_value in plan.attributes:
+                if feature not in isset:
+                    continue
+                value = original.__getattribute__(name)
+                if not many:
+                    attributes[name] = new_value(copy, value)
+                else:
+                    values = copy.__getattribute__(name)
+                    if isinstance(value, DoubleArray):
+                        value = value.array if isinstance(
+                            values, DoubleArray) else value.tolist()
+                    fill(values, value)
+                copy._isset[feature] = None
+            for feature, name, many, new_value in plan.containments:
+                if feature not in isset:
+                    continue
+                value = original.__getattribute__(name)
+                children = list(value) if many else [value]
+                copies = []
+                for child in children:
+                    if child is None or child in shared:
+                        continue
+                    child_copy = child.eClass.python_class()
+                    mapping[child] = child_copy
+                    copies.append((child, child_copy))
+                if copies:
+                    contain(copy, feature, [x for _, x in copies], new_value)
+                    # the content is copied in document order
+                    pending.extend(copies)
+                elif not many and value is None:
+                    attributes[name] = new_value(copy, None)
+                    copy._isset[feature] = None
+            for entry in plan.references:
+                if entry[0] in isset:
+                    references.append((original, copy, entry))
+            stack.extend(reversed(pending))
+            del pending[:]
+        return self.mapping[eobject]
+
+    def copy_references(self):
+        """Sets the references of the copies, the targets that have been
+        copied are replaced by their copy.
+        """
+        mapping = self.mapping
+        external = self.external
+        for original, copy, (feature, name, many, new_value) \
+                in self._references:
+            value = original.__getattribute__(name)
+            opposite = feature.eOpposite
+            targets = []
+            for target in (value if many else [value]):
+                target_copy = mapping.get(target)
+                if target_copy is not None:
+                    targets.append(target_copy)
+                    _link_back(target_copy, copy, feature)
+                    continue
+                targets.append(target)
+                if target is not None:
+                    external.append((copy, feature, target))
+                    if self.link_external:
+                        _link_back(target, copy, feature)
+            if many:
+                fill(copy.__getattribute__(name), targets)
+            else:
+                copy.__dict__[name] = new_value(copy, targets[0])
+            copy._isset[feature] = None
+        self._references = []
+
+
+class Fork(object):
+    """Copy-on-write copy of a ``GeppettoModel``, see the module."""
+    def __init__(self, base):
+        if not isinstance(base, GeppettoModel):
+            raise TypeError('a fork is made of a GeppettoModel, not of a {}'
+                            .format(type(base).__name__))
+        self.base = base
+        self.mapping = {}
+        self._users = {}  # shared object -> [(fork object, feature)]
+        self._libraries = {}  # base library -> fork library
+        shared = set()
+        for library in base.libraries:
+            shared.update(library.types)
+        copier = Copier(self.mapping, shared, link_external=False)
+        self.model = copier.copy(base)
+        copier.copy_references()
+        for library in base.libraries:
+            library_copy = self.mapping[library]
+            self._libraries[library] = library_copy
+            self._link(library_copy, GeppettoLibrary.sharedTypes,
+                       list(library.types))
+        self._record(copier.external)
+        self._adopt(self.model)
+
+    def _record(self, external):
+        for copy, feature, target in external:
+            self._use(target, copy, feature)
+
+    def _use(self, target, source, feature, remove=False):
+        """Records (or forgets) the reference of source to target, an
+        object of the base model.
+        """
+        users = self._users
+        if not remove:
+            try:
+                users[target].append((source, feature))
+            except KeyError:
+                users[target] = [(source, feature)]
+            return
+        sources = users.get(target, ())
+        if (source, feature) in sources:
+            sources.remove((source, feature))
+            if not sources:
+                del users[target]
+
+    def _in_base(self, eobject):
+        """Tells if eobject is a part of the base model."""
+        return eobject is not None and not isinstance(eobject, EProxy) \
+            and eobject.eRoot() is self.base
+
+    def _adopt(self, eobject):
+        """Makes the PyEcore modifications of the references of the
+        objects of the eobject subtree go through the fork. The references
+        to the base model already recorded on the base side are moved to
+        the fork.
+        """
+        for obj in chain([eobject], eobject.eAllContents()):
+            plan = Copier.plan(obj.eClass)
+            attributes = obj.__dict__
+            isset = obj._isset
+            for _, name, _, _ in plan.containments:
+                obj.__getattribute__(name)  # the EValue is built if required
+                self._own(attributes[name])
+            for feature, name, many, _ in plan.references:
+                value = obj.__getattribute__(name)
+                self._own(attributes[name])
+                if feature not in isset:
+                    continue
+                for target in (value if many else [value]):
+                    if _linked_back(target, obj, feature) \
+                            and self._in_base(target):
+                        _unlink_back(target, obj, feature)
+                        self._use(target, obj, feature)
+
+    def _own(self, value):
+        if isinstance(value, (_ForkValue, _ForkCollection)) \
+                or not isinstance(value, (EValue, ECollection)):
+            return
+        value.__class__ = _fork_class(type(value))
+        value.fork = self
+
+    @staticmethod
+    def _link(eobject, feature, targets):
+        # the shared side of the reference is not modified
+        fill(eobject.__getattribute__(feature.name), targets)
+        eobject._isset[feature] = None
+
+    def shared_type(self, eobject):
+        """Gives the shared type that contains eobject (or is eobject), or
+        None if eobject is not shared by the fork.
+        """
+        while eobject is not None:
+            container = eobject._container
+            if container in self._libraries and eobject not in self.mapping:
+                return eobject
+            eobject = container
+        return None
+
+    def is_shared(self, eobject):
+        """Tells if eobject is shared with the base model."""
+        return self.shared_type(eobject) is not None
+
+    def edit(self, eobject):
+        """Gives the object of the fork that can be modified in place of
+        eobject: its copy if it is a shared object (its type is copied in the
+        fork on the first edit), eobject itself if it belongs to the fork.
+        """
+        copy = self.mapping.get(eobject)
+        if copy is not None:
+            return copy
+        shared = self.shared_type(eobject)
+        if shared is None:
+            if eobject.eRoot() is not self.model:
+                raise ValueError('{!r} is not a part of the fork'
+                                 .format(eobject))
+            return eobject
+        self._copy_type(shared)
+        return self.mapping[eobject]
+
+    def _copy_type(self, shared):
+        library = self._libraries[shared._container]
+        copier = Copier(self.mapping, link_external=False)
+        copy = copier.copy(shared)
+        copied = [shared]
+        copied.extend(shared.eAllContents())
+        copier.copy_references()
+        _replace(library.sharedTypes, shared, None)
+        library.types.append(copy)
+        self._record(copier.external)
+
+        # the references of the fork move to the copy
+        for original in copied:
+            for user, feature in self._users.pop(original, ()):
+                self._retarget(user, feature, original, self.mapping[original])
+        # and the shared types that refer to the type are copied as well
+        referrers = []
+        for original in copied:
+            sources = chain((x for x, _ in original._inverse_rels),
+                            original.referencedVariables
+                            if isinstance(original, Type) else ())
+            for source in sources:
+                referrer = self.shared_type(source)
+                if referrer is not None and referrer not in referrers:
+                    referrers.append(referrer)
+        for referrer in referrers:
+            if referrer not in self.mapping:
+                self._copy_type(referrer)
+
+    def _retarget(self, user, feature, original, copy):
+        name = feature.name
+        if feature.many:
+            _replace(user.__getattribute__(name), original, copy)
+        else:
+            user.__dict__[name] = value_factory(feature)(user, copy)
+            self._own(user.__dict__[name])
+        _link_back(copy, user, feature)
+
+
+class _ForkValue(object):
+    """Single valued feature of an object of a fork, see
+    ``Fork._adopt()``.
+    """
+    def _set(self, value, update_opposite=True):
+        fork = self.fork
+        previous = self._value
+        if not self.is_ref or self.is_cont or not update_opposite \
+                or not (fork._in_base(previous) or fork._in_base(value)):
+            super()._set(value, update_opposite)
+            if self.is_cont and value is not None:
+                fork._adopt(value)
+            return
+        super()._set(value, update_opposite=False)
+        owner, feature = self.owner, self.feature
+        for target, remove in ((previous, True), (value, False)):
+            if target is None:
+                continue
+            if fork._in_base(target):
+                fork._use(target, owner, feature, remove)
+            elif remove:
+                _unlink_back(target, owner, feature)
+            else:
+                _link_back(target, owner, feature)
+
+
+class _ForkCollection(object):
+    """Many valued feature of an object of a fork, see
+    ``Fork._adopt()``.
+    """
+    def _update_opposite(self, owner, new_value, remove=False):
+        # owner is the target of the reference and new_value its source
+        fork = self.fork
+        if self.is_cont:
+            super()._update_opposite(owner, new_value, remove)
+            if not remove:
+                fork._adopt(owner)
+        elif fork._in_base(owner):
+            fork._use(owner, new_value, self.feature, remove)
+        else:
+            super()._update_opposite(owner, new_value, remove)
+
+
+_fork_classes = {}
+
+
+def _fork_class(cls):
+    try:
+        return _fork_classes[cls]
+    except KeyError:
+        mixin = _ForkValue if issubclass(cls, EValue) else _ForkCollection
+        fork_class = _fork_classes[cls] = type(cls.__name__, (mixin, cls), {})
+        return fork_class
+
+
+def _link_back(target, source, feature):
+    """Records the reference of source to target on the side of target."""
+    opposite = feature.eOpposite
+    if opposite is None:
+        if not isinstance(target, EProxy):
+            target._inverse_rels.add((source, feature))
+        return
+    if opposite.many:
+        fill(target.__getattribute__(opposite.name), [source])
+    else:
+        target.__dict__[opposite.name] = value_factory(opposite)(target,
+                                                                 source)
+    target._isset[opposite] = None
+
+
+def _linked_back(target, source, feature):
+    """Tells if the reference of source to target is recorded on the side
+    of target.
+    """
+    if target is None or isinstance(target, EProxy):
+        return False
+    opposite = feature.eOpposite
+    if opposite is None:
+        return (source, feature) in target._inverse_rels
+    value = target.__getattribute__(opposite.name)
+    return source in value if opposite.many else value is source
+
+
+def _unlink_back(target, source, feature):
+    """Forgets the reference of source to target on the side of target."""
+    opposite = feature.eOpposite
+    if opposite is None:
+        if not isinstance(target, EProxy):
+            target._inverse_rels.discard((source, feature))
+        return
+    if opposite.many:
+        _replace(target.__getattribute__(opposite.name), source, None)
+    else:
+        target.__dict__[opposite.name] = value_factory(opposite)(target,
+                                                                 None)
+
+
+def _replace(collection, value, new_value):
+    """Replaces value by new_value (removes it if None) in a PyEcore
+    collection, without any notification.
+    """
+    values = [new_value if x is value else x for x in collection]
+    if new_value is None:
+        values = [x for x in values if x is not None]
+    if isinstance(collection, list):
+        list.clear(collection)
+    else:
+        OrderedSet.clear(collection)
+    fill(collection, values)
@@ -0,0 +1,160 @@
+"""Coloring of the segments of a morphology by visual group.
+
+A ``VisualGroup`` colors the segments of its ``CompositeVisualType``: each
+segment that refers to one of the group elements (``groupElements``) gets
+either a color of the group spectrum, from ``lowSpectrumColor`` to
+``highSpectrumColor`` according to the value of the element ``parameter``,
+or the element ``defaultColor``. ``GroupColoring`` computes the colors of all
+the segments at once::
+
+    from model.coloring import GroupColoring
+
+    coloring = GroupColoring(morphology_type)
+    coloring.colors(group)  # (N, 3) uint8 RGB array, one row per segment
+    coloring.colors(group, values=voltages)  # live values, one per segment
+    coloring.buffer(group)  # packed 0xRRGGBB uint32 little-endian buffer
+
+The segments are the rows of ``model.morphology.MorphologyTable``. The
+membership of the segments in the elements of a group is computed once, the
+parameter values are read at each call so they can change between frames.
+"""
+import numpy
+from .morphology import MorphologyTable
+
+__all__ = ['GroupColoring', 'parse_color', 'DEFAULT_COLOR']
+
+DEFAULT_COLOR = 0x808080
+
+
+def parse_color(color):
+    """Gives the 0xRRGGBB int of a Geppetto color (``0XFF0000``, ``#ff0000``
+    or an int), or None.
+    """
+    if color is None or isinstance(color, int):
+        return color
+    color = color.strip().lstrip('#')
+    if color[:2] in ('0X', '0x'):
+        color = color[2:]
+    try:
+        return int(color, 16)
+    except ValueError:
+        return None
+
+
+def _rgb(colors):
+    colors = numpy.asarray(colors, dtype=numpy.uint32)
+    return numpy.stack(((colors >> 16) & 0xFF, (colors >> 8) & 0xFF,
+                        colors & 0xFF), axis=-1).astype(float)
+
+
+class _GroupMembers(object):
+    """Elements of a group and the element of each segment."""
+    __slots__ = ('elements', 'segment_elements', 'default_colors')
+
+    def __init__(self, group, table):
+        self.elements = list(group.visualGroupElements)
+        bits = table.group_bits(self.elements)
+        if self.elements:
+            # the first element of the group the segment belongs to
+            self.segment_elements = numpy.where(bits.any(axis=1),
+                                                bits.argmax(axis=1), -1)
+        else:
+            self.segment_elements = numpy.full(len(table), -1)
+        self.default_colors = numpy.array(
+            [-1 if color is None else color
+             for color in (parse_color(x.defaultColor)
+                           for x in self.elements)], dtype=numpy.int64)
+
+
+class GroupColoring(object):
+    """Colors the segments of a ``CompositeVisualType`` by visual group."""
+    def __init__(self, visual_type):
+        if isinstance(visual_type, MorphologyTable):
+            self.table = visual_type
+        else:
+            self.table = MorphologyTable(visual_type)
+        self._members = {}
+
+    def members(self, group):
+        try:
+            return self._members[group]
+        except KeyError:
+            members = self._members[group] = _GroupMembers(group, self.table)
+            return members
+
+    def element_values(self, group):
+        """Gives the (K,) float64 array of the parameter values of the group
+        elements (NaN for an element without parameter).
+        """
+        return numpy.array([numpy.nan if x.parameter is None
+                            else x.parameter.value
+                            for x in self.members(group).elements],
+                           dtype=float)
+
+    def colors(self, group, values=None, limits=None, default=DEFAULT_COLOR):
+        """Gives the (N, 3) uint8 RGB colors of the segments for group.
+
+        Without values, a segment of an element of the group is colored
+        through the spectrum of the group according to the parameter value of
+        the element, or gets the element default color. With values (one per
+        segment), every segment of the group with a finite value is colored
+        through the spectrum. The spectrum goes from the min to the max of the
+        values, unless limits gives them. The other segments get the default
+        color (``DEFAULT_COLOR`` if None).
+
+        The parameter values are used as stored, their ``scalingFactor`` is
+        not applied: it does not change the colors of elements that share it
+        as the spectrum is relative, but limits must be given in the same
+        unit as the values.
+        """
+        default_color = parse_color(DEFAULT_COLOR if default is None
+                                    else default)
+        if default_color is None:
+            raise ValueError('Invalid default color {!r}'.format(default))
+        members = self.members(group)
+        segment_elements = members.segment_elements
+        size = len(segment_elements)
+        colors = numpy.empty((size, 3))
+        colors[:] = _rgb(default_color)
+        member = segment_elements >= 0
+        elements = segment_elements[member]
+
+        defaults = members.default_colors[elements]
+        has_default = defaults >= 0
+        rows = numpy.flatnonzero(member)[has_default]
+        colors[rows] = _rgb(defaults[has_default])
+
+        if values is None:
+            segment_values = numpy.full(size, numpy.nan)
+            segment_values[member] = self.element_values(group)[elements]
+        else:
+            segment_values = numpy.asarray(values, dtype=float)
+            if segment_values.shape != (size,):
+                raise ValueError('Expected {} values, got {}'
+                                 .format(size, segment_values.shape))
+        low = parse_color(group.lowSpectrumColor)
+        high = parse_color(group.highSpectrumColor)
+        valued = member & numpy.isfinite(segment_values)
+        if low is not None and high is not None and valued.any():
+            ratios = self._ratios(segment_values[valued], limits)
+            low, high = _rgb(low), _rgb(high)
+            colors[valued] = low + ratios[:, None] * (high - low)
+        return numpy.rint(colors).astype(numpy.uint8)
+
+    @staticmethod
+    def _ratios(values, limits):
+        if limits is None:
+            limits = values.min(), values.max()
+        low, high = limits
+        if high == low:
+            return numpy.zeros(len(values))
+        return numpy.clip((values - low) / (high - low), 0, 1)
+
+    def buffer(self, group, values=None, limits=None, default=DEFAULT_COLOR):
+        """Gives the colors of ``colors()`` as a buffer of little-endian
+        uint32 0xRRGGBB values, one per segment.
+        """
+        colors = self.colors(group, values, limits, default) \
+                     .astype(numpy.uint32)
+        packed = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+        return packed.astype('<u4').tobytes()
@@ -0,0 +1,306 @@
+"""Compact storage of the most numerous Geppetto values.
+
+The ``PhysicalQuantity`` (each one with its ``Unit``), ``Point``,
+``Cylinder`` and ``Text`` values are by far the most numerous objects of the
+Geppetto models, and each PyEcore object carries a lot of bookkeeping: an
+``EValue`` (an object and its dict) for each of its features, the lists of
+its listeners, the set of the references to it and an entry in the weak set
+of all the instances. ``compact()`` shrinks the objects of these classes:
+
+* the ``EValue`` of each single valued feature is replaced by a
+  ``CompactValue`` (an object with slots), the ``EValue`` is built again
+  when the feature is modified,
+* the set of the features that are set (``_isset``) is given by the
+  ``CompactValue`` of the object, it is stored again when a feature is set,
+* the empty lists of listeners, the set of the references when it only holds
+  the container of the object and the bookkeeping attributes that have their
+  default value are removed, they are given by the class until a listener or
+  a reference is added,
+* the unit strings (``pS``, ``mV``...) are interned, all the units with the
+  same symbol share the same string.
+
+``enable_compact()`` makes the objects of these classes created afterwards
+start without this bookkeeping as well::
+
+    from model.compact import compact, enable_compact
+
+    enable_compact()
+    resource = rset.get_resource(URI('model.xmi'))
+    compact(resource)
+
+The objects stay regular PyEcore objects, with the same features, the same
+notifications and the same serialization. They are not listed by
+``EObject.allInstances()`` though, and the objects that have listeners are
+not compacted.
+"""
+import sys
+from itertools import chain
+from pyecore.ecore import EObject, InternalSet
+from pyecore.valuecontainer import EValue
+from .values import PhysicalQuantity, Unit, Point, Cylinder, Text
+
+__all__ = ['CompactValue', 'compact_value', 'COMPACT_CLASSES', 'compact',
+           'enable_compact', 'disable_compact']
+
+COMPACT_CLASSES = (PhysicalQuantity, Unit, Point, Cylinder, Text)
+# bookkeeping attributes of the objects and their default value
+DEFAULTS = (('_internal_id', None), ('_eresource', None))
+
+
+class CompactValue(object):
+    """Stands for the ``EValue`` of a single valued feature of a compact
+    object, the ``EValue`` is built when the value is modified.
+
+    There is a subclass for each feature (see ``compact_value()``), the
+    feature is a class attribute.
+    """
+    __slots__ = ('owner', '_value')
+    feature = None
+
+    def __init__(self, owner, value):
+        self.owner = owner
+        self._value = value
+
+    def _get(self):
+        return self._value
+
+    def _expand(self):
+        attributes = self.owner.__dict__
+        if '_isset' not in attributes:
+            attributes['_isset'] = _isset(self.owner)
+        evalue = EValue(self.owner, self.feature)
+        evalue._value = self._value
+        attributes[self.feature._name] = evalue
+        return evalue
+
+    def _set(self, value, update_opposite=True):
+        self._expand()._set(value, update_opposite)
+
+    def remove_or_unset(self, value, update_opposite=True):
+        self._expand().remove_or_unset(value, update_opposite)
+
+    def __getattr__(self, name):
+        # any other use of the EValue
+        return getattr(self._expand(), name)
+
+
+_compact_values = {}
+
+
+def compact_value(feature):
+    """Gives the ``CompactValue`` class of feature."""
+    try:
+        return _compact_values[feature]
+    except KeyError:
+        # the feature is a descriptor, it cannot be a plain class attribute
+        cls = type('CompactValue', (CompactValue,),
+                   {'__slots__': (), 'feature': _Constant(feature)})
+        _compact_values[feature] = cls
+        return cls
+
+
+class _Listeners(list):
+    """The empty list of listeners of a compact object, stored in the object
+    when a listener is added.
+    """
+    __slots__ = ('owner', 'name')
+
+    def _stored(self):
+        return self.owner.__dict__.setdefault(self.name, self)
+
+    def append(self, listener):
+        list.append(self._stored(), listener)
+
+    def extend(self, listeners):
+        list.extend(self._stored(), listeners)
+
+    def insert(self, index, listener):
+        list.insert(self._stored(), index, listener)
+
+
+class _ListenersDescriptor(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        listeners = _Listeners()
+        listeners.owner = instance
+        listeners.name = self.name
+        return listeners
+
+
+class _InverseRels(set):
+    """The ``_inverse_rels`` of a compact object that is only referred to by
+    its container, built from its container each time it is accessed. It is
+    stored in the object when another reference is added.
+
+    PyEcore updates the container of an object before its ``_inverse_rels``,
+    so the containment references are always up to date here: they are not
+    added or removed.
+    """
+    __slots__ = ('owner',)
+
+    def add(self, rel):
+        if rel in self or rel[1].containment:
+            return
+        self.owner.__dict__['_inverse_rels'] = set(self) | {rel}
+
+    def remove(self, rel):
+        if rel in self:
+            self.owner.__dict__['_inverse_rels'] = set(self) - {rel}
+
+    discard = remove
+
+
+class _InverseRelsDescriptor(object):
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        rels = _InverseRels(_containment_rels(instance))
+        rels.owner = instance
+        return rels
+
+
+class _IssetView(InternalSet):
+    """The ``_isset`` of a compact object, built from its ``CompactValue``
+    each time it is accessed. It is stored in the object when a feature is
+    set.
+    """
+    __slots__ = ('owner',)
+
+    def __setitem__(self, feature, value):
+        attributes = self.owner.__dict__
+        if attributes.get('_isset') is not self:
+            attributes['_isset'] = _isset(self.owner)
+        attributes['_isset'].setdefault(feature, value)
+
+    add = __setitem__
+
+
+class _IssetDescriptor(object):
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        view = _IssetView((x.feature, None)
+                          for x in instance.__dict__.values()
+                          if isinstance(x, CompactValue))
+        view.owner = instance
+        return view
+
+
+def _isset(obj):
+    return InternalSet((x.feature, None) for x in obj.__dict__.values()
+                       if isinstance(x, CompactValue))
+
+
+class _Constant(object):
+    def __init__(self, value):
+        self.value = value
+
+    def __get__(self, instance, owner=None):
+        return self.value
+
+
+class _Self(object):
+    """The ``dyn_inst`` of a static object is the object itself."""
+    def __get__(self, instance, owner=None):
+        return self if instance is None else instance
+
+
+def _containment_rels(obj):
+    # _inverse_rels of an object that is only referred to by its container
+    feature = obj._containment_feature
+    if feature is not None and feature.eOpposite is None:
+        return {(obj._container, feature)}
+    return set()
+
+
+def _new(cls, *args, **kwargs):
+    instance = object.__new__(cls)
+    attributes = instance.__dict__
+    attributes['_isset'] = InternalSet()
+    attributes['_container'] = None
+    attributes['_containment_feature'] = None
+    attributes['_staticEClass'] = False
+    return instance
+
+
+def _install():
+    # the defaults only apply to the objects that do not have the
+    # attributes, the other objects are not affected
+    for cls in COMPACT_CLASSES:
+        if '_inverse_rels' in vars(cls):
+            continue
+        cls.listeners = _ListenersDescriptor('listeners')
+        cls._eternal_listener = _ListenersDescriptor('_eternal_listener')
+        cls._inverse_rels = _InverseRelsDescriptor()
+        cls.dyn_inst = _Self()
+        cls._isset = _IssetDescriptor()
+        for name, default in DEFAULTS:
+            setattr(cls, name, default)
+
+
+def enable_compact():
+    """Creates the objects of ``COMPACT_CLASSES`` without bookkeeping."""
+    _install()
+    for cls in COMPACT_CLASSES:
+        cls.__new__ = staticmethod(_new)
+
+
+def disable_compact():
+    """Goes back to the PyEcore objects for the objects created afterwards
+    (the existing compact objects stay compact).
+    """
+    for cls in COMPACT_CLASSES:
+        if '__new__' in vars(cls):
+            del cls.__new__
+
+
+def compact(*targets):
+    """Compacts the objects of ``COMPACT_CLASSES`` of targets (resources,
+    or objects and their content).
+    """
+    _install()
+    instances = EObject._instances
+    for target in targets:
+        roots = target.contents if hasattr(target, 'contents') else [target]
+        for root in roots:
+            for obj in chain([root], root.eAllContents()):
+                if isinstance(obj, COMPACT_CLASSES):
+                    _compact(obj)
+                    instances.discard(obj)
+
+
+def _compact(obj):
+    attributes = obj.__dict__
+    if attributes.get('listeners') or attributes.get('_eternal_listener'):
+        return
+    attributes.pop('listeners', None)
+    attributes.pop('_eternal_listener', None)
+    for name, default in DEFAULTS:
+        if name in attributes and attributes[name] is default:
+            del attributes[name]
+    if attributes.get('dyn_inst') is obj:
+        del attributes['dyn_inst']
+    if '_inverse_rels' in attributes and \
+            attributes['_inverse_rels'] == _containment_rels(obj):
+        del attributes['_inverse_rels']
+    isset = attributes['_isset']
+    for name, value in list(attributes.items()):
+        if type(value) is not EValue:
+            continue
+        feature = value.feature
+        if feature not in isset and \
+                value._value == feature.get_default_value():
+            # built when the feature was read
+            del attributes[name]
+        else:
+            attributes[name] = compact_value(feature)(obj, value._value)
+    if list(isset) == list(_isset(obj)):
+        del attributes['_isset']
+    value = attributes.get('unit')
+    if isinstance(obj, Unit) and value is not None and \
+            isinstance(value._value, str):
+        value._value = sys.intern(value._value)
@@ -0,0 +1,485 @@
+"""Sparse connectivity graph of the ``Connection`` values of a resource.
+
+The network models hold their connections as ``Connection`` values, each one
+with the ``Pointer`` to its pre (``a``) and post (``b``) synaptic endpoint.
+``ConnectivityGraph`` compiles all the connections of a resource into
+compressed sparse arrays, by rows (CSR, the connections going out of an
+endpoint) and by columns (CSC, the connections coming in), so the fan-in,
+fan-out, degrees and neighbourhoods of the endpoints are computed without
+walking the model::
+
+    from model.connectivity import ConnectivityGraph
+
+    graph = ConnectivityGraph.of(resource)
+    graph.fan_out('network.population0[3]')  # Connection values
+    graph.successors(connection.a)  # numbers of the post synaptic nodes
+    graph.degree_histogram('in')
+    graph.neighbourhood('network.population0[3]', hops=2)
+
+The nodes of the graph are the endpoints of the connections, numbered in
+the order they are found. An endpoint is the resolved target of a pointer:
+the variable and the index of each of its elements. The endpoints are given
+as a ``Pointer``, as an instance path (see ``Pointer.getInstancePath()``) or
+as a node number. A ``DIRECTIONAL`` connection goes from ``a`` to ``b``, the
+other ones go both ways. A node is removed with its last connection, its
+number is not used again.
+
+The graph listens to the notifications of the resource and is updated when
+connections are added, removed or modified. The connections added since the
+arrays were compiled are kept aside and merged with the arrays by the
+queries, the removed ones are masked, and the arrays are compiled again
+when there are too many of them.
+
+Building the graph builds the deferred types of a lazy ``GeppettoXMIResource``
+(the connections are usually held by the library types).
+"""
+from itertools import chain
+import numpy
+from pyecore.notification import EObserver, Kind
+from .model import Node
+from .values import Connection, Connectivity, Pointer, PointerElement
+
+__all__ = ['ConnectivityGraph']
+
+DIRECTIONS = ('out', 'in', 'both')
+# the connections added or removed since the arrays were compiled are merged
+# by the queries until there are more than MIN_PENDING of them and more than
+# 1 / PENDING_RATIO of the compiled ones
+MIN_PENDING = 1024
+PENDING_RATIO = 8
+
+
+def endpoint_of(pointer):
+    """Gives the endpoint a pointer refers to, or None if it is empty."""
+    endpoint = tuple((x.variable, x.index) for x in pointer.elements)
+    return endpoint or None
+
+
+def endpoint_path(endpoint):
+    """Gives the instance path of an endpoint."""
+    segments = []
+    for variable, index in endpoint:
+        segment = '' if variable is None else variable.id or ''
+        if index is not None and index > -1:
+            segment = '{}[{}]'.format(segment, index)
+        segments.append(segment)
+    return '.'.join(segments)
+
+
+def _compress(rows, columns, numbers, size):
+    # compressed rows: the columns and connection numbers of the row i are
+    # at indptr[i]:indptr[i + 1]
+    order = numpy.argsort(rows, kind='stable')
+    indptr = numpy.zeros(size + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, columns[order], numbers[order]
+
+
+def _gather(compressed, nodes):
+    # columns and connection numbers of all the rows of nodes
+    indptr, columns, numbers = compressed
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+    positions = offsets + numpy.arange(lengths.sum())
+    return columns[positions], numbers[positions]
+
+
+class ConnectivityGraph(EObserver):
+    """Sparse adjacency of the connections of a resource."""
+    def __init__(self, resource):
+        super().__init__()
+        self.resource = resource
+        self._roots = []
+        self.invalidate()
+        resource.listeners.append(self)
+
+    @classmethod
+    def of(cls, resource):
+        """Gives the connectivity graph of resource, creates it if
+        required.
+        """
+        try:
+            return resource._connectivity_graph
+        except AttributeError:
+            graph = resource._connectivity_graph = cls(resource)
+            return graph
+
+    def invalidate(self):
+        """Forgets everything, the graph is built again on demand."""
+        self._built = False
+        self._nodes = {}  # endpoint -> node number
+        self._endpoints = []  # node number -> endpoint or None
+        self._node_connections = []  # node number -> connections
+        self._removed_nodes = 0
+        self._paths = None  # instance path -> node number
+        self._numbers = {}  # connection -> connection number
+        self._connections = []  # connection number -> connection or None
+        self._sources = numpy.empty(0, dtype=numpy.int64)
+        self._targets = numpy.empty(0, dtype=numpy.int64)
+        self._both = numpy.empty(0, dtype=bool)
+        self._alive = numpy.empty(0, dtype=bool)
+        self._clear_compiled()
+
+    def _clear_compiled(self):
+        self._csr = self._csc = None
+        self._compiled = 0  # connections in the compiled arrays
+        self._removed = 0  # compiled connections removed since
+        self._pending_out = {}  # node -> [(node, connection number)]
+        self._pending_in = {}
+
+    # Nodes and connections
+
+    def __len__(self):
+        """Number of nodes (endpoints)."""
+        self._check()
+        return len(self._endpoints) - self._removed_nodes
+
+    @property
+    def nodes(self):
+        """The numbers of the nodes of the graph."""
+        self._check()
+        return [i for i, x in enumerate(self._endpoints) if x is not None]
+
+    @property
+    def connections(self):
+        """The connections of the graph."""
+        self._check()
+        return [x for x in self._connections if x is not None]
+
+    def node(self, endpoint):
+        """Gives the node number of endpoint (a ``Pointer``, an instance
+        path, an endpoint or a node number), or None.
+        """
+        self._check()
+        if isinstance(endpoint, (int, numpy.integer)):
+            if 0 <= endpoint < len(self._endpoints) \
+                    and self._endpoints[endpoint] is not None:
+                return int(endpoint)
+            return None
+        if isinstance(endpoint, Pointer):
+            endpoint = endpoint_of(endpoint)
+        elif isinstance(endpoint, str):
+            if self._paths is None:
+                self._paths = {}
+                for i, x in enumerate(self._endpoints):
+                    if x is not None:
+                        self._paths.setdefault(endpoint_path(x), i)
+            return self._paths.get(endpoint)
+        return self._nodes.get(endpoint)
+
+    def endpoint(self, node):
+        """Gives the endpoint of a node number: a tuple of
+        ``(variable, index)``, one for each element of the pointers, or None
+        if the node has been removed.
+        """
+        self._check()
+        return self._endpoints[node]
+
+    def path(self, node):
+        """Gives the instance path of a node number, or None."""
+        endpoint = self.endpoint(node)
+        return None if endpoint is None else endpoint_path(endpoint)
+
+    def connection(self, number):
+        """Gives a connection from its number (see ``fan_out()``)."""
+        self._check()
+        return self._connections[number]
+
+    # Queries
+
+    def successors(self, endpoint):
+        """Gives the numbers of the nodes endpoint is connected to, once for
+        each connection.
+        """
+        return self._arcs(endpoint, 'out')[0]
+
+    def predecessors(self, endpoint):
+        """Gives the numbers of the nodes connected to endpoint, once for
+        each connection.
+        """
+        return self._arcs(endpoint, 'in')[0]
+
+    def fan_out(self, endpoint):
+        """Gives the connections going out of endpoint."""
+        return [self._connections[x] for x in self._arcs(endpoint, 'out')[1]]
+
+    def fan_in(self, endpoint):
+        """Gives the connections coming in endpoint."""
+        return [self._connections[x] for x in self._arcs(endpoint, 'in')[1]]
+
+    def degrees(self, direction='out'):
+        """Gives the degree of each node, an array indexed by node number.
+
+        direction is ``'out'`` (fan-out), ``'in'`` (fan-in) or ``'both'``.
+        """
+        self._check_direction(direction)
+        self._check()
+        size = len(self._connections)
+        alive = self._alive[:size]
+        sources = self._sources[:size][alive]
+        targets = self._targets[:size][alive]
+        both = self._both[:size][alive]
+        nodes = []
+        if direction in ('out', 'both'):
+            nodes += [sources, targets[both]]
+        if direction in ('in', 'both'):
+            nodes += [targets, sources[both]]
+        return numpy.bincount(numpy.concatenate(nodes),
+                              minlength=len(self._endpoints))
+
+    def degree_histogram(self, direction='out'):
+        """Gives the number of nodes for each degree (the item i is the
+        number of nodes with i connections).
+        """
+        degrees = self.degrees(direction)
+        if self._removed_nodes:
+            degrees = degrees[self.nodes]
+        return numpy.bincount(degrees)
+
+    def neighbourhood(self, endpoint, hops=1, direction='out'):
+        """Gives the sorted numbers of the nodes at most hops connections
+        away from endpoint (endpoint excluded).
+        """
+        self._check_direction(direction)
+        start = self._node(endpoint)
+        compressed = []
+        if direction in ('out', 'both'):
+            compressed.append(self.csr())
+        if direction in ('in', 'both'):
+            compressed.append(self.csc())
+        reached = numpy.zeros(len(self._endpoints), dtype=bool)
+        reached[start] = True
+        frontier = numpy.array([start], dtype=numpy.int64)
+        for _ in range(hops):
+            if not len(frontier):
+                break
+            found = numpy.concatenate([_gather(x, frontier)[0]
+                                       for x in compressed])
+            frontier = numpy.unique(found[~reached[found]])
+            reached[frontier] = True
+        reached[start] = False
+        return numpy.flatnonzero(reached)
+
+    def csr(self):
+        """Gives the compressed sparse rows of the graph: ``(indptr,
+        indices, connections)``, the nodes connected from the node i are
+        ``indices[indptr[i]:indptr[i + 1]]``, through the connection numbers
+        at the same positions in connections.
+        """
+        self._check()
+        if not self._is_compiled():
+            self._compile()
+        return self._csr
+
+    def csc(self):
+        """Gives the compressed sparse columns of the graph, the nodes
+        connected to the node i, see ``csr()``.
+        """
+        self._check()
+        if not self._is_compiled():
+            self._compile()
+        return self._csc
+
+    def _check_direction(self, direction):
+        if direction not in DIRECTIONS:
+            raise ValueError('direction must be one of {}, not {!r}'
+                             .format(DIRECTIONS, direction))
+
+    def _node(self, endpoint):
+        node = self.node(endpoint)
+        if node is None:
+            raise KeyError(endpoint)
+        return node
+
+    def _arcs(self, endpoint, direction):
+        node = self._node(endpoint)
+        pending = len(self._connections) - self._compiled + self._removed
+        if self._csr is None or \
+                pending > max(MIN_PENDING, self._compiled // PENDING_RATIO):
+            self._compile()
+        compressed, added = (self._csr, self._pending_out) \
+            if direction == 'out' else (self._csc, self._pending_in)
+        indptr, columns, numbers = compressed
+        if node + 1 < len(indptr):
+            start, end = indptr[node], indptr[node + 1]
+            columns, numbers = columns[start:end], numbers[start:end]
+        else:  # a node added since the compilation
+            columns, numbers = columns[:0], numbers[:0]
+        if node in added:
+            extra = numpy.array(added[node], dtype=numpy.int64)
+            columns = numpy.concatenate([columns, extra[:, 0]])
+            numbers = numpy.concatenate([numbers, extra[:, 1]])
+        if self._removed:
+            alive = self._alive[numbers]
+            columns, numbers = columns[alive], numbers[alive]
+        return columns, numbers
+
+    # Building
+
+    def _check(self):
+        # adding or removing roots from the resource is not notified
+        if self._roots != self.resource.contents:
+            self.invalidate()
+            self._roots = list(self.resource.contents)
+        if not self._built:
+            self._built = True
+            for root in self.resource.contents:
+                self._add_all(root)
+
+    def _is_compiled(self):
+        return self._csr is not None and not self._removed \
+            and self._compiled == len(self._connections)
+
+    def _compile(self):
+        size = len(self._connections)
+        numbers = numpy.flatnonzero(self._alive[:size])
+        sources = self._sources[numbers]
+        targets = self._targets[numbers]
+        both = self._both[numbers]
+        rows = numpy.concatenate([sources, targets[both]])
+        columns = numpy.concatenate([targets, sources[both]])
+        numbers = numpy.concatenate([numbers, numbers[both]])
+        nodes = len(self._endpoints)
+        self._clear_compiled()
+        self._csr = _compress(rows, columns, numbers, nodes)
+        self._csc = _compress(columns, rows, numbers, nodes)
+        self._compiled = size
+
+    def _node_of(self, endpoint):
+        try:
+            return self._nodes[endpoint]
+        except KeyError:
+            node = self._nodes[endpoint] = len(self._endpoints)
+            self._endpoints.append(endpoint)
+            self._node_connections.append(0)
+            if self._paths is not None:
+                self._paths.setdefault(endpoint_path(endpoint), node)
+            return node
+
+    def _add(self, connection):
+        if connection.a is None or connection.b is None:
+            return
+        source, target = endpoint_of(connection.a), endpoint_of(connection.b)
+        if source is None or target is None:
+            return
+        source, target = self._node_of(source), self._node_of(target)
+        self._node_connections[source] += 1
+        self._node_connections[target] += 1
+        both = connection.connectivity is not Connectivity.DIRECTIONAL
+        number = len(self._connections)
+        if number == len(self._alive):
+            self._grow()
+        self._sources[number] = source
+        self._targets[number] = target
+        self._both[number] = both
+        self._alive[number] = True
+        self._connections.append(connection)
+        self._numbers[connection] = number
+        if self._csr is not None:
+            self._pending_out.setdefault(source, []).append((target, number))
+            self._pending_in.setdefault(target, []).append((source, number))
+            if both:
+                self._pending_out.setdefault(target, []) \
+                                 .append((source, number))
+                self._pending_in.setdefault(source, []) \
+                                .append((target, number))
+
+    def _grow(self):
+        size = max(1024, 2 * len(self._alive))
+        for name in ('_sources', '_targets', '_both', '_alive'):
+            array = getattr(self, name)
+            grown = numpy.zeros(size, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def _remove(self, connection, release=True):
+        """Removes connection, gives its nodes. The nodes left without
+        connections are removed as well if release.
+        """
+        number = self._numbers.pop(connection, None)
+        if number is None:
+            return ()
+        self._alive[number] = False
+        self._connections[number] = None
+        if number < self._compiled:
+            self._removed += 1
+        elif self._csr is not None:  # an arc kept aside, not masked
+            source, target = self._sources[number], self._targets[number]
+            arcs = [(self._pending_out, source), (self._pending_in, target)]
+            if self._both[number]:
+                arcs += [(self._pending_out, target),
+                         (self._pending_in, source)]
+            for pending, node in arcs:
+                kept = [x for x in pending.get(node, ()) if x[1] != number]
+                if kept:
+                    pending[node] = kept
+                else:
+                    pending.pop(node, None)
+        nodes = (self._sources[number], self._targets[number])
+        for node in nodes:
+            self._node_connections[node] -= 1
+        if release:
+            self._release(nodes)
+        return nodes
+
+    def _release(self, nodes):
+        for node in nodes:
+            endpoint = self._endpoints[node]
+            if self._node_connections[node] or endpoint is None:
+                continue
+            del self._nodes[endpoint]
+            self._endpoints[node] = None
+            self._removed_nodes += 1
+            self._paths = None
+
+    def _refresh(self, connection):
+        # the nodes the connection still refers to are kept
+        nodes = self._remove(connection, release=False)
+        self._add(connection)
+        self._release(nodes)
+
+    def _add_all(self, eobject):
+        for x in chain([eobject], eobject.eAllContents()):
+            if isinstance(x, Connection):
+                self._refresh(x)
+
+    def _remove_all(self, eobject):
+        for x in chain([eobject], eobject.eAllContents()):
+            if isinstance(x, Connection):
+                self._remove(x)
+
+    def notifyChanged(self, notification):
+        if not self._built:
+            return
+        feature = notification.feature
+        notifier = notification.notifier
+        if feature is Node.id:
+            self._paths = None
+            return
+        if isinstance(notifier, PointerElement):
+            notifier = notifier._container
+        if isinstance(notifier, Pointer):
+            if isinstance(notifier._container, Connection):
+                self._refresh(notifier._container)
+            return
+        if isinstance(notifier, Connection):
+            self._refresh(notifier)
+            return
+        if not feature.is_reference or not feature.containment:
+            return
+        kind = notification.kind
+        if kind in (Kind.ADD, Kind.REMOVE, Kind.SET, Kind.UNSET):
+            removed, added = [notification.old], [notification.new]
+        elif kind == Kind.ADD_MANY:
+            removed, added = [], list(notification.new)
+        elif kind == Kind.REMOVE_MANY:
+            removed, added = list(notification.old), []
+        else:  # the objects are moved, but not out of their container
+            return
+        for eobject in removed:
+            if eobject is not None:
+                self._remove_all(eobject)
+        for eobject in added:
+            if eobject is not None:
+                self._add_all(eobject)
@@ -23,3 +23,6 @@ for classif in eClassifiers.values():
 for subpack in eSubpackages:
     eClass.eSubpackages.append(subpack.eClass)
 
+
+# the references to the other subpackages are wired by model._metamodel
+from .. import _metamodel
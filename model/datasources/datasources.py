@@ -1,7 +1,7 @@
 from pyecore.ecore import *
 import pyecore.ecore as Ecore
-from model import ISynchable
-from model import Node
+from ..model import ISynchable
+from ..model import Node
 
 name = 'datasources'
 nsURI = 'https://raw.githubusercontent.com/openworm/org.geppetto.model/development/src/main/resources/geppettoModel.ecore#//datasources'
@@ -31,7 +31,8 @@ class QueryResults(EObject, metaclass=MetaEClass):
         super().__init__()
 
     def getValue(self, field, row):
-        raise NotImplementedError('Operation getValue(...) is not yet implemented')
+        from ..results import ResultTable
+        return ResultTable.of(self).getValue(field, row)
 
 
 class RunnableQuery(EObject, metaclass=MetaEClass):
@@ -57,14 +58,14 @@ class QueryMatchingCriteria(EObject, metaclass=MetaEClass):
 
 
 class QueryResult(AQueryResult):
-    values = EAttribute(eType=EJavaObject, upper=-1)
+    values = EAttribute(eType=EJavaObject, unique=False, upper=-1)
 
     def __init__(self):
         super().__init__()
 
 
 class SerializableQueryResult(AQueryResult):
-    values = EAttribute(eType=EString, upper=-1)
+    values = EAttribute(eType=EString, unique=False, upper=-1)
 
     def __init__(self):
         super().__init__()
@@ -86,7 +87,7 @@ class DataSource(Node):
 @abstract
 class Query(Node):
     description = EAttribute(eType=EString)
-    runForCount = EAttribute(eType=EBoolean)
+    runForCount = EAttribute(eType=EBoolean, default_value=True)
     matchingCriteria = EReference(upper=-1, containment=True)
     returnType = EReference()
 
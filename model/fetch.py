@@ -0,0 +1,430 @@
+"""Fetching of the variables of the data sources.
+
+A ``DataSource`` gives the URL of a service and the query that fetches a
+variable (``fetchVariableQuery``). ``Fetcher`` fetches the variables with
+asyncio, and adds them to the model: the types go to the ``targetLibrary``
+of the data source, the variables to the ``variables`` of its Geppetto
+model::
+
+    from model.fetch import Fetcher
+
+    async with Fetcher(pool_size=4) as fetcher:
+        variable = await fetcher.fetch(data_source, 'VFB_00000001')
+        types = await fetcher.fetch_many(data_source, ids)
+
+The concurrent fetches of a data source are batched: the ids asked within
+``batch_window`` seconds (at most ``batch_size`` of them) are fetched by a
+single request. The requests of a data source go through a pool of at most
+``pool_size`` keep-alive connections to its URL. The fetched objects are
+kept in a cache (``ResultCache``) for ``ttl`` seconds, keyed by the query,
+its parameters and the id, the least recently used are dropped when there
+are more than ``cache_size`` of them.
+
+A request is an HTTP ``POST`` of a JSON body to the URL of the data
+source::
+
+    {"query": query, "ids": [id, ...], "parameters": {name: value, ...}}
+
+where query is the ``query`` of the ``fetchVariableQuery`` (its id if it is
+not a ``SimpleQuery``). The response is a JSON document of ``model.json``
+whose contents are the fetched objects, matched to the ids by their ``id``.
+The references of the objects to the other objects of the model (_e.g_:
+the types of the ``dependenciesLibrary``) are URI fragments.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+from .model import GeppettoModel
+from .datasources import SimpleQuery
+from .types import Type
+from .variables import Variable
+from .json import JSONReader
+
+__all__ = ['Fetcher', 'FetchError', 'ConnectionPool', 'ResultCache']
+
+# the requests that can be sent again without changing their effect
+IDEMPOTENT = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE'])
+
+
+class FetchError(Exception):
+    """Error raised when variables cannot be fetched."""
+
+
+class ResultCache(object):
+    """LRU cache whose entries expire after ttl seconds."""
+    def __init__(self, size=4096, ttl=300.0, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expiry, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Gives the value of key, or default if it is missing or
+        expired.
+        """
+        try:
+            expiry, value = self._entries[key]
+        except KeyError:
+            return default
+        if expiry <= self.clock():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class _Connection(object):
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool(object):
+    """Pool of at most size keep-alive HTTP/1.1 connections to the server of
+    url.
+    """
+    def __init__(self, url, size=4):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise FetchError('unsupported URL {!r}'.format(url))
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.size = size
+        self.opened = 0  # number of connections opened
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method, path, body=b'', headers=None):
+        """Sends a request and gives the status, the headers and the body
+        of the response.
+
+        A request that fails on a kept alive connection (the server may have
+        closed it) is sent again on a new connection, once, if it was not
+        written yet or if method is idempotent.
+        """
+        async with self._slots:
+            connection = self._pop_idle()
+            retry = connection is not None
+            if connection is None:
+                connection = await self._open()
+            while True:
+                sent = False
+                try:
+                    await self._send(connection, method, path, body, headers)
+                    sent = True
+                    response = await self._receive(connection)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection.close()
+                    # the server may have processed a request it received
+                    if not retry or sent and method not in IDEMPOTENT:
+                        raise
+                    retry = False
+                    connection = await self._open()
+                except BaseException:
+                    connection.close()
+                    raise
+            status, response_headers, content = response
+            if response_headers.get('connection', '').lower() == 'close':
+                connection.close()
+            else:
+                self._idle.append(connection)
+            return status, response_headers, content
+
+    def _pop_idle(self):
+        # the connections closed by the server while idle are dropped
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.reader.at_eof() \
+                    and not connection.writer.is_closing():
+                return connection
+            connection.close()
+        return None
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port,
+                                                       ssl=self.ssl or None)
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    async def _send(self, connection, method, path, body, headers):
+        lines = ['{} {} HTTP/1.1'.format(method, path),
+                 'Host: {}:{}'.format(self.host, self.port),
+                 'Content-Length: {}'.format(len(body))]
+        lines.extend('{}: {}'.format(x, y)
+                     for x, y in (headers or {}).items())
+        connection.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await connection.writer.drain()
+
+    async def _receive(self, connection):
+        reader = connection.reader
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by the server')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding', '').lower() == \
+                'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            content = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            content = await reader.readexactly(
+                int(response_headers['content-length']))
+        else:
+            content = await reader.read()
+            response_headers['connection'] = 'close'
+        return status, response_headers, content
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class _Batch(object):
+    """Ids waiting to be fetched from a data source."""
+    __slots__ = ('data_source', 'parameters', 'futures', 'timer')
+
+    def __init__(self, data_source, parameters):
+        self.data_source = data_source
+        self.parameters = parameters
+        self.futures = OrderedDict()  # id -> future
+        self.timer = None
+
+
+class Fetcher(object):
+    """Fetches the variables of the data sources, see the module.
+
+    The connections of a fetcher belong to the event loop that opens them,
+    a fetcher is used in a single event loop.
+    """
+    def __init__(self, pool_size=4, batch_size=64, batch_window=0.002,
+                 cache_size=4096, ttl=300.0):
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache = ResultCache(cache_size, ttl)
+        self.requests = 0  # number of requests sent
+        self._pools = {}  # url -> ConnectionPool
+        self._batches = {}  # (data source, parameters) -> _Batch
+        self._pending = {}  # cache key -> future
+        self._tasks = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def pool(self, url):
+        """Gives the connection pool of url."""
+        try:
+            return self._pools[url]
+        except KeyError:
+            pool = self._pools[url] = ConnectionPool(url, self.pool_size)
+            return pool
+
+    @staticmethod
+    def query_text(data_source):
+        query = data_source.fetchVariableQuery
+        if query is None:
+            raise FetchError('the data source {!r} has no fetch variable '
+                             'query'.format(data_source.id))
+        if isinstance(query, SimpleQuery) and query.query:
+            return query.query
+        return query.id
+
+    def _key(self, data_source, parameters, identifier):
+        return (data_source.url, self.query_text(data_source), parameters,
+                identifier)
+
+    async def fetch(self, data_source, identifier, parameters=None):
+        """Gives the variable (or type) identifier of data_source, fetches
+        it if it is not in the cache.
+        """
+        parameters = tuple(sorted((parameters or {}).items()))
+        key = self._key(data_source, parameters, identifier)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        # the ids that are waiting in a batch or being fetched
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            batch_key = (data_source, parameters)
+            batch = self._batches.get(batch_key)
+            if batch is None:
+                batch = self._batches[batch_key] = _Batch(data_source,
+                                                          parameters)
+                batch.timer = loop.call_later(self.batch_window,
+                                              self._flush, batch_key)
+            future = self._pending[key] = loop.create_future()
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+            batch.futures[identifier] = future
+            if len(batch.futures) >= self.batch_size:
+                self._flush(batch_key)
+        return await asyncio.shield(future)
+
+    async def fetch_many(self, data_source, identifiers, parameters=None):
+        """Gives the variables (or types) identifiers of data_source, see
+        ``fetch()``.
+        """
+        return await asyncio.gather(*(
+            self.fetch(data_source, x, parameters) for x in identifiers))
+
+    def _flush(self, batch_key):
+        batch = self._batches.pop(batch_key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        data_source = batch.data_source
+        try:
+            body = json.dumps({'query': self.query_text(data_source),
+                               'ids': list(batch.futures),
+                               'parameters': dict(batch.parameters)})
+            url = data_source.url or ''
+            parts = urlsplit(url)
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+            self.requests += 1
+            status, _, content = await self.pool(url).request(
+                'POST', target, body.encode('utf-8'),
+                {'Content-Type': 'application/json'})
+            if status != 200:
+                raise FetchError('the data source {!r} answered {}'
+                                 .format(data_source.id, status))
+            fetched = self._land(data_source, json.loads(content))
+        except Exception as error:
+            if not isinstance(error, FetchError):
+                error = FetchError('cannot fetch from {!r}: {}'.format(
+                    data_source.id, error))
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for identifier, future in batch.futures.items():
+            if future.done():
+                continue
+            obj = fetched.get(identifier)
+            if obj is None:
+                future.set_exception(FetchError(
+                    'the data source {!r} has no {!r}'.format(
+                        data_source.id, identifier)))
+                continue
+            self.cache.put(self._key(data_source, batch.parameters,
+                                     identifier), obj)
+            future.set_result(obj)
+
+    @staticmethod
+    def _land(data_source, document):
+        """Adds the objects of document to the model of data_source, and
+        gives them by id. A fetched object replaces the object of the model
+        with the same id, the references to the old object are moved to it.
+        """
+        library = data_source.targetLibrary
+        if library is None:
+            raise FetchError('the data source {!r} has no target library'
+                             .format(data_source.id))
+        model = data_source.eContainer()
+        while model is not None and not isinstance(model, GeppettoModel):
+            model = model.eContainer()
+        roots = JSONReader(data_source.eResource).read(document)
+        collections = []
+        for obj in roots:
+            if isinstance(obj, Type):
+                collections.append(library.types)
+            elif isinstance(obj, Variable) and model is not None:
+                collections.append(model.variables)
+            else:
+                raise FetchError('cannot add the {} {!r} to the model'
+                                 .format(type(obj).__name__,
+                                         getattr(obj, 'id', None)))
+        fetched, positions = {}, {}
+        for obj, collection in zip(roots, collections):
+            # position of the objects by id, to replace the fetched ones
+            try:
+                ids = positions[id(collection)]
+            except KeyError:
+                ids = positions[id(collection)] = {
+                    x.id: i for i, x in enumerate(collection)}
+            position = ids.get(obj.id)
+            if position is None:
+                ids[obj.id] = len(collection)
+                collection.append(obj)
+            else:
+                old = collection[position]
+                collection[position] = obj
+                _move_references(old, obj)
+            fetched[obj.id] = obj
+        return fetched
+
+    async def close(self):
+        """Sends the waiting batches, then closes the connections."""
+        for batch_key in list(self._batches):
+            self._flush(batch_key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+
+def _move_references(old, new):
+    """Makes the objects that refer to old refer to new."""
+    sources = [(x, f) for x, f in old._inverse_rels if not f.containment]
+    for feature in old.eClass.eAllReferences():
+        opposite = feature.eOpposite
+        if opposite is None or feature.containment or opposite.containment:
+            continue
+        value = old.eGet(feature)
+        sources.extend((x, opposite) for x in (value if feature.many
+                                               else [value]) if x is not None)
+    for source, feature in sources:
+        if not feature.many:
+            source.eSet(feature, new)
+            continue
+        values = source.eGet(feature)
+        if old not in values:
+            continue
+        position = values.index(old)
+        values.remove(old)
+        if new not in values:
+            values.insert(position, new)
@@ -0,0 +1,133 @@
+"""Type hierarchy queries: ``Type.extendsType()`` and
+``Type.getDefaultValue()``.
+
+The ancestors of a type (the transitive closure of ``Type.superType``) and
+its default value are computed once and cached on the type, so
+``extendsType()`` is a set lookup::
+
+    variable.types[0].extendsType(ion_channel_type)
+
+A type extends its super types and, transitively, their super types, but not
+itself. The default value of a type is its own ``defaultValue`` or, if it has
+none, the one of its nearest ancestor that has one (see ``ancestors()``).
+
+The cached types are observed: when the ``superType`` or the ``defaultValue``
+of a type changes, the cache of this type and of the types that extend it
+(found through their ``superType`` reference to it) is dropped, the other
+types keep theirs.
+"""
+from pyecore.notification import EObserver
+from .types import Type
+
+__all__ = ['ancestors', 'extends_type', 'default_value', 'invalidate']
+
+_UNKNOWN = object()
+
+
+class _TypeCache(object):
+    __slots__ = ('ancestors', 'ancestor_set', 'default_value')
+
+    def __init__(self, ancestors):
+        self.ancestors = ancestors
+        self.ancestor_set = frozenset(ancestors)
+        self.default_value = _UNKNOWN
+
+
+class _HierarchyObserver(EObserver):
+    """Drops the cache of the observed types when their hierarchy
+    changes.
+    """
+    def notifyChanged(self, notification):
+        feature = notification.feature
+        if feature is Type.superType or feature.name == 'defaultValue':
+            invalidate(notification.notifier)
+
+
+_observer = _HierarchyObserver()
+_computing = set()
+
+
+def _cache(type_):
+    try:
+        return type_._type_cache
+    except AttributeError:
+        pass
+    cache, _ = _compute(type_)
+    return cache
+
+
+def _compute(type_):
+    """Computes the cache of type_, tells if it is complete (a type of a
+    superType cycle does not have its full closure while it is computed, the
+    caches computed meanwhile are not kept).
+    """
+    try:
+        return type_._type_cache, True
+    except AttributeError:
+        pass
+    _computing.add(type_)
+    complete = True
+    result = {}  # ordered set of the ancestors
+    try:
+        for super_type in type_.superType:
+            result[super_type] = None
+            if super_type in _computing:
+                complete = False
+                continue
+            cache, super_complete = _compute(super_type)
+            complete = complete and super_complete
+            result.update(dict.fromkeys(cache.ancestors))
+    finally:
+        _computing.discard(type_)
+    cache = _TypeCache(tuple(result))
+    if complete:
+        if _observer not in type_.listeners:
+            type_.listeners.append(_observer)
+        type_._type_cache = cache
+    return cache, complete
+
+
+def ancestors(type_):
+    """Gives all the super types of type_: each of its super types (in
+    ``superType`` order) followed by its own ancestors, without duplicates.
+    """
+    return list(_cache(type_).ancestors)
+
+
+def extends_type(type_, other):
+    """Tells if type_ extends other, see ``Type.extendsType()``."""
+    return other in _cache(type_).ancestor_set
+
+
+def default_value(type_):
+    """Gives the default value of type_, see ``Type.getDefaultValue()``."""
+    cache = _cache(type_)
+    value = cache.default_value
+    if value is _UNKNOWN:
+        value = _own_default_value(type_)
+        for super_type in cache.ancestors:
+            if value is not None:
+                break
+            value = _own_default_value(super_type)
+        cache.default_value = value
+    return value
+
+
+def _own_default_value(type_):
+    if type_.eClass.findEStructuralFeature('defaultValue') is None:
+        return None
+    return type_.defaultValue
+
+
+def invalidate(type_):
+    """Drops the cache of type_ and of the types that extend it."""
+    stack = [type_]
+    seen = set()
+    while stack:
+        type_ = stack.pop()
+        if type_ in seen:
+            continue
+        seen.add(type_)
+        type_.__dict__.pop('_type_cache', None)
+        stack.extend(owner for owner, feature in type_._inverse_rels
+                     if feature is Type.superType)
@@ -0,0 +1,236 @@
+"""Index of the objects of a Geppetto resource.
+
+``ModelIndex`` maps the URI fragments (``//@libraries.1/@types.5``) and the
+ids of the nodes (``Node.id``) of a resource to the objects. There is a
+single index per resource::
+
+    from model.index import ModelIndex
+
+    index = ModelIndex.of(resource)
+    index.get('//@libraries.1/@types.5')
+    index.fragment(eobject)  # '//@libraries.1/@types.5'
+    index.nodes('conductance')  # all the nodes with this id
+
+The fragments are indexed on demand: a fragment is resolved from the one of
+its container (one step in the containment tree) and every resolved fragment
+is kept, so each one is resolved only once. The ids are all indexed on the
+first ``nodes()`` call.
+
+The index listens to the notifications of the resource and stays up to date
+when objects are added, moved or removed: a modification of a containment
+feature forgets the fragments that go through it (appending objects does not
+change any existing fragment), and the ids of the added or removed nodes are
+updated.
+
+Looking up a fragment inside a type that is not yet built by a lazy
+``GeppettoXMIResource`` builds it, but the ids of its nodes are only indexed
+once it is built.
+"""
+from pyecore.notification import EObserver, Kind
+from .model import Node
+
+__all__ = ['ModelIndex']
+
+
+class ModelIndex(EObserver):
+    """Index of the objects of a resource by URI fragment and by node id."""
+    def __init__(self, resource):
+        super().__init__()
+        self.resource = resource
+        self._roots = []
+        self._objects = {}  # URI fragment -> object
+        self._fragments = {}  # object -> URI fragment
+        self._ids = None  # node id -> nodes
+        resource.listeners.append(self)
+
+    @classmethod
+    def of(cls, resource):
+        """Gives the index of resource, creates it if required."""
+        try:
+            return resource._model_index
+        except AttributeError:
+            index = resource._model_index = cls(resource)
+            return index
+
+    def get(self, fragment):
+        """Gives the object at the URI fragment, or None if there is no such
+        object in the resource.
+        """
+        self._check_roots()
+        if fragment.startswith('#'):
+            fragment = fragment[1:]
+        try:
+            return self._objects[fragment]
+        except KeyError:
+            return self._resolve(fragment)
+
+    def fragment(self, eobject):
+        """Gives the URI fragment of an object of the resource."""
+        self._check_roots()
+        try:
+            return self._fragments[eobject]
+        except KeyError:
+            pass
+        container = eobject._container
+        if container is None:
+            roots = self.resource.contents
+            if eobject not in roots:
+                raise ValueError('{} is not in {}'.format(eobject,
+                                                          self.resource))
+            position = roots.index(eobject)
+            self._add(eobject, '/' if len(roots) == 1 else
+                      '/{}'.format(position))
+        else:
+            feature = eobject._containment_feature
+            prefix = '{}/@{}'.format(self.fragment(container), feature.name)
+            if feature.many:
+                # all the siblings are indexed at once, finding the position
+                # of each of them would be quadratic
+                values = container.__getattribute__(feature.name)
+                for i, value in enumerate(values):
+                    self._add(value, '{}.{}'.format(prefix, i))
+            else:
+                self._add(eobject, prefix)
+        return self._fragments[eobject]
+
+    def nodes(self, identifier):
+        """Gives the nodes of the resource with the identifier as id, in
+        containment order (when the model is not modified).
+        """
+        self._check_roots()
+        if self._ids is None:
+            self._ids = {}
+            for root in self.resource.contents:
+                self._add_ids(root)
+        return list(self._ids.get(identifier, ()))
+
+    def invalidate(self):
+        """Forgets everything, the index is built again on demand."""
+        self._objects.clear()
+        self._fragments.clear()
+        self._ids = None
+
+    def _check_roots(self):
+        # adding or removing roots from the resource is not notified
+        if self._roots != self.resource.contents:
+            self.invalidate()
+            self._roots = list(self.resource.contents)
+
+    def _add(self, eobject, fragment):
+        self._objects[fragment] = eobject
+        self._fragments[eobject] = fragment
+
+    def _resolve(self, fragment):
+        parent_fragment, _, segment = fragment.rpartition('/')
+        roots = self.resource.contents
+        if not parent_fragment:
+            # '/' for a single root, '/position' for many roots
+            if len(roots) == 1 and not segment:
+                eobject = roots[0]
+            elif len(roots) > 1 and segment.isdigit() \
+                    and int(segment) < len(roots):
+                eobject = roots[int(segment)]
+            else:
+                return None
+            self._add(eobject, fragment)
+            return eobject
+
+        if not segment.startswith('@'):
+            return None
+        parent = self.get(parent_fragment)
+        if parent is None:
+            return None
+        name, _, position = segment[1:].partition('.')
+        feature = parent.eClass.findEStructuralFeature(name)
+        if feature is None or not feature.is_reference \
+                or not feature.containment or feature.many != bool(position):
+            return None
+        value = parent.__getattribute__(name)
+        if position:
+            if not position.isdigit() or int(position) >= len(value):
+                return None
+            value = value[int(position)]
+        if value is not None:
+            self._add(value, fragment)
+        return value
+
+    def _forget(self, parent, feature):
+        """Forgets the fragments that go through feature of parent."""
+        fragment = self._fragments.get(parent)
+        if fragment is None:
+            return  # no indexed fragment goes through parent
+        prefix = '{}/@{}'.format(fragment, feature.name)
+        size = len(prefix)
+        forgotten = [x for x in self._objects
+                     if x.startswith(prefix)
+                     and (len(x) == size or x[size] in './')]
+        for fragment in forgotten:
+            del self._fragments[self._objects.pop(fragment)]
+
+    def _walk(self, eobject):
+        """Yields the objects of the eobject subtree (without building the
+        deferred types).
+        """
+        is_deferred = getattr(self.resource, 'is_deferred', None)
+        stack = [eobject]
+        while stack:
+            eobject = stack.pop()
+            yield eobject
+            if is_deferred is not None and is_deferred(eobject):
+                continue
+            stack.extend(eobject.eContents)
+
+    def _add_ids(self, eobject):
+        ids = self._ids
+        for eobject in self._walk(eobject):
+            if isinstance(eobject, Node) and eobject.id is not None:
+                ids.setdefault(eobject.id, []).append(eobject)
+
+    def _remove_ids(self, eobject):
+        for eobject in self._walk(eobject):
+            if isinstance(eobject, Node):
+                self._remove_id(eobject, eobject.id)
+
+    def _remove_id(self, node, identifier):
+        nodes = self._ids.get(identifier)
+        if nodes and node in nodes:
+            nodes.remove(node)
+            if not nodes:
+                del self._ids[identifier]
+
+    def notifyChanged(self, notification):
+        feature = notification.feature
+        if feature is Node.id:
+            if self._ids is not None:
+                node = notification.notifier
+                self._remove_id(node, notification.old)
+                if notification.new is not None:
+                    self._ids.setdefault(notification.new, []).append(node)
+            return
+        if not feature.is_reference or not feature.containment:
+            return
+
+        kind = notification.kind
+        if kind in (Kind.ADD, Kind.REMOVE, Kind.SET, Kind.UNSET):
+            old, new = notification.old, notification.new
+            removed = [] if old is None else [old]
+            added = [] if new is None else [new]
+        elif kind == Kind.ADD_MANY:
+            removed, added = [], list(notification.new)
+        elif kind == Kind.REMOVE_MANY:
+            removed, added = list(notification.old), []
+        else:  # the objects are moved, but not out of their container
+            removed, added = [], []
+
+        if self._ids is not None:
+            for eobject in removed:
+                self._remove_ids(eobject)
+            for eobject in added:
+                self._add_ids(eobject)
+
+        parent = notification.notifier
+        if feature.many and not removed and kind != Kind.MOVE:
+            collection = parent.__getattribute__(feature.name)
+            if list(collection[len(collection) - len(added):]) == added:
+                return  # appended, the other positions are the same
+        self._forget(parent, feature)
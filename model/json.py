@@ -0,0 +1,512 @@
+"""Compact JSON form of the Geppetto models for the web clients.
+
+A document is::
+
+    {"version": 1,
+     "contents": [object, ...],
+     "classes": [[nsURI, name], ...],
+     "cylinders": {"dtype": "float64", "shape": [N, 8],
+                   "columns": [...], "data": "..."}}
+
+An object is ``{"eClass": position in classes, feature: value, ...}`` with
+its set features in the EMF order. The attributes are JSON values (enum
+literals by name, other data types as ``EDataType.to_string`` strings,
+``"NaN"``, ``"Infinity"`` and ``"-Infinity"`` for the non finite doubles),
+the contained objects are nested. The objects are numbered in document order
+(pre-order, the roots first), a reference to an object of the document is
+its number; a reference to another object is its URI fragment (or its
+``uri#fragment`` for an object of another resource).
+
+The numeric bulk data is stored as typed-array blocks instead of lists of
+numbers: the many ``EDouble`` features (``TimeSeries.value``,
+``SkeletonTransformation.skeletonTransformation``) are
+``{"dtype": "float64", "data": base64}`` blocks and the geometry of the
+``Cylinder`` values (``position``, ``distal``, ``bottomRadius`` and
+``topRadius``) is not part of the objects but is a row of the ``cylinders``
+block, in the document order of the cylinders. The columns of a row are the
+coordinates of the position and of the distal point and the two radii, NaN
+for the unset values (the few values a row cannot hold, like a point without
+coordinates, are written in the object instead). The data of the blocks is
+little endian.
+
+The features that are written for each EClass and how they are encoded are
+computed once (``_ClassPlan``). ``GeppettoJSONResource`` reads and writes
+whole resources, the document is streamed while the model is walked;
+``dumps()`` and ``loads()`` handle selected subtrees::
+
+    from model.json import GeppettoJSONResource, dumps
+
+    rset.resource_factory['json'] = GeppettoJSONResource
+    resource.save(output=URI('network.json'))  # any Geppetto resource
+    payload = dumps(composite_type)  # a subtree
+"""
+import gc
+import json
+import math
+from base64 import b64decode, b64encode
+from io import StringIO, TextIOWrapper
+import numpy
+from pyecore.ecore import EProxy
+from pyecore.resources import Resource, URI
+from .arrays import DoubleArray
+from .index import ModelIndex
+from .snapshot import (feature_kind, all_features, value_factory, fill,
+                       contain, STRING, BOOLEAN, INTEGER, DOUBLE, ENUM,
+                       REFERENCE, CONTAINMENT, MANY)
+from .values import Cylinder, Point
+
+__all__ = ['GeppettoJSONResource', 'JSONWriter', 'JSONReader', 'dumps',
+           'loads']
+
+VERSION = 1
+FLOAT64 = numpy.dtype('<f8')
+CYLINDER_COLUMNS = ['position.x', 'position.y', 'position.z', 'distal.x',
+                    'distal.y', 'distal.z', 'bottomRadius', 'topRadius']
+CYLINDER_FEATURES = (Cylinder.position, Cylinder.distal,
+                     Cylinder.bottomRadius, Cylinder.topRadius)
+POINT_FEATURES = (Point.x, Point.y, Point.z)
+# written in chunks of this number of strings
+CHUNK = 4096
+
+_encode_string = json.encoder.encode_basestring_ascii
+_NON_FINITE = {'NaN': math.nan, 'Infinity': math.inf,
+               '-Infinity': -math.inf}
+
+
+def _encode_double(value):
+    if math.isfinite(value):
+        return repr(float(value))
+    if value != value:
+        return '"NaN"'
+    return '"Infinity"' if value > 0 else '"-Infinity"'
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+def _decode_double(value):
+    if isinstance(value, str):
+        return _NON_FINITE[value]
+    return float(value)
+
+
+def _encode_block(values):
+    if isinstance(values, DoubleArray):
+        values = values.array
+    data = numpy.asarray(values, dtype=FLOAT64).tobytes()
+    return '{{"dtype":"float64","data":"{}"}}'.format(
+        b64encode(data).decode('ascii'))
+
+
+def _decode_block(block):
+    if block['dtype'] != 'float64':
+        raise ValueError('Unsupported block type {}'.format(block['dtype']))
+    values = numpy.frombuffer(b64decode(block['data']), dtype=FLOAT64)
+    shape = block.get('shape')
+    if shape is not None:
+        values = values.reshape(shape)
+    return values.astype(numpy.float64)
+
+
+class _ClassPlan(object):
+    """How the objects of an EClass are written and read.
+
+    fields are (feature, name, kind, key) for the stored features in the
+    EMF order, key is the JSON prefix of the feature.
+    """
+    def __init__(self, eclass, index):
+        self.eclass = eclass
+        self.index = index
+        self.python_class = eclass.python_class
+        self.cylinder = eclass.python_class is Cylinder or \
+            Cylinder.eClass in eclass.eAllSuperTypes()
+        features = []
+        for feature in all_features(eclass):
+            kind = feature_kind(feature)
+            if kind is not None:
+                name = feature.name
+                features.append((feature, name, kind,
+                                 ',{}:'.format(_encode_string(name))))
+        # the geometry of a cylinder is written in the cylinders block
+        self.fields = [x for x in features if not self.cylinder
+                       or x[0] not in CYLINDER_FEATURES]
+        self.geometry = [x for x in features if self.cylinder
+                         and x[0] in CYLINDER_FEATURES]
+        self.containments = [(feature, name) for feature, name, kind, _
+                             in self.fields
+                             if kind & ~MANY == CONTAINMENT]
+        self.by_name = {name: (feature, kind)
+                        for feature, name, kind, _ in features}
+        self.factories = {feature: value_factory(feature)
+                          for feature, _, kind, _ in features
+                          if not kind & MANY}
+
+
+class JSONWriter(object):
+    """Writes Geppetto objects and their content as a JSON document."""
+    def __init__(self, resource=None):
+        self.resource = resource
+        self.classes = []
+        self._plans = {}
+        self._numbers = {}
+        self._cylinders = []
+        self._index = None if resource is None else ModelIndex.of(resource)
+
+    def write(self, stream, roots):
+        """Writes the document of roots in the text stream."""
+        numbers = self._numbers
+        for root in roots:
+            self._number(root, numbers)
+        parts = ['{"version":1,"contents":[']
+        for i, root in enumerate(roots):
+            if i:
+                parts.append(',')
+            self._write(root, parts, stream)
+        parts.append('],"classes":')
+        parts.append(json.dumps([[eclass.ePackage.nsURI, eclass.name]
+                                 for eclass in self.classes]))
+        if self._cylinders:
+            data = numpy.array(self._cylinders, dtype=FLOAT64).tobytes()
+            parts.append(',"cylinders":{{"dtype":"float64","shape":[{},8],'
+                         '"columns":{},"data":"{}"}}'.format(
+                             len(self._cylinders),
+                             json.dumps(CYLINDER_COLUMNS),
+                             b64encode(data).decode('ascii')))
+        parts.append('}')
+        stream.write(''.join(parts))
+
+    def _plan(self, eclass):
+        try:
+            return self._plans[eclass]
+        except KeyError:
+            plan = self._plans[eclass] = _ClassPlan(eclass,
+                                                    len(self.classes))
+            self.classes.append(eclass)
+            return plan
+
+    def _number(self, obj, numbers):
+        # the objects are numbered in the order they are written
+        numbers[obj] = len(numbers)
+        isset = obj._isset
+        plan = self._plan(obj.eClass)
+        containments = plan.containments
+        if plan.cylinder:
+            containments = containments + [
+                (feature, name) for feature, name, kind, _
+                in self._inline(obj, plan) if kind == CONTAINMENT]
+        for feature, name in containments:
+            if feature not in isset:
+                continue
+            value = obj.__getattribute__(name)
+            if feature.many:
+                for child in value:
+                    self._number(child, numbers)
+            elif value is not None:
+                self._number(value, numbers)
+
+    def _write(self, obj, parts, stream):
+        plan = self._plan(obj.eClass)
+        parts.append('{{"eClass":{}'.format(plan.index))
+        isset = obj._isset
+        fields = plan.fields
+        if plan.cylinder:
+            inline = self._inline(obj, plan)
+            fields = fields + inline
+        for feature, name, kind, key in fields:
+            if feature not in isset:
+                continue
+            value = obj.__getattribute__(name)
+            parts.append(key)
+            if kind & MANY:
+                kind &= ~MANY
+                if kind == DOUBLE:
+                    parts.append(_encode_block(value))
+                elif kind == CONTAINMENT:
+                    parts.append('[')
+                    for i, child in enumerate(value):
+                        if i:
+                            parts.append(',')
+                        self._write(child, parts, stream)
+                    parts.append(']')
+                else:
+                    parts.append('[{}]'.format(','.join(
+                        self._encode(kind, feature, x) for x in value)))
+            elif kind == CONTAINMENT and value is not None:
+                self._write(value, parts, stream)
+            else:
+                parts.append(self._encode(kind, feature, value))
+        if plan.cylinder:
+            self._cylinders.append(self._geometry(obj, inline))
+        parts.append('}')
+        if len(parts) > CHUNK:
+            stream.write(''.join(parts))
+            del parts[:]
+
+    def _encode(self, kind, feature, value):
+        if value is None:
+            return 'null'
+        if kind == STRING:
+            return _encode_string(value)
+        if kind == DOUBLE:
+            return _encode_double(value)
+        if kind == INTEGER:
+            return str(int(value))
+        if kind == BOOLEAN:
+            return 'true' if value else 'false'
+        if kind == ENUM:
+            return _encode_string(value.name)
+        if kind == REFERENCE:
+            return self._reference(value)
+        return _encode_string(feature._eType.to_string(value))
+
+    def _reference(self, obj):
+        try:
+            return str(self._numbers[obj])
+        except KeyError:
+            pass
+        if isinstance(obj, EProxy):
+            return _encode_string(obj._proxy_path)
+        resource = obj.eResource
+        if resource is None:
+            return _encode_string(obj.eURIFragment())
+        if resource is self.resource:
+            return _encode_string(self._index.fragment(obj))
+        uri = resource.uri.plain if resource.uri else ''
+        return _encode_string('{}#{}'.format(uri, obj.eURIFragment()))
+
+    @staticmethod
+    def _inline(cylinder, plan):
+        # the geometry values that cannot be a part of the cylinders block
+        # (None, NaN, points without coordinates or with other features)
+        # are written in the object
+        isset = cylinder._isset
+        inline = []
+        for field in plan.geometry:
+            feature = field[0]
+            if feature not in isset:
+                continue
+            value = cylinder.__getattribute__(field[1])
+            if value is None:
+                inline.append(field)
+            elif feature.is_attribute:
+                if value != value:
+                    inline.append(field)
+            elif not value._isset or any(
+                    f not in POINT_FEATURES or _is_missing(
+                        value.__getattribute__(f.name))
+                    for f in value._isset):
+                inline.append(field)
+        return inline
+
+    @staticmethod
+    def _geometry(cylinder, inline):
+        isset = cylinder._isset
+        inline = [field[0] for field in inline]
+        row = []
+        for feature in CYLINDER_FEATURES[:2]:
+            if feature not in isset or feature in inline:
+                row.extend((math.nan, math.nan, math.nan))
+                continue
+            point = cylinder.__getattribute__(feature.name)
+            point_isset = point._isset
+            row.extend(point.__getattribute__(f.name)
+                       if f in point_isset else math.nan
+                       for f in POINT_FEATURES)
+        row.extend(cylinder.__getattribute__(f.name)
+                   if f in isset and f not in inline else math.nan
+                   for f in CYLINDER_FEATURES[2:])
+        return row
+
+
+class JSONReader(object):
+    """Builds the Geppetto objects of a JSON document.
+
+    The references that are not objects of the document are resolved in
+    resource, they are ignored if there is no resource.
+    """
+    def __init__(self, resource=None):
+        self.resource = resource
+        self._objects = []
+        self._references = []
+
+    def read(self, document):
+        """Gives the roots of document (a decoded JSON document)."""
+        version = document.get('version')
+        if version != VERSION:
+            raise ValueError('Unsupported JSON document version {}'
+                             .format(version))
+        plans = [self._plan(nsuri, name)
+                 for nsuri, name in document['classes']]
+        cylinders = document.get('cylinders')
+        self._geometry = iter(_decode_block(cylinders).tolist()
+                              if cylinders else [])
+        roots = [self._read(data, plans) for data in document['contents']]
+
+        # the references are set once all the objects exist
+        objects = self._objects
+        for obj, feature, value in self._references:
+            if feature.many:
+                targets = [x for x in (self._target(v, objects)
+                                       for v in value) if x is not None]
+                fill(obj.__getattribute__(feature.name), targets)
+            else:
+                targets = [self._target(value, objects)]
+                if value is not None and targets[0] is None:
+                    continue
+                obj.__dict__[feature.name] = \
+                    value_factory(feature)(obj, targets[0])
+            obj._isset[feature] = None
+            if feature.eOpposite is None:
+                couple = (obj, feature)
+                for target in targets:
+                    if target is not None and \
+                            not isinstance(target, EProxy):
+                        target._inverse_rels.add(couple)
+        return roots
+
+    def _plan(self, nsuri, name):
+        if self.resource is not None:
+            epackage = self.resource.get_metamodel(nsuri)
+        else:
+            from . import model as root_package, eSubpackages
+            epackage = next(p for p in [root_package] + eSubpackages
+                            if p.nsURI == nsuri)
+        eclass = epackage.getEClassifier(name)
+        if eclass is None:
+            raise ValueError('Unknown EClass {} in {}'.format(name, nsuri))
+        if isinstance(eclass, type):  # static metamodel
+            eclass = eclass.eClass
+        return _ClassPlan(eclass, None)
+
+    def _read(self, data, plans):
+        plan = plans[data['eClass']]
+        obj = plan.python_class()
+        self._objects.append(obj)
+        by_name = plan.by_name
+        attributes = obj.__dict__
+        isset = obj._isset
+        for name, value in data.items():
+            if name == 'eClass':
+                continue
+            feature, kind = by_name[name]
+            many = kind & MANY
+            kind &= ~MANY
+            if kind == REFERENCE:
+                self._references.append((obj, feature, value))
+                continue
+            if kind == CONTAINMENT:
+                if many:
+                    contain(obj, feature, [self._read(x, plans)
+                                           for x in value], None)
+                elif value is None:
+                    attributes[name] = plan.factories[feature](obj, None)
+                    isset[feature] = None
+                else:
+                    contain(obj, feature, [self._read(value, plans)],
+                            plan.factories[feature])
+                continue
+            if many:
+                collection = obj.__getattribute__(name)
+                if kind == DOUBLE:
+                    values = _decode_block(value)
+                    if not isinstance(collection, DoubleArray):
+                        values = values.tolist()
+                else:
+                    values = [self._decode(kind, feature, x) for x in value]
+                fill(collection, values)
+            else:
+                attributes[name] = plan.factories[feature](
+                    obj, self._decode(kind, feature, value))
+            isset[feature] = None
+        if plan.cylinder:
+            self._set_geometry(obj, next(self._geometry))
+        return obj
+
+    @staticmethod
+    def _decode(kind, feature, value):
+        if value is None or kind in (STRING, INTEGER, BOOLEAN):
+            return value
+        if kind == DOUBLE:
+            return _decode_double(value)
+        if kind == ENUM:
+            return feature._eType.getEEnumLiteral(value)
+        return feature._eType.from_string(value)
+
+    @staticmethod
+    def _set_geometry(cylinder, row):
+        for feature, coordinates in ((Cylinder.position, row[0:3]),
+                                     (Cylinder.distal, row[3:6])):
+            if all(x != x for x in coordinates):
+                continue
+            point = Point()
+            for f, x in zip(POINT_FEATURES, coordinates):
+                if x == x:
+                    point.__dict__[f.name] = value_factory(f)(point, x)
+                    point._isset[f] = None
+            contain(cylinder, feature, [point], value_factory(feature))
+        for feature, x in zip(CYLINDER_FEATURES[2:], row[6:]):
+            if x == x:
+                cylinder.__dict__[feature.name] = \
+                    value_factory(feature)(cylinder, x)
+                cylinder._isset[feature] = None
+
+    def _target(self, value, objects):
+        if value is None or isinstance(value, int):
+            return None if value is None else objects[value]
+        if self.resource is None:
+            return None
+        return EProxy(value, self.resource)
+
+
+class GeppettoJSONResource(Resource):
+    """Resource that reads and writes the JSON form of Geppetto models."""
+    def load(self, options=None):
+        self.options = options or {}
+        stream = TextIOWrapper(self.uri.create_instream(), encoding='utf-8')
+        try:
+            document = json.load(stream)
+        finally:
+            self.uri.close_stream()
+        # building the objects creates lots of containers, the garbage
+        # collector would try to collect them over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            roots = JSONReader(self).read(document)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        for root in roots:
+            self.append(root)
+
+    def save(self, output=None, options=None):
+        self.options = options or {}
+        uri = output if isinstance(output, URI) \
+            else URI(output) if output else self.uri
+        stream = uri.create_outstream()
+        try:
+            text = TextIOWrapper(stream, encoding='utf-8')
+            JSONWriter(self).write(text, list(self.contents))
+            text.flush()
+            text.detach()
+        finally:
+            uri.close_stream()
+
+
+def dumps(*eobjects):
+    """Gives the JSON document of eobjects and their content."""
+    resources = {x.eResource for x in eobjects}
+    resource = resources.pop() if len(resources) == 1 else None
+    stream = StringIO()
+    JSONWriter(resource).write(stream, list(eobjects))
+    return stream.getvalue()
+
+
+def loads(text, resource=None):
+    """Gives the root objects of a JSON document.
+
+    The references to objects that are not part of the document are
+    resolved in resource.
+    """
+    return JSONReader(resource).read(json.loads(text))
@@ -75,7 +75,7 @@ class StringToStringMap(EObject, metaclass=MetaEClass):
 
 @abstract
 class ISynchable(EObject, metaclass=MetaEClass):
-    synched = EAttribute(eType=EBoolean)
+    synched = EAttribute(eType=EBoolean, transient=True)
 
     def __init__(self):
         super().__init__()
@@ -91,7 +91,8 @@ class Node(ISynchable):
         super().__init__()
 
     def getPath(self):
-        raise NotImplementedError('Operation getPath(...) is not yet implemented')
+        from .paths import node_path
+        return node_path(self)
 
 
 class Tag(ISynchable):
@@ -0,0 +1,207 @@
+"""Columnar view of the morphology of a ``CompositeVisualType``.
+
+A morphology is made of thousands of ``Cylinder`` (and ``Sphere``) values,
+each one with its own ``Point`` objects. ``MorphologyTable`` gathers them in
+NumPy arrays, one row per segment, so geometry can be computed at once::
+
+    from model.morphology import MorphologyTable
+
+    table = MorphologyTable(morphology_type)
+    table.total_length()
+    table.bounding_box(table.group_mask('dendrite_group'))
+    table.proximal += (10, 0, 0)
+    table.distal += (10, 0, 0)
+    table.write_back()  # the modified values are set on the model objects
+
+The segments are the ``Cylinder`` and ``Sphere`` initial values of the type
+variables, in variables order. A sphere is a row whose distal point is its
+position and whose radii are its radius. The membership of the segments in the
+visual group elements is a bitmask, one bit per element, see
+``group_mask()``: a segment belongs to the elements it refers to
+(``VisualValue.groupElements``) and to the elements that have the id of its
+variable (the parameter groups have one element per segment).
+
+The table is a copy: it does not follow the model modifications, and only
+its geometry columns are written back to the model.
+"""
+import numpy
+from .values import Cylinder, Sphere, Point
+
+__all__ = ['MorphologyTable']
+
+
+class MorphologyTable(object):
+    """Segments of a ``CompositeVisualType`` as NumPy arrays.
+
+    * ``proximal``, ``distal``: (N, 3) float64 arrays of the segment ends
+      (NaN for a missing point),
+    * ``bottom_radius``, ``top_radius``: (N,) float64 arrays,
+    * ``spheres``: (N,) bool array, True for the ``Sphere`` rows,
+    * ``groups``: (N, ceil(G / 8)) uint8 array, the bit ``j`` of a row tells
+      if the segment belongs to ``group_elements[j]``,
+    * ``segments``, ``variables``: the model objects of the rows.
+    """
+    def __init__(self, visual_type):
+        self.visual_type = visual_type
+        self.variables = []
+        self.segments = []
+        for variable in visual_type.variables:
+            for initial_value in variable.initialValues:
+                value = initial_value.value
+                if isinstance(value, (Cylinder, Sphere)):
+                    self.variables.append(variable)
+                    self.segments.append(value)
+        size = len(self.segments)
+        self.spheres = numpy.array([isinstance(x, Sphere)
+                                    for x in self.segments], dtype=bool)
+        self.proximal = self._points('position')
+        self.distal = self._points('distal')
+        self.bottom_radius = numpy.array(
+            [x.radius if isinstance(x, Sphere) else x.bottomRadius
+             for x in self.segments], dtype=float)
+        self.top_radius = numpy.array(
+            [x.radius if isinstance(x, Sphere) else x.topRadius
+             for x in self.segments], dtype=float)
+
+        self.group_elements = [element
+                               for group in visual_type.visualGroups
+                               for element in group.visualGroupElements]
+        columns = self._group_columns = {x: i for i, x
+                                         in enumerate(self.group_elements)}
+        rows, bits = [], []
+        for row, segment in enumerate(self.segments):
+            for element in segment.groupElements:
+                try:
+                    column = columns[element]
+                except KeyError:  # an element of another type
+                    column = columns[element] = len(self.group_elements)
+                    self.group_elements.append(element)
+                rows.append(row)
+                bits.append(column)
+        # the elements of the parameter groups are named after the segments
+        segment_rows = {}
+        for row, variable in enumerate(self.variables):
+            segment_rows.setdefault(variable.id, []).append(row)
+        for column, element in enumerate(self.group_elements):
+            for row in segment_rows.get(element.id, ()):
+                rows.append(row)
+                bits.append(column)
+        bits = numpy.array(bits, dtype=numpy.intp)
+        self.groups = numpy.zeros((size, (len(self.group_elements) + 7) // 8),
+                                  dtype=numpy.uint8)
+        numpy.bitwise_or.at(self.groups, (rows, bits >> 3),
+                            numpy.left_shift(1, bits & 7).astype(numpy.uint8))
+        self._original = self._columns()
+
+    def _points(self, name):
+        points = numpy.full((len(self.segments), 3), numpy.nan)
+        for row, segment in enumerate(self.segments):
+            point = segment.__getattribute__(
+                'position' if isinstance(segment, Sphere) else name)
+            if point is not None:
+                points[row] = (point.x, point.y, point.z)
+        return points
+
+    def _columns(self):
+        return [self.proximal.copy(), self.distal.copy(),
+                self.bottom_radius.copy(), self.top_radius.copy()]
+
+    def __len__(self):
+        return len(self.segments)
+
+    def group_mask(self, element):
+        """Gives the (N,) bool array of the segments that belong to element
+        (a ``VisualGroupElement`` or its id).
+        """
+        if isinstance(element, str):
+            element = next((x for x in self.group_elements
+                            if x.id == element), None)
+        return self.group_bits([element])[:, 0]
+
+    def group_bits(self, elements):
+        """Gives the (N, K) bool array of the membership of the segments in
+        each of the K elements.
+        """
+        columns = numpy.array([self._group_columns.get(x, -1)
+                               for x in elements], dtype=numpy.intp)
+        known = columns >= 0
+        columns = columns[known]
+        bits = numpy.zeros((len(self), len(known)), dtype=bool)
+        bits[:, known] = (self.groups[:, columns >> 3] >> (columns & 7)) & 1
+        return bits
+
+    def lengths(self):
+        """Gives the (N,) lengths of the segments (0 for the spheres)."""
+        return numpy.linalg.norm(self.distal - self.proximal, axis=1)
+
+    def total_length(self, mask=None):
+        lengths = self.lengths()
+        return float(numpy.nansum(lengths if mask is None else lengths[mask]))
+
+    def volumes(self):
+        """Gives the (N,) volumes of the segments (truncated cones or
+        spheres).
+        """
+        r1, r2 = self.bottom_radius, self.top_radius
+        cones = numpy.pi * self.lengths() * (r1 * r1 + r1 * r2 + r2 * r2) / 3
+        return numpy.where(self.spheres, 4 * numpy.pi * r1 ** 3 / 3, cones)
+
+    def bounding_box(self, mask=None):
+        """Gives the (min, max) corners of the box that contains the
+        segments (with their radius), or None if there is no segment.
+        """
+        lower = numpy.concatenate(
+            (self.proximal - self.bottom_radius[:, None],
+             self.distal - self.top_radius[:, None]))
+        upper = numpy.concatenate(
+            (self.proximal + self.bottom_radius[:, None],
+             self.distal + self.top_radius[:, None]))
+        if mask is not None:
+            mask = numpy.concatenate((mask, mask))
+            lower, upper = lower[mask], upper[mask]
+        if not len(lower) or numpy.isnan(lower).all():
+            return None
+        return numpy.nanmin(lower, axis=0), numpy.nanmax(upper, axis=0)
+
+    def write_back(self):
+        """Sets the modified values of the table on the model objects, gives
+        the number of modified segments.
+        """
+        columns = self._columns()
+        changed = numpy.zeros(len(self), dtype=bool)
+        for current, original in zip(columns, self._original):
+            different = (current != original) \
+                & ~(numpy.isnan(current) & numpy.isnan(original))
+            if different.ndim > 1:
+                different = different.any(axis=1)
+            changed |= different
+        for row in numpy.flatnonzero(changed):
+            segment = self.segments[row]
+            self._set_point(segment, 'position', self.proximal[row])
+            if isinstance(segment, Sphere):
+                _set(segment, 'radius', self.bottom_radius[row])
+                continue
+            self._set_point(segment, 'distal', self.distal[row])
+            _set(segment, 'bottomRadius', self.bottom_radius[row])
+            _set(segment, 'topRadius', self.top_radius[row])
+        self._original = columns
+        return int(changed.sum())
+
+    @staticmethod
+    def _set_point(segment, name, coordinates):
+        if numpy.isnan(coordinates).any():
+            return
+        point = segment.__getattribute__(name)
+        if point is None:
+            point = Point()
+            segment.__setattr__(name, point)
+        for axis, value in zip('xyz', coordinates):
+            _set(point, axis, value)
+
+
+def _set(eobject, name, value):
+    # only the values that changed are set, to keep the notifications and
+    # the set features of the unchanged ones
+    value = float(value)
+    if eobject.__getattribute__(name) != value:
+        eobject.__setattr__(name, value)
@@ -0,0 +1,228 @@
+"""Geppetto paths of the nodes and of the pointers.
+
+The path of a node (``Node.getPath()``) is made of the ids of the node and of
+its containers, as long as they are nodes, separated by dots, _e.g_:
+``network.pyramidals.soma`` for the ``soma`` variable of the ``pyramidals``
+type of the ``network`` library.
+
+The instance path of a pointer (``Pointer.getInstancePath()``) is made of
+the ids of the variables of its elements separated by dots, each one
+followed by the index of the element between brackets if there is one,
+_e.g_: ``network.pyramidals[3].soma``.
+
+The paths of the nodes of a resource are cached. The cache of a resource is
+cleared by each modification that changes some paths: an object removed
+from (or moved in) the containment tree, an id change or a modification of
+a pointer. Adding objects does not change the existing paths.
+
+``PathIndex`` also gives the reverse lookup::
+
+    from model.paths import PathIndex
+
+    index = PathIndex.of(resource)
+    index.node('network.pyramidals.soma')
+    index.variable('network.pyramidals[3].soma')
+    index.pointer('network.pyramidals[3].soma')  # a new Pointer
+"""
+import re
+from pyecore.notification import EObserver, Kind
+from .model import Node
+from .values import Pointer, PointerElement
+from .types import ArrayType
+
+__all__ = ['PathIndex', 'node_path', 'instance_path']
+
+INSTANCE_SEGMENT = re.compile(r'^([^\[\]]*)(?:\[(\d+)\])?$')
+
+
+def node_path(node):
+    """Gives the path of node, see ``Node.getPath()``."""
+    try:
+        index, generation, path = node._path_cache
+        if index.generation == generation and index.is_valid():
+            return path
+    except AttributeError:
+        pass
+    container = node._container
+    if isinstance(container, Node):
+        path = '{}.{}'.format(node_path(container), node.id or '')
+    else:
+        path = node.id or ''
+    resource = node.eResource
+    if resource is not None:
+        index = PathIndex.of(resource)
+        node._path_cache = (index, index.generation, path)
+    return path
+
+
+def instance_path(pointer):
+    """Gives the instance path of pointer, see
+    ``Pointer.getInstancePath()``.
+    """
+    try:
+        index, generation, path = pointer._path_cache
+        if index.generation == generation and index.is_valid():
+            return path
+    except AttributeError:
+        pass
+    segments = []
+    for element in pointer.elements:
+        variable = element.variable
+        segment = '' if variable is None else variable.id or ''
+        if element.index is not None and element.index > -1:
+            segment = '{}[{}]'.format(segment, element.index)
+        segments.append(segment)
+    path = '.'.join(segments)
+    resource = pointer.eResource
+    if resource is not None:
+        index = PathIndex.of(resource)
+        pointer._path_cache = (index, index.generation, path)
+    return path
+
+
+class PathIndex(EObserver):
+    """Cache of the paths of the nodes of a resource and reverse lookup."""
+    def __init__(self, resource):
+        super().__init__()
+        self.resource = resource
+        self.generation = 0
+        self._roots = list(resource.contents)
+        self._nodes = None  # path -> node
+        resource.listeners.append(self)
+
+    @classmethod
+    def of(cls, resource):
+        """Gives the path index of resource, creates it if required."""
+        try:
+            return resource._path_index
+        except AttributeError:
+            index = resource._path_index = cls(resource)
+            return index
+
+    def is_valid(self):
+        """Tells if the cached paths are still valid.
+
+        Adding or removing roots from the resource is not notified, the
+        cache is cleared if the roots are not the same anymore.
+        """
+        if self._roots != self.resource.contents:
+            self.invalidate()
+            self._roots = list(self.resource.contents)
+            return False
+        return True
+
+    def invalidate(self):
+        """Forgets all the cached paths."""
+        self.generation += 1
+        self._nodes = None
+
+    def node(self, path):
+        """Gives the node with path as path, or None.
+
+        If many nodes have the same path, the first one in containment
+        order is given.
+        """
+        self.is_valid()
+        if self._nodes is None:
+            self._nodes = {}
+            for root in self.resource.contents:
+                self._add_nodes(root)
+        return self._nodes.get(path)
+
+    def variable(self, path):
+        """Gives the variable at the end of an instance path, or None.
+
+        The first segment is a variable of the model root, each next segment
+        is a variable of the type of the previous variable (or of the type of
+        the elements of its array type if the previous segment is indexed).
+        """
+        steps = self._steps(path)
+        return steps[-1][0] if steps else None
+
+    def pointer(self, path):
+        """Gives a new pointer whose instance path is path, or None if path
+        does not lead to a variable (see ``variable()``).
+        """
+        steps = self._steps(path)
+        if steps is None:
+            return None
+        pointer = Pointer()
+        for variable, position in steps:
+            element = PointerElement()
+            element.variable = variable
+            if variable.types:
+                element.type = variable.types[0]
+            if position is not None:
+                element.index = int(position)
+            pointer.elements.append(element)
+        return pointer
+
+    def _steps(self, path):
+        """Gives the variable and the index (or None) of each segment of an
+        instance path, or None.
+        """
+        steps = []
+        variable, indexed = None, False
+        for segment in path.split('.'):
+            match = INSTANCE_SEGMENT.match(segment)
+            if match is None:
+                return None
+            identifier, position = match.groups()
+            if variable is None:
+                variable = next((x for root in self.resource.contents
+                                 for x in getattr(root, 'variables', ())
+                                 if x.id == identifier), None)
+            else:
+                variable = self._variable_of(variable, identifier, indexed)
+            if variable is None:
+                return None
+            indexed = position is not None
+            steps.append((variable, position))
+        return steps
+
+    def _variable_of(self, variable, identifier, indexed):
+        for type_ in variable.types:
+            if indexed and isinstance(type_, ArrayType):
+                type_ = type_.arrayType
+            if type_ is None:
+                continue
+            node = self.node('{}.{}'.format(node_path(type_), identifier))
+            if node is not None and node._container is type_:
+                return node
+        return None
+
+    def _add_nodes(self, eobject):
+        nodes = self._nodes
+        for eobject in self._walk(eobject):
+            if isinstance(eobject, Node):
+                nodes.setdefault(node_path(eobject), eobject)
+
+    def _walk(self, eobject):
+        is_deferred = getattr(self.resource, 'is_deferred', None)
+        stack = [eobject]
+        while stack:
+            eobject = stack.pop()
+            yield eobject
+            if is_deferred is not None and is_deferred(eobject):
+                continue
+            stack.extend(reversed(eobject.eContents))
+
+    def notifyChanged(self, notification):
+        feature = notification.feature
+        notifier = notification.notifier
+        if feature is Node.id or isinstance(notifier, PointerElement):
+            self.invalidate()
+            return
+        if not feature.is_reference or not feature.containment:
+            return
+        kind = notification.kind
+        if kind in (Kind.ADD, Kind.ADD_MANY) or (
+                kind == Kind.SET and notification.old is None):
+            if isinstance(notifier, Pointer):
+                self.invalidate()
+            elif self._nodes is not None and self.is_valid():
+                added = notification.new
+                for eobject in added if kind == Kind.ADD_MANY else [added]:
+                    self._add_nodes(eobject)
+        elif kind != Kind.MOVE or isinstance(notifier, Pointer):
+            self.invalidate()
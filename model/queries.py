@@ -0,0 +1,260 @@
+"""Execution of the queries of the data sources.
+
+The queries of a ``DataSource`` are run by a ``QueryEngine``. The engine does
+not know how to talk to the data sources, the ``SimpleQuery`` are run by a
+``QueryBackend`` registered for the service of their data source
+(``DataSource.dataSourceService``), and the ``ProcessQuery`` by a processor
+registered for their ``queryProcessorId``::
+
+    from model.queries import QueryEngine
+
+    engine = QueryEngine(backends={'neo4jDataSourceService': backend},
+                         processors={'addVariableTypes': processor})
+    results = engine.results(query, variable)  # QueryResults
+    table = engine.table(query, variable)  # ResultTable, by columns
+    engine.count(query, variable)
+
+The rows of the queries are dicts (field -> value). The steps of the
+``queryChain`` of a ``CompoundQuery`` (or ``CompoundRefQuery``) are
+pipelined: each step is given the rows of the previous one as an iterator,
+so when the backends and the processors are generators, the rows flow
+through the chain one by one and no step waits for the whole result of the
+previous one. The count of a query (``count()``) uses the ``countQuery`` of
+its last step, only the rows of the previous steps are produced.
+
+The ``QueryEngine`` coroutines run the queries in an executor, so the
+independent queries run concurrently, _e.g_: the runnable queries of a
+client, that are combined with their boolean operator::
+
+    results = asyncio.run(engine.run_queries(runnable_queries))
+"""
+import asyncio
+from functools import partial
+from .datasources import DataSource, SimpleQuery, ProcessQuery, \
+                         CompoundQuery, CompoundRefQuery, QueryResults, \
+                         QueryResult, RunnableQuery, BooleanOperator
+from .paths import PathIndex
+from .results import ResultTable
+
+__all__ = ['QueryBackend', 'QueryEngine', 'QueryError', 'combine',
+           'query_results']
+
+# the field that identifies the rows when results are combined
+ID = 'ID'
+
+
+class QueryError(Exception):
+    """Error raised when a query cannot be run."""
+
+
+class QueryBackend(object):
+    """Runs the ``SimpleQuery`` of the data sources of a service."""
+    def execute(self, query, variable, rows):
+        """Gives the rows of query, an iterable of dicts (preferably a
+        generator).
+
+        variable is the variable the query is run for (or None), rows is an
+        iterator of the rows of the previous query of the chain (or None for
+        the first query).
+        """
+        raise NotImplementedError
+
+    def count(self, query, variable, rows):
+        """Gives the number of rows of query, using its ``countQuery``.
+
+        By default, the rows of the query are counted.
+        """
+        return sum(1 for _ in self.execute(query, variable, rows))
+
+
+def query_results(rows, identifier=None):
+    """Gives the ``QueryResults`` of rows, with the fields of the rows (in
+    order of appearance) as header.
+    """
+    header, fields, table = [], set(), []
+    for row in rows:
+        for field in row:
+            if field not in fields:
+                fields.add(field)
+                header.append(field)
+        table.append(row)
+    results = QueryResults()
+    results.id = identifier
+    results.header.extend(header)
+    for row in table:
+        result = QueryResult()
+        result.values.extend([row.get(x) for x in header])
+        results.results.append(result)
+    return results
+
+
+def combine(rows, other, operator, key=ID):
+    """Combines two lists of rows identified by their key field.
+
+    ``AND`` keeps the rows that are in both, ``OR`` the rows that are in
+    any of them, ``NAND`` the rows of rows that are not in other.
+    """
+    keys = {x.get(key) for x in other}
+    if operator is BooleanOperator.AND:
+        return [x for x in rows if x.get(key) in keys]
+    if operator is BooleanOperator.NAND:
+        return [x for x in rows if x.get(key) not in keys]
+    if operator is BooleanOperator.OR:
+        known = {x.get(key) for x in rows}
+        return rows + [x for x in other if x.get(key) not in known]
+    raise QueryError('unknown boolean operator {}'.format(operator))
+
+
+class QueryEngine(object):
+    """Runs the queries of the data sources.
+
+    backends are the ``QueryBackend`` by data source service (None for the
+    default backend), processors the processors of the ``ProcessQuery`` by
+    id: callables that take the query, the variable and the rows of the
+    previous query of the chain, and give rows. The resource is used to
+    find the queries and the variables of the ``RunnableQuery``, and the
+    executor (``concurrent.futures``) runs the coroutines queries (the
+    default executor of the event loop if None).
+    """
+    def __init__(self, backends=None, processors=None, resource=None,
+                 executor=None):
+        self.backends = dict(backends or {})
+        self.processors = dict(processors or {})
+        self.resource = resource
+        self.executor = executor
+
+    def backend(self, query):
+        """Gives the backend of the data source of query."""
+        data_source = query.eContainer()
+        while data_source is not None \
+                and not isinstance(data_source, DataSource):
+            data_source = data_source.eContainer()
+        service = None if data_source is None \
+            else data_source.dataSourceService
+        for key in (service, None):
+            if key in self.backends:
+                return self.backends[key]
+        raise QueryError('no backend for the service {!r} of the query {!r}'
+                         .format(service, query.id))
+
+    def execute(self, query, variable=None, rows=None):
+        """Gives an iterator of the rows of query.
+
+        rows are the rows given to the query, as if it was a step of a
+        query chain.
+        """
+        if isinstance(query, (CompoundQuery, CompoundRefQuery)):
+            for step in query.queryChain:
+                rows = self.execute(step, variable, rows)
+            return iter(()) if rows is None else rows
+        if isinstance(query, ProcessQuery):
+            try:
+                processor = self.processors[query.queryProcessorId]
+            except KeyError:
+                raise QueryError('no processor {!r} for the query {!r}'
+                                 .format(query.queryProcessorId, query.id))
+            return iter(processor(query, variable, rows))
+        if isinstance(query, SimpleQuery):
+            return iter(self.backend(query).execute(query, variable, rows))
+        raise QueryError('{} queries cannot be run'.format(
+            type(query).__name__))
+
+    def count(self, query, variable=None, rows=None):
+        """Gives the number of rows of query, or None if the query is not
+        run for count (``Query.runForCount``).
+
+        The ``countQuery`` of the query (or of the last step of its chain) is
+        used, the rows are only counted if there is none.
+        """
+        if not query.runForCount:
+            return None
+        return self._count(query, variable, rows)
+
+    def _count(self, query, variable, rows):
+        if isinstance(query, (CompoundQuery, CompoundRefQuery)):
+            chain = list(query.queryChain)
+            if not chain:
+                return 0
+            for step in chain[:-1]:
+                rows = self.execute(step, variable, rows)
+            return self._count(chain[-1], variable, rows)
+        if isinstance(query, SimpleQuery) and query.countQuery:
+            return self.backend(query).count(query, variable, rows)
+        return sum(1 for _ in self.execute(query, variable, rows))
+
+    def results(self, query, variable=None):
+        """Gives the ``QueryResults`` of query."""
+        return query_results(self.execute(query, variable), query.id)
+
+    def table(self, query, variable=None, types=None):
+        """Gives the rows of query as a ``ResultTable`` (see
+        ``model.results``), without creating a ``QueryResult`` per row.
+        """
+        return ResultTable.from_rows(self.execute(query, variable),
+                                     types=types, identifier=query.id)
+
+    def resolve(self, runnable):
+        """Gives the query, the variable and the boolean operator of a
+        ``RunnableQuery`` (or of a ``(query, variable, operator)`` tuple).
+        """
+        if not isinstance(runnable, RunnableQuery):
+            return tuple(runnable)
+        if self.resource is None:
+            raise QueryError('the engine has no resource to find {!r}'
+                             .format(runnable.queryPath))
+        index = PathIndex.of(self.resource)
+        query = index.node(runnable.queryPath)
+        if query is None:
+            raise QueryError('no query {!r}'.format(runnable.queryPath))
+        variable = None
+        if runnable.targetVariablePath:
+            variable = index.variable(runnable.targetVariablePath)
+            if variable is None:
+                raise QueryError('no variable {!r}'.format(
+                    runnable.targetVariablePath))
+        return query, variable, runnable.booleanOperator
+
+    async def _in_executor(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          partial(function, *args))
+
+    async def run(self, query, variable=None):
+        """Gives the ``QueryResults`` of query (a coroutine)."""
+        return await self._in_executor(self.results, query, variable)
+
+    async def run_count(self, query, variable=None):
+        """Gives the number of rows of query, see ``count()`` (a
+        coroutine).
+        """
+        return await self._in_executor(self.count, query, variable)
+
+    async def run_queries(self, runnables):
+        """Runs the runnable queries concurrently and gives the
+        ``QueryResults`` of their rows combined in order with the boolean
+        operator of each one (the one of the first query is not used).
+        """
+        rows = await self._run_all(runnables)
+        return query_results(rows)
+
+    async def count_queries(self, runnables):
+        """Gives the number of rows of the combined runnable queries (see
+        ``run_queries()``). A single query is counted with ``count()``, so
+        None is given if it is not run for count.
+        """
+        if len(runnables) == 1:
+            query, variable, _ = self.resolve(runnables[0])
+            return await self.run_count(query, variable)
+        return len(await self._run_all(runnables))
+
+    async def _run_all(self, runnables):
+        resolved = [self.resolve(x) for x in runnables]
+        if not resolved:
+            return []
+        tables = await asyncio.gather(*(
+            self._in_executor(lambda q, v: list(self.execute(q, v)), q, v)
+            for q, v, _ in resolved))
+        rows = tables[0]
+        for (_, _, operator), table in zip(resolved[1:], tables[1:]):
+            rows = combine(rows, table, operator)
+        return rows
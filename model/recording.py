@@ -0,0 +1,298 @@
+"""Recording of the recorded variables of an experiment.
+
+``ExperimentState.recordedVariables`` holds one ``VariableValue`` per recorded
+variable: a ``Pointer`` to the variable and its value, a ``TimeSeries``.
+Appending the samples of a running simulation to these time series one at a
+time goes through the PyEcore lists and their notifications for each value.
+``Recorder`` stores the samples in NumPy chunks instead, and builds the time
+series only when they are read::
+
+    from model.recording import Recorder
+
+    recorder = Recorder(experiment_state)
+    soma = recorder.slot('network.pyramidals[0].soma.v')  # or the pointer
+    recorder.append(0.025, [-65.0, -64.8])  # one value per slot
+    recorder.extend(times, values)  # one row of values per time
+    times, values = recorder.read(soma, start=10.0, stop=20.0,
+                                  max_points=500)
+    recorder.series(soma)  # the TimeSeries of the variable value
+    recorder.materialize()  # the TimeSeries of all the variable values
+
+A slot is the index of a recorded variable in the recorder, its pointer is
+resolved once, when the recorder is created (or by ``record()``). All the
+slots share the same times, the value of a slot that is not known at a time
+is NaN (_e.g_: the times before a ``record()``).
+
+The samples are kept in chunks of chunk_size samples. With a capacity, the
+chunks form a ring buffer: the oldest chunk is dropped (and its memory
+reused) as soon as the other ones hold capacity samples. ``dropped`` is the
+number of samples dropped so far.
+
+``read()`` gives copies of the samples of a time window, it does not create
+any object, so a UI can poll it while the simulation runs. With max_points,
+the samples are split into max_points / 2 buckets and only the min and the
+max of each bucket are kept, the peaks (_e.g_: the spikes) stay visible.
+
+``series()`` and ``materialize()`` set the values of the ``TimeSeries`` of
+the variable values (the existing ``TimeSeries`` are kept, with their unit).
+A time series is only updated with the samples recorded since its last
+update, unless some of its samples have been dropped since.
+"""
+from bisect import bisect_left, bisect_right
+import numpy
+from .model import VariableValue
+from .values import TimeSeries
+from .arrays import DoubleArray
+
+__all__ = ['Recorder']
+
+
+class Recorder(object):
+    """Records the samples of the recorded variables of an
+    ``ExperimentState``, see the module.
+    """
+    def __init__(self, state, chunk_size=4096, capacity=None):
+        if capacity is not None and capacity < 1:
+            raise ValueError('the capacity must be positive')
+        self.state = state
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self.count = 0  # number of samples recorded
+        self.dropped = 0  # number of samples dropped
+        self._variables = []  # slot -> VariableValue
+        self._slots = {}  # VariableValue, Pointer or instance path -> slot
+        self._chunks = []  # (1 + slots, chunk_size) arrays, times first
+        self._free = []  # dropped chunks, to be reused
+        self._size = 0  # number of samples in the last chunk
+        self._last_time = -numpy.inf
+        self._materialized = {}  # slot -> (TimeSeries, count, dropped)
+        for variable_value in state.recordedVariables:
+            self._add(variable_value)
+
+    def __len__(self):
+        """Number of samples kept."""
+        return self.count - self.dropped
+
+    @property
+    def slots(self):
+        """Number of slots."""
+        return len(self._variables)
+
+    def _add(self, variable_value):
+        slot = len(self._variables)
+        self._variables.append(variable_value)
+        self._slots[variable_value] = slot
+        pointer = variable_value.pointer
+        if pointer is not None:
+            self._slots[pointer] = slot
+            path = pointer.getInstancePath()
+            if path:
+                self._slots.setdefault(path, slot)
+        if self._chunks:
+            # the new slot has no value for the recorded times
+            missing = numpy.full((1, self.chunk_size), numpy.nan)
+            self._chunks = [numpy.vstack((x, missing)) for x in self._chunks]
+            self._free = []
+        return slot
+
+    def slot(self, target):
+        """Gives the slot of target, a recorded ``VariableValue``, its
+        ``Pointer`` or the instance path of the pointer.
+        """
+        try:
+            return self._slots[target]
+        except (KeyError, TypeError):
+            raise KeyError('{!r} is not recorded'.format(target))
+
+    def variable_value(self, slot):
+        """Gives the ``VariableValue`` of slot."""
+        return self._variables[slot]
+
+    def record(self, pointer):
+        """Records the variable of pointer and gives its slot.
+
+        The pointer becomes the pointer of a new ``VariableValue`` of the
+        recorded variables of the state, unless it is already recorded.
+        """
+        slot = self._slots.get(pointer)
+        if slot is not None:
+            return slot
+        variable_value = VariableValue()
+        variable_value.pointer = pointer
+        self.state.recordedVariables.append(variable_value)
+        return self._add(variable_value)
+
+    def _room(self):
+        """Gives the last chunk, with room for a sample."""
+        if not self._chunks or self._size == self.chunk_size:
+            if self._free:
+                chunk = self._free.pop()
+            else:
+                chunk = numpy.empty((1 + len(self._variables),
+                                     self.chunk_size))
+            self._chunks.append(chunk)
+            self._size = 0
+        return self._chunks[-1]
+
+    def _trim(self):
+        capacity = self.capacity
+        if capacity is None:
+            return
+        chunks = self._chunks
+        while len(self) - self.chunk_size >= capacity:
+            self._free.append(chunks.pop(0))
+            self.dropped += self.chunk_size
+
+    def _check_times(self, first, times=None):
+        if first < self._last_time or (
+                times is not None and (numpy.diff(times) < 0).any()):
+            raise ValueError('the times of the samples must not decrease')
+
+    def append(self, time, values):
+        """Records the values of the slots at time."""
+        if len(values) != len(self._variables):
+            raise ValueError('{} values for {} slots'.format(
+                len(values), len(self._variables)))
+        self._check_times(time)
+        chunk = self._room()
+        position = self._size
+        chunk[0, position] = time
+        chunk[1:, position] = values
+        self._size = position + 1
+        self._last_time = time
+        self.count += 1
+        self._trim()
+
+    def extend(self, times, values):
+        """Records a block of samples: values has a row of values of the
+        slots per time of times.
+        """
+        times = numpy.asarray(times, dtype=numpy.float64)
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if values.shape != (len(times), len(self._variables)):
+            raise ValueError('the values must be {} rows of {} values'
+                             .format(len(times), len(self._variables)))
+        if not len(times):
+            return
+        self._check_times(times[0], times)
+        done = 0
+        while done < len(times):
+            chunk = self._room()
+            position = self._size
+            size = min(self.chunk_size - position, len(times) - done)
+            chunk[0, position:position + size] = times[done:done + size]
+            chunk[1:, position:position + size] = \
+                values[done:done + size].T
+            self._size = position + size
+            self.count += size
+            done += size
+            self._trim()
+        self._last_time = times[-1]
+
+    def _column(self, row, first, last):
+        """Gives a copy of the row of the chunks, from the first to the
+        last sample kept.
+        """
+        chunk_size = self.chunk_size
+        pieces = []
+        while first < last:
+            chunk, position = divmod(first, chunk_size)
+            size = min(chunk_size - position, last - first)
+            pieces.append(self._chunks[chunk][row, position:position + size])
+            first += size
+        if not pieces:
+            return numpy.empty(0)
+        return numpy.concatenate(pieces)
+
+    def _index(self, time, side):
+        """Gives the index of the first sample kept whose time is not before
+        (left side) or after (right side) time.
+        """
+        chunks = self._chunks
+        starts = [x[0, 0] for x in chunks]
+        bisect = bisect_left if side == 'left' else bisect_right
+        chunk = max(bisect(starts, time) - 1, 0)
+        if not chunks:
+            return 0
+        size = self._size if chunk == len(chunks) - 1 else self.chunk_size
+        position = numpy.searchsorted(chunks[chunk][0, :size], time, side)
+        return chunk * self.chunk_size + int(position)
+
+    def _window(self, start, stop):
+        first = 0 if start is None else self._index(start, 'left')
+        last = len(self) if stop is None else self._index(stop, 'right')
+        return first, max(first, last)
+
+    def times(self, start=None, stop=None):
+        """Gives the times of the samples kept between start and stop
+        (included).
+        """
+        return self._column(0, *self._window(start, stop))
+
+    def read(self, slot, start=None, stop=None, max_points=None):
+        """Gives the times and the values of slot of the samples kept
+        between start and stop (included), at most max_points of them (see
+        the module).
+        """
+        if not 0 <= slot < len(self._variables):
+            raise IndexError('no slot {}'.format(slot))
+        first, last = self._window(start, stop)
+        times = self._column(0, first, last)
+        values = self._column(slot + 1, first, last)
+        if max_points is not None and len(values) > max_points:
+            if max_points < 2:
+                raise ValueError('at least 2 points are read')
+            indices = _envelope(values, max_points // 2)
+            times, values = times[indices], values[indices]
+        return times, values
+
+    def series(self, slot):
+        """Gives the ``TimeSeries`` of the variable value of slot, updated
+        with the samples kept.
+        """
+        variable_value = self._variables[slot]
+        series = variable_value.value
+        if not isinstance(series, TimeSeries):
+            series = variable_value.value = TimeSeries()
+        previous, count, dropped = self._materialized.get(slot,
+                                                          (None, 0, 0))
+        if previous is not series or dropped != self.dropped:
+            series.value.clear()
+            count = self.dropped
+        if count < self.count:
+            values = self._column(slot + 1, count - self.dropped, len(self))
+            if not isinstance(series.value, DoubleArray):
+                values = values.tolist()
+            series.value.extend(values)
+        self._materialized[slot] = (series, self.count, self.dropped)
+        return series
+
+    def materialize(self):
+        """Updates the ``TimeSeries`` of all the variable values."""
+        for slot in range(len(self._variables)):
+            self.series(slot)
+
+    def clear(self):
+        """Drops all the samples (the time series are not modified)."""
+        self._free.extend(self._chunks)
+        self._chunks = []
+        self._size = 0
+        self.dropped = self.count
+        self._last_time = -numpy.inf
+
+
+def _envelope(values, buckets):
+    """Gives the sorted indices of the min and of the max of each of the
+    buckets of values.
+    """
+    size = -(-len(values) // buckets)
+    # the last values repeated in the last bucket change neither its min
+    # nor its max
+    padded = numpy.empty(size * buckets)
+    padded[:len(values)] = values
+    padded[len(values):] = values[-1]
+    rows = padded.reshape(buckets, size)
+    offsets = numpy.arange(buckets) * size
+    indices = numpy.concatenate((rows.argmin(axis=1) + offsets,
+                                 rows.argmax(axis=1) + offsets))
+    return numpy.unique(numpy.minimum(indices, len(values) - 1))
@@ -0,0 +1,251 @@
+"""Index of the references to the objects of a Geppetto resource.
+
+PyEcore keeps the opposite of a single reference of the metamodel:
+``Type.referencedVariables`` gives the variables whose ``types`` hold a type.
+``ReferenceIndex`` keeps the inverse of all the non containment references
+of the metamodel (``indexed_references()``) for the objects of a resource,
+so that the objects that refer to an object are found without scanning the
+model::
+
+    from model.references import ReferenceIndex
+    from model.values import VisualValue
+    from model.variables import TypeToValueMap
+    from model.datasources import QueryMatchingCriteria
+
+    index = ReferenceIndex.of(resource)
+    index.referrers(group_element, VisualValue.groupElements)  # cylinders
+    index.referrers(cell_type, TypeToValueMap.key)
+    criteria = index.referrers(cell_type, QueryMatchingCriteria.type)
+    queries = [x.eContainer() for x in criteria]
+    index.referrers(cell_type)  # [(object, reference), ...]
+
+The index is opt-in: it is built on the first lookup, then it listens to the
+notifications of the resource and stays up to date when references are
+modified and objects are added, moved or removed. A lookup costs the number
+of objects it gives. An object that refers to another one several times
+(with the same reference) is given once.
+
+The referrers are the objects of the resource, the references from the
+objects of other resources are not indexed. Once removed from the resource,
+an object is not a referrer anymore, but the objects of the resource that
+refer to it are still given.
+
+The content of the types that are not yet built by a lazy
+``GeppettoXMIResource`` is indexed when they are built (on the next
+lookup).
+"""
+from pyecore.ecore import EClass
+from pyecore.notification import EObserver, Kind
+from . import load
+
+__all__ = ['ReferenceIndex', 'indexed_references']
+
+_REFERENCES = None
+
+
+def indexed_references():
+    """Gives the non containment references of the classes of the Geppetto
+    metamodel.
+    """
+    global _REFERENCES
+    if _REFERENCES is None:
+        load()
+        from . import eSubpackages, model
+        references = []
+        for package in [model] + list(eSubpackages):
+            for classifier in package.eClassifiers.values():
+                eclass = getattr(classifier, 'eClass', classifier)
+                if not isinstance(eclass, EClass):
+                    continue
+                references.extend(x for x in eclass.eReferences
+                                  if not x.containment and not x.derived)
+        _REFERENCES = tuple(references)
+    return _REFERENCES
+
+
+class ReferenceIndex(EObserver):
+    """Inverse of the non containment references of the objects of a
+    resource, see the module.
+    """
+    def __init__(self, resource, references=None):
+        super().__init__()
+        self.resource = resource
+        self.references = frozenset(references or indexed_references())
+        self._roots = []
+        self._inverse = None  # target -> reference -> source -> count
+        self._sources = set()  # the objects whose references are indexed
+        self._plans = {}  # EClass -> [(reference, name, many)]
+        self._pending = []  # the deferred objects met
+        self._deferred_count = None
+        resource.listeners.append(self)
+
+    @classmethod
+    def of(cls, resource):
+        """Gives the index of resource, creates it if required."""
+        try:
+            return resource._reference_index
+        except AttributeError:
+            index = resource._reference_index = cls(resource)
+            return index
+
+    def referrers(self, target, reference=None):
+        """Gives the objects whose reference holds target, or the (object,
+        reference) pairs of all the references to target.
+        """
+        self._check()
+        references = self._inverse.get(target)
+        if not references:
+            return []
+        if reference is not None:
+            return list(references.get(reference, ()))
+        return [(source, reference)
+                for reference, sources in references.items()
+                for source in sources]
+
+    def invalidate(self):
+        """Forgets everything, the index is built again on demand."""
+        self._inverse = None
+        self._sources = set()
+        self._pending = []
+
+    def _check(self):
+        # adding or removing roots from the resource is not notified
+        if self._roots != self.resource.contents:
+            self.invalidate()
+            self._roots = list(self.resource.contents)
+        if self._inverse is None:
+            self._inverse = {}
+            for root in self.resource.contents:
+                self._add(root)
+        elif self._pending:
+            count = getattr(self.resource, 'deferred_count', None)
+            if count != self._deferred_count:
+                self._deferred_count = count
+                is_deferred = self.resource.is_deferred
+                built = [x for x in self._pending if not is_deferred(x)]
+                self._pending = [x for x in self._pending if is_deferred(x)]
+                for eobject in built:
+                    if eobject in self._sources:  # still in the resource
+                        self._add(eobject)
+
+    def _plan(self, eclass):
+        try:
+            return self._plans[eclass]
+        except KeyError:
+            plan = self._plans[eclass] = [
+                (x, x.name, x.many) for x in eclass.eAllReferences()
+                if x in self.references]
+            return plan
+
+    def _walk(self, eobject, deferred=None):
+        """Yields the objects of the eobject subtree, without building the
+        deferred types (they are added to deferred).
+        """
+        is_deferred = getattr(self.resource, 'is_deferred', None)
+        stack = [eobject]
+        while stack:
+            eobject = stack.pop()
+            yield eobject
+            if is_deferred is not None and is_deferred(eobject):
+                if deferred is not None:
+                    deferred.append(eobject)
+                continue
+            stack.extend(eobject.eContents)
+
+    def _targets(self, eobject):
+        """Yields the (reference, target) pairs of eobject."""
+        # the deferred content of the lazy types is made of containments
+        isset = eobject._isset
+        for reference, name, many in self._plan(eobject.eClass):
+            if reference not in isset:
+                continue
+            value = eobject.__getattribute__(name)
+            if not many:
+                if value is not None:
+                    yield reference, value
+                continue
+            for target in value:
+                yield reference, target
+
+    def _add(self, eobject):
+        """Indexes the references of the objects of the eobject
+        subtree.
+        """
+        sources = self._sources
+        for source in self._walk(eobject, self._pending):
+            if source in sources:
+                continue
+            sources.add(source)
+            for reference, target in self._targets(source):
+                self._link(target, reference, source)
+        self._deferred_count = getattr(self.resource, 'deferred_count',
+                                       None)
+
+    def _remove(self, eobject):
+        sources = self._sources
+        for source in self._walk(eobject):
+            if source not in sources:
+                continue
+            sources.discard(source)
+            for reference, target in self._targets(source):
+                self._unlink(target, reference, source)
+
+    def _link(self, target, reference, source):
+        try:
+            references = self._inverse[target]
+        except KeyError:
+            references = self._inverse[target] = {}
+        try:
+            sources = references[reference]
+        except KeyError:
+            sources = references[reference] = {}
+        sources[source] = sources.get(source, 0) + 1
+
+    def _unlink(self, target, reference, source):
+        references = self._inverse.get(target)
+        if references is None:
+            return
+        sources = references.get(reference)
+        if sources is None or source not in sources:
+            return
+        count = sources[source] - 1
+        if count:
+            sources[source] = count
+            return
+        del sources[source]
+        if not sources:
+            del references[reference]
+            if not references:
+                del self._inverse[target]
+
+    def notifyChanged(self, notification):
+        if self._inverse is None:
+            return
+        feature = notification.feature
+        if not feature.is_reference:
+            return
+        kind = notification.kind
+        if kind in (Kind.ADD, Kind.REMOVE, Kind.SET, Kind.UNSET):
+            old, new = notification.old, notification.new
+            removed = [] if old is None else [old]
+            added = [] if new is None else [new]
+        elif kind == Kind.ADD_MANY:
+            removed, added = [], list(notification.new)
+        elif kind == Kind.REMOVE_MANY:
+            removed, added = list(notification.old), []
+        else:  # the objects are moved, but not out of their container
+            return
+
+        if feature.containment:
+            for eobject in removed:
+                self._remove(eobject)
+            for eobject in added:
+                self._add(eobject)
+        elif feature in self.references:
+            source = notification.notifier
+            if source not in self._sources:
+                return
+            for target in removed:
+                self._unlink(target, feature, source)
+            for target in added:
+                self._link(target, feature, source)
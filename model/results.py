@@ -0,0 +1,386 @@
+"""Columnar view of the results of the queries.
+
+A ``QueryResults`` keeps one ``QueryResult`` (or ``SerializableQueryResult``)
+object per row, each one with its list of values. ``ResultTable`` stores the
+same results by column instead, one NumPy array per field of the header, so
+a value is found in constant time, and the columns can be filtered, sorted
+and exported without going through the rows::
+
+    from model.results import ResultTable
+
+    table = ResultTable.of(query_results)  # cached, see below
+    table.getValue('name', 3)
+    neurons = table.filter(table.column('type') == 'neuron')
+    neurons.sort('size', reverse=True).to_results()  # a new QueryResults
+
+    table = ResultTable.from_rows(engine.execute(query))  # without EObjects
+
+The type of a column is inferred from its values: ``bool``, ``int64``,
+``float64``, or ``object`` for the other values (strings, mixed values).
+The missing values (None) are kept in a validity mask, see ``valid()``.
+
+``ResultTable.of()`` gives the table of a ``QueryResults``, built on the
+first call and kept until the header or the rows are modified, it is what
+``QueryResults.getValue()`` uses.
+
+``column()`` and ``to_numpy()`` give the arrays of the table without copy,
+``buffers()`` gives a column in the Arrow layout (validity bitmap, offsets
+and data buffers): the buffers of the numeric columns are views of the
+arrays, the booleans and the strings are packed.
+"""
+from numbers import Integral, Real
+import numpy
+from pyecore.notification import EObserver
+from .datasources import QueryResults, QueryResult, SerializableQueryResult
+
+__all__ = ['ResultTable']
+
+
+def _column(values, dtype=None):
+    """Gives the data and the validity mask (None if all the values are
+    given) of a column.
+    """
+    valid = numpy.fromiter((x is not None for x in values), dtype=bool,
+                           count=len(values))
+    complete = bool(valid.all())
+    present = values if complete else [x for x in values if x is not None]
+    if dtype is None:
+        dtype = _infer(present)
+    dtype = numpy.dtype(dtype)
+    if dtype.kind == 'O':
+        data = numpy.empty(len(values), dtype=object)
+        data[:] = values
+    elif complete:
+        data = numpy.array(values, dtype=dtype)
+    else:
+        data = numpy.zeros(len(values), dtype=dtype)
+        data[valid] = numpy.array(present, dtype=dtype)
+    return data, None if complete else valid
+
+
+def _infer(values):
+    if not values:
+        return object
+    if all(isinstance(x, bool) for x in values):
+        return bool
+    if all(isinstance(x, Integral) and not isinstance(x, bool)
+           for x in values):
+        if -2 ** 63 <= min(values) and max(values) < 2 ** 63:
+            return numpy.int64
+        return object
+    if all(isinstance(x, Real) and not isinstance(x, bool) for x in values):
+        return numpy.float64
+    return object
+
+
+def _ranks(data, valid, reverse):
+    """Gives the sort keys of a column: the rank of each value, the missing
+    values last.
+    """
+    ranks = numpy.empty(len(data), dtype=numpy.int64)
+    present = data if valid is None else data[valid]
+    try:
+        uniques, inverse = numpy.unique(present, return_inverse=True)
+        count = len(uniques)
+    except TypeError:  # an object column of values of different types
+        count, inverse = _python_ranks(present)
+    if reverse:
+        inverse = count - 1 - inverse
+    if valid is None:
+        ranks[:] = inverse
+    else:
+        ranks[valid] = inverse
+        ranks[~valid] = count
+    return ranks
+
+
+def _python_ranks(values):
+    """Gives the number of distinct values and the rank of each value, the
+    numbers first, then the other values grouped by type.
+    """
+    keys = [_sort_key(x) for x in values]
+    inverse = numpy.empty(len(keys), dtype=numpy.int64)
+    rank, previous = -1, None
+    for i in sorted(range(len(keys)), key=keys.__getitem__):
+        if rank < 0 or keys[i] != previous:
+            rank, previous = rank + 1, keys[i]
+        inverse[i] = rank
+    return rank + 1, inverse
+
+
+def _sort_key(value):
+    if isinstance(value, Real):
+        return 0, '', value
+    return 1, type(value).__name__, value
+
+
+class ResultTable(object):
+    """Results of a query stored by column.
+
+    header is the list of the fields, columns the data of each field and
+    masks the validity mask of the columns that have missing values.
+    """
+    def __init__(self, header, columns, masks=None, identifier=None):
+        self.header = list(header)
+        self.columns = dict(columns)
+        self.masks = dict(masks or {})
+        self.id = identifier
+        self._fields = {x: i for i, x in enumerate(self.header)}
+        lengths = {len(x) for x in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('the columns do not have the same length')
+        self._length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def of(cls, results):
+        """Gives the table of results (a ``QueryResults``), creates it if
+        required.
+
+        The table is kept on results until its header or its rows are
+        modified. It must not be modified, ``copy()`` it first.
+        """
+        try:
+            return results._result_table
+        except AttributeError:
+            table = cls.from_results(results)
+            _TableObserver(results)
+            results._result_table = table
+            return table
+
+    @classmethod
+    def from_rows(cls, rows, header=None, types=None, identifier=None):
+        """Gives the table of rows (dicts field -> value).
+
+        The header is made of the fields of the rows in order of appearance
+        if not given, types are the NumPy dtypes of some fields (inferred
+        from the values by default).
+        """
+        rows = list(rows)
+        if header is None:
+            header, fields = [], set()
+            for row in rows:
+                for field in row:
+                    if field not in fields:
+                        fields.add(field)
+                        header.append(field)
+        return cls.from_columns(
+            {x: [row.get(x) for row in rows] for x in header}, header, types,
+            identifier)
+
+    @classmethod
+    def from_columns(cls, values, header=None, types=None, identifier=None):
+        """Gives the table of values (field -> list of values of the
+        column), see ``from_rows()``.
+        """
+        types = types or {}
+        header = list(values if header is None else header)
+        columns, masks = {}, {}
+        for field in header:
+            data, valid = _column(list(values[field]), types.get(field))
+            columns[field] = data
+            if valid is not None:
+                masks[field] = valid
+        return cls(header, columns, masks, identifier)
+
+    @classmethod
+    def from_results(cls, results, types=None):
+        """Gives the table of results (a ``QueryResults``), see
+        ``from_rows()``.
+
+        The values of the ``SerializableQueryResult`` are strings, types
+        gives the dtypes to convert them to.
+        """
+        header = list(results.header)
+        rows = [list(x.values) for x in results.results]
+        values = {}
+        for i, field in enumerate(header):
+            values[field] = [x[i] if i < len(x) else None for x in rows]
+        return cls.from_columns(values, header, types, results.id)
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return '<{} {!r}: {} rows, {}>'.format(
+            type(self).__name__, self.id, len(self),
+            ', '.join('{} {}'.format(x, self.columns[x].dtype)
+                      for x in self.header))
+
+    def _field(self, field):
+        if isinstance(field, int):
+            return self.header[field]
+        if field not in self._fields:
+            raise KeyError('no field {!r} in the results'.format(field))
+        return field
+
+    def getValue(self, field, row):
+        """Gives the value of field (or of the field number) in row, None
+        if it is missing.
+        """
+        field = self._field(field)
+        valid = self.masks.get(field)
+        if valid is not None and not valid[row]:
+            return None
+        value = self.columns[field][row]
+        return value.item() if isinstance(value, numpy.generic) else value
+
+    def column(self, field):
+        """Gives the data of a column (no copy). The values of the missing
+        values are 0 (False for a boolean column, None for an object
+        column).
+        """
+        return self.columns[self._field(field)]
+
+    def valid(self, field):
+        """Gives the validity mask of a column: False for the missing
+        values.
+        """
+        field = self._field(field)
+        valid = self.masks.get(field)
+        if valid is None:
+            return numpy.ones(len(self), dtype=bool)
+        return valid
+
+    def row(self, row):
+        """Gives a row as a dict field -> value."""
+        return {x: self.getValue(x, row) for x in self.header}
+
+    def rows(self):
+        """Gives the rows as dicts field -> value."""
+        return [self.row(i) for i in range(len(self))]
+
+    def copy(self):
+        return self.take(numpy.arange(len(self)))
+
+    def take(self, rows):
+        """Gives a new table made of rows (an array of row numbers)."""
+        rows = numpy.asarray(rows, dtype=numpy.intp)
+        return type(self)(self.header,
+                          {x: y[rows] for x, y in self.columns.items()},
+                          {x: y[rows] for x, y in self.masks.items()},
+                          self.id)
+
+    def filter(self, mask):
+        """Gives a new table made of the rows selected by mask, a boolean
+        array (_e.g_: ``table.column('size') > 10``).
+        """
+        mask = numpy.asarray(mask, dtype=bool)
+        if mask.shape != (len(self),):
+            raise ValueError('the mask must have one value per row')
+        return self.take(numpy.flatnonzero(mask))
+
+    def order(self, *fields, reverse=False):
+        """Gives the row numbers sorted by the values of fields (the missing
+        values last), the sort is stable.
+        """
+        order = numpy.arange(len(self))
+        for field in reversed(fields):
+            field = self._field(field)
+            ranks = _ranks(self.columns[field], self.masks.get(field),
+                           reverse)
+            order = order[numpy.argsort(ranks[order], kind='stable')]
+        return order
+
+    def sort(self, *fields, reverse=False):
+        """Gives a new table sorted by the values of fields, see
+        ``order()``.
+        """
+        return self.take(self.order(*fields, reverse=reverse))
+
+    def to_numpy(self):
+        """Gives the columns by field, the columns with missing values as
+        masked arrays (no copy).
+        """
+        arrays = {}
+        for field in self.header:
+            data = self.columns[field]
+            valid = self.masks.get(field)
+            if valid is not None:
+                data = numpy.ma.MaskedArray(data, mask=~valid, copy=False)
+            arrays[field] = data
+        return arrays
+
+    def buffers(self, field):
+        """Gives a column in the Arrow layout: ``(validity, offsets,
+        data)``.
+
+        validity is the bitmap of the valid values (least significant bit
+        first) or None, offsets the int32 offsets of the strings in data
+        (None for a fixed width column). The data of the numeric columns is
+        a view of the column, the booleans are packed as bits and the
+        strings encoded in UTF-8. An object column that is not made of
+        strings cannot be exported.
+        """
+        field = self._field(field)
+        data = self.columns[field]
+        valid = self.masks.get(field)
+        validity = None
+        if valid is not None:
+            validity = numpy.packbits(valid, bitorder='little').data
+        if data.dtype.kind == 'b':
+            return validity, None, \
+                numpy.packbits(data, bitorder='little').data
+        if data.dtype.kind != 'O':
+            return validity, None, numpy.ascontiguousarray(data).data
+        values = data if valid is None else data[valid]
+        if not all(isinstance(x, str) for x in values):
+            raise TypeError('the column {!r} is not made of strings'
+                            .format(field))
+        encoded = [b'' if x is None else x.encode('utf-8') for x in data]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int32)
+        numpy.cumsum([len(x) for x in encoded], out=offsets[1:])
+        return validity, offsets.data, memoryview(b''.join(encoded))
+
+    def to_results(self, serializable=False):
+        """Gives the table as a ``QueryResults`` made of ``QueryResult``
+        rows, or of ``SerializableQueryResult`` rows (the values as strings,
+        the booleans as ``true`` and ``false``) if serializable.
+        """
+        results = QueryResults()
+        results.id = self.id
+        results.header.extend(self.header)
+        columns = []
+        for field in self.header:
+            values = self.columns[field].tolist()
+            valid = self.masks.get(field)
+            if valid is not None:
+                values = [x if y else None for x, y in zip(values, valid)]
+            if serializable:
+                values = [_serialize(x) for x in values]
+            columns.append(values)
+        row_class = SerializableQueryResult if serializable else QueryResult
+        for values in zip(*columns):
+            result = row_class()
+            result.values.extend(values)
+            results.results.append(result)
+        return results
+
+
+def _serialize(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class _TableObserver(EObserver):
+    """Forgets the cached table of a ``QueryResults`` when it, or one of
+    its rows, is modified.
+    """
+    def __init__(self, results):
+        super().__init__()
+        self.results = results
+        self.observed = [results]
+        self.observed.extend(results.results)
+        for notifier in self.observed:
+            notifier.listeners.append(self)
+
+    def notifyChanged(self, notification):
+        if notification.feature.name not in ('id', 'header', 'results',
+                                             'values'):
+            return
+        for notifier in self.observed:
+            notifier.listeners.remove(self)
+        self.observed = []
+        self.results.__dict__.pop('_result_table', None)
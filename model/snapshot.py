@@ -0,0 +1,578 @@
+"""Binary snapshots of Geppetto models.
+
+A snapshot stores a fully loaded model in a compact binary form that can be
+reloaded without any text parsing, which is much faster than reading the XMI
+again. It is made of:
+
+* a string table, every string of the model (ids, names, units...) is stored
+  only once,
+* a class table, the EClasses of the model objects and their serialized
+  features,
+* the objects, in containment order, with their EClass and their position in
+  the containment tree,
+* for each EClass, a column block per feature that gives the values of the
+  feature for all the objects of this EClass. References are encoded as
+  object indexes instead of fragment paths.
+
+``GeppettoSnapshotResource`` is a PyEcore resource that reads and writes
+snapshots. The file is memory mapped when it is loaded::
+
+    from pyecore.resources import ResourceSet, URI
+    from model.snapshot import GeppettoSnapshotResource, save_snapshot
+
+    rset = ResourceSet()
+    rset.resource_factory['snapshot'] = GeppettoSnapshotResource
+
+    resource = rset.get_resource(URI('model.xmi'))
+    save_snapshot(resource, URI('model.snapshot'))
+    snapshot = rset.get_resource(URI('model.snapshot'))
+
+All the values are stored in little endian.
+"""
+import gc
+import mmap
+import struct
+import sys
+from array import array
+from io import BytesIO
+from ordered_set import OrderedSet
+from pyecore.ecore import EProxy, EEnum
+from pyecore.valuecontainer import EValue
+from pyecore.resources import Resource, URI
+from .arrays import DoubleArray
+
+__all__ = ['GeppettoSnapshotResource', 'save_snapshot', 'encode_snapshot',
+           'decode_snapshot']
+
+MAGIC = b'GEPSNAP\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sI4x')
+ARRAY_HEADER = struct.Struct('<c3xI')
+ALIGNMENT = 8
+
+# feature kinds
+STRING = 1
+BOOLEAN = 2
+INTEGER = 3
+DOUBLE = 4
+ENUM = 5
+DATA = 6
+REFERENCE = 7
+CONTAINMENT = 8
+MANY = 0x10
+
+TYPECODES = {STRING: 'i', BOOLEAN: 'b', INTEGER: 'q', DOUBLE: 'd',
+             ENUM: 'i', DATA: 'i', REFERENCE: 'i'}
+
+# states of a feature in the mask column
+UNSET = 0
+SET = 1
+SET_NONE = 2
+
+SWAP_BYTES = sys.byteorder != 'little'
+
+
+def feature_kind(feature):
+    """Gives how the values of feature are stored, or None if the feature is
+    not stored.
+    """
+    if feature.derived or feature.transient:
+        return None
+    many = MANY if feature.many else 0
+    if feature.is_reference:
+        if feature.containment:
+            return CONTAINMENT | many
+        opposite = feature.eOpposite
+        if opposite is not None and opposite.containment:
+            return None  # rebuilt from the containment tree
+        return REFERENCE | many
+    etype = feature._eType
+    if isinstance(etype, EEnum):
+        return ENUM | many
+    python_type = getattr(etype, 'eType', None)
+    if python_type is str:
+        return STRING | many
+    if python_type is bool:
+        return BOOLEAN | many
+    if python_type is int:
+        return INTEGER | many
+    if python_type is float:
+        return DOUBLE | many
+    return DATA | many
+
+
+def all_features(eclass):
+    """Gives the structural features of eclass, the features of its super
+    types first (this is the order used by EMF to serialize them).
+    """
+    features = []
+    for supertype in eclass.eSuperTypes:
+        features.extend(f for f in all_features(supertype)
+                        if f not in features)
+    features.extend(eclass.eStructuralFeatures)
+    return features
+
+
+def save_snapshot(resource, output):
+    """Writes the content of resource in a snapshot.
+
+    resource can be any PyEcore resource, output is an URI (or a path).
+    """
+    if not isinstance(output, URI):
+        output = URI(output)
+    stream = output.create_outstream()
+    try:
+        SnapshotWriter(resource).write(stream)
+        stream.flush()
+    finally:
+        output.close_stream()
+
+
+def encode_snapshot(resource):
+    """Gives the snapshot of the content of resource as bytes."""
+    stream = BytesIO()
+    SnapshotWriter(resource).write(stream)
+    return stream.getvalue()
+
+
+def decode_snapshot(resource, data):
+    """Adds the objects of a snapshot (a bytes-like object) to resource.
+
+    resource can be any PyEcore resource.
+    """
+    # building the objects creates lots of containers, the garbage
+    # collector would try to collect them over and over
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with memoryview(data) as view:
+            SnapshotDecoder(resource).decode(SnapshotReader(view))
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+class SnapshotWriter(object):
+    """Encodes the content of a resource as a snapshot."""
+    def __init__(self, resource):
+        self.resource = resource
+        self.strings = {}
+        self.classes = {}
+        self.features = []
+
+    def string(self, value):
+        try:
+            return self.strings[value]
+        except KeyError:
+            sid = self.strings[value] = len(self.strings)
+            return sid
+
+    def write(self, stream):
+        string = self.string
+        objects = []
+        for root in self.resource.contents:
+            objects.append(root)
+            objects.extend(root.eAllContents())
+        indexes = {obj: i for i, obj in enumerate(objects)}
+
+        class_ids = array('I')
+        parents = array('i')
+        parent_features = array('I')
+        instances = []
+        ids = array('i')
+        for obj in objects:
+            eclass = obj.eClass
+            try:
+                cid = self.classes[eclass]
+            except KeyError:
+                cid = self.classes[eclass] = len(self.features)
+                self.features.append([(f, feature_kind(f))
+                                      for f in all_features(eclass)
+                                      if feature_kind(f) is not None])
+                instances.append([])
+            class_ids.append(cid)
+            instances[cid].append(obj)
+            container = obj._container
+            if container is None or obj in self.resource.contents:
+                parents.append(-1)
+                parent_features.append(0)
+            else:
+                parents.append(indexes[container])
+                containers = self.features[class_ids[indexes[container]]]
+                feature = obj._containment_feature
+                parent_features.append(next(i for i, (f, _)
+                                            in enumerate(containers)
+                                            if f is feature))
+            internal_id = obj._internal_id
+            ids.append(-1 if internal_id is None else string(internal_id))
+
+        columns = []
+        for cid, feature, kind in stored_columns(self.features):
+            columns.extend(self.encode_column(instances[cid], feature, kind,
+                                              indexes))
+
+        schema = array('i')
+        for eclass, cid in sorted(self.classes.items(), key=lambda x: x[1]):
+            schema.extend((string(eclass.ePackage.nsURI),
+                           string(eclass.name),
+                           len(self.features[cid])))
+            for feature, kind in self.features[cid]:
+                schema.extend((string(feature.name), kind))
+
+        offsets = array('I', [0])
+        text = ''.join(self.strings)
+        for value in self.strings:
+            offsets.append(offsets[-1] + len(value))
+
+        stream.write(HEADER.pack(MAGIC, VERSION))
+        for values in [offsets, array('B', text.encode('utf-8')), schema,
+                       class_ids, parents, parent_features, ids] + columns:
+            write_array(stream, values)
+
+    def encode_column(self, objects, feature, kind, indexes):
+        name = feature.name
+        many = kind & MANY
+        kind &= ~MANY
+        mask = array('B')
+        counts = array('I')
+        values = array(TYPECODES[kind])
+        if kind == REFERENCE:
+            def encode(value):
+                if value is None:
+                    return -1
+                try:
+                    return indexes[value]
+                except KeyError:
+                    path, _ = self.resource._build_path_from(value)
+                    return -2 - self.string(path.split()[-1])
+        elif kind == STRING:
+            def encode(value):
+                return -1 if value is None else self.string(value)
+        elif kind == ENUM:
+            def encode(value):
+                return -1 if value is None else self.string(value.name)
+        elif kind == DATA:
+            to_string = feature._eType.to_string
+
+            def encode(value):
+                return -1 if value is None else self.string(to_string(value))
+        else:
+            encode = None
+        for obj in objects:
+            if feature not in obj._isset:
+                mask.append(UNSET)
+                if many:
+                    counts.append(0)
+                else:
+                    values.append(0)
+                continue
+            value = obj.__getattribute__(name)
+            if many:
+                mask.append(SET)
+                counts.append(len(value))
+                if isinstance(value, DoubleArray):
+                    values.frombytes(value.array.tobytes())
+                else:
+                    values.extend(value if encode is None
+                                  else map(encode, value))
+            elif value is None and encode is None:
+                mask.append(SET_NONE)
+                values.append(0)
+            else:
+                mask.append(SET)
+                values.append(value if encode is None else encode(value))
+        return [mask, counts, values] if many else [mask, values]
+
+
+def stored_columns(features):
+    """Gives the (class id, feature, kind) of the column blocks in the order
+    they are stored.
+
+    Attributes come first, then references and then references with an
+    opposite: it is the order in which the XMI loaders set them (the
+    opposites are set as a side effect of the resolution of the references),
+    and the order of the attributes in a saved XMI follows it.
+    """
+    columns = [(cid, feature, kind)
+               for cid, class_features in enumerate(features)
+               for feature, kind in class_features
+               if kind & ~MANY != CONTAINMENT]
+    columns.sort(key=lambda x: (x[2] & ~MANY == REFERENCE,
+                                getattr(x[1], 'eOpposite', None) is not None))
+    return columns
+
+
+def write_array(stream, values):
+    data = values.tobytes() if not SWAP_BYTES else swapped(values).tobytes()
+    stream.write(ARRAY_HEADER.pack(values.typecode.encode(), len(values)))
+    stream.write(data)
+    stream.write(b'\x00' * (-len(data) % ALIGNMENT))
+
+
+def swapped(values):
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values
+
+
+class SnapshotReader(object):
+    """Reads the arrays of a snapshot one after the other."""
+    def __init__(self, view):
+        self.view = view
+        magic, version = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a Geppetto snapshot')
+        if version != VERSION:
+            raise ValueError('Unsupported snapshot version {}'
+                             .format(version))
+        self.position = HEADER.size
+
+    def next_slice(self, typecode):
+        code, count = ARRAY_HEADER.unpack_from(self.view, self.position)
+        if code.decode() != typecode:
+            raise ValueError('Corrupted snapshot, expected an array of "{}" '
+                             'at {}'.format(typecode, self.position))
+        start = self.position + ARRAY_HEADER.size
+        end = start + count * array(typecode).itemsize
+        self.position = end + (-end % ALIGNMENT)
+        return self.view[start:end]
+
+    def next_array(self, typecode):
+        values = array(typecode)
+        values.frombytes(self.next_slice(typecode))
+        if SWAP_BYTES:
+            values.byteswap()
+        return values
+
+
+class SnapshotDecoder(object):
+    """Builds the objects of a snapshot in a resource."""
+    def __init__(self, resource):
+        self.resource = resource
+
+    def decode(self, reader):
+        resource = self.resource
+        offsets = reader.next_array('I')
+        text = str(reader.next_slice('B'), 'utf-8')
+        strings = [text[start:end]
+                   for start, end in zip(offsets, offsets[1:])]
+
+        schema = iter(reader.next_array('i'))
+        classes = []
+        features = []
+        for nsuri in schema:
+            name = strings[next(schema)]
+            epackage = resource.get_metamodel(strings[nsuri])
+            eclass = epackage.getEClassifier(name)
+            if eclass is None:
+                raise ValueError('Unknown EClass {} in {}'
+                                 .format(name, strings[nsuri]))
+            if isinstance(eclass, type):  # static metamodel
+                eclass = eclass.eClass
+            class_features = []
+            for _ in range(next(schema)):
+                feature_name = strings[next(schema)]
+                feature = eclass.findEStructuralFeature(feature_name)
+                if feature is None:
+                    raise ValueError('Unknown feature {} for EClass {}'
+                                     .format(feature_name, name))
+                class_features.append((feature, next(schema)))
+            classes.append(eclass.python_class)
+            features.append(class_features)
+
+        class_ids = reader.next_array('I')
+        parents = reader.next_array('i')
+        parent_features = reader.next_array('I')
+        ids = reader.next_array('i')
+
+        objects = [classes[cid]() for cid in class_ids]
+        instances = [[] for _ in classes]
+        for cid, obj in zip(class_ids, objects):
+            instances[cid].append(obj)
+        for obj, sid in zip(objects, ids):
+            if sid >= 0:
+                obj._internal_id = strings[sid]
+                resource.uuid_dict[strings[sid]] = obj
+
+        columns = stored_columns(features)
+        for cid, feature, kind in columns:
+            if kind & ~MANY != REFERENCE:
+                self._decode_column(reader, instances[cid], feature, kind,
+                                    strings, objects)
+        self._decode_containment(objects, class_ids, parents,
+                                 parent_features, features)
+        for cid, feature, kind in columns:
+            if kind & ~MANY == REFERENCE:
+                self._decode_column(reader, instances[cid], feature, kind,
+                                    strings, objects)
+
+    def _decode_column(self, reader, objects, feature, kind, strings,
+                       all_objects):
+        many = kind & MANY
+        kind &= ~MANY
+        mask = reader.next_array('B')
+        counts = reader.next_array('I') if many else None
+        values = reader.next_array(TYPECODES[kind])
+        if kind == REFERENCE:
+            def decode(index):
+                if index >= 0:
+                    return all_objects[index]
+                if index == -1:
+                    return None
+                return EProxy(strings[-2 - index], self.resource)
+            values = [decode(x) for x in values]
+        elif kind == STRING:
+            values = [None if x < 0 else strings[x] for x in values]
+        elif kind == ENUM:
+            eenum = feature._eType
+            values = [None if x < 0 else eenum.getEEnumLiteral(strings[x])
+                      for x in values]
+        elif kind == DATA:
+            from_string = feature._eType.from_string
+            values = [None if x < 0 else from_string(strings[x])
+                      for x in values]
+        elif kind == BOOLEAN:
+            values = [bool(x) for x in values]
+
+        if many:
+            set_many(objects, feature, mask, counts, values)
+        else:
+            set_single(objects, feature, mask, values)
+
+    def _decode_containment(self, objects, class_ids, parents,
+                            parent_features, features):
+        groups = {}
+        for obj, parent, index in zip(objects, parents, parent_features):
+            if parent < 0:
+                self.resource.append(obj)
+                continue
+            try:
+                groups[parent, index].append(obj)
+            except KeyError:
+                groups[parent, index] = [obj]
+        factories = {}
+        # the features are set in the order of their serialization
+        for (parent, index), children in sorted(groups.items()):
+            feature, _ = features[class_ids[parent]][index]
+            try:
+                new_value = factories[feature]
+            except KeyError:
+                new_value = factories[feature] = value_factory(feature)
+            contain(objects[parent], feature, children, new_value)
+
+
+class GeppettoSnapshotResource(Resource):
+    """Resource that reads and writes Geppetto model snapshots."""
+    def load(self, options=None):
+        self.options = options or {}
+        try:
+            with open(self.uri.plain, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, TypeError, ValueError):
+            data = self.uri.create_instream().read()
+            self.uri.close_stream()
+        try:
+            decode_snapshot(self, data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def save(self, output=None, options=None):
+        self.options = options or {}
+        stream = self.open_out_stream(output)
+        try:
+            SnapshotWriter(self).write(stream)
+            stream.flush()
+        finally:
+            self.uri.close_stream()
+
+
+# The objects read from a snapshot are new and consistent, the values are
+# directly built instead of going through the PyEcore setters (which check
+# the values, notify the changes and look for the resource of each object).
+
+def value_factory(feature):
+    """Gives a function that builds the EValue of feature for an object."""
+    template = vars(EValue(None, feature))
+    new = object.__new__
+
+    def new_value(owner, value):
+        evalue = new(EValue)
+        attributes = evalue.__dict__
+        attributes.update(template)
+        attributes['owner'] = owner
+        attributes['_value'] = value
+        return evalue
+    return new_value
+
+
+def fill(collection, values):
+    """Adds values to a PyEcore collection without any notification."""
+    if isinstance(collection, list):
+        list.extend(collection, values)
+    elif isinstance(collection, DoubleArray):
+        collection._extend(values)
+    else:
+        add = OrderedSet.add
+        for value in values:
+            add(collection, value)
+
+
+def set_single(objects, feature, mask, values):
+    template = vars(EValue(None, feature))
+    new = object.__new__
+    name = feature.name
+    inverse = feature.is_reference and feature.eOpposite is None
+    for obj, state, value in zip(objects, mask, values):
+        if state == UNSET:
+            continue
+        if state == SET_NONE:
+            value = None
+        evalue = new(EValue)
+        attributes = evalue.__dict__
+        attributes.update(template)
+        attributes['owner'] = obj
+        attributes['_value'] = value
+        obj.__dict__[name] = evalue
+        obj._isset[feature] = None
+        if inverse and value is not None and not isinstance(value, EProxy):
+            value._inverse_rels.add((obj, feature))
+
+
+def set_many(objects, feature, mask, counts, values):
+    name = feature.name
+    inverse = feature.is_reference and feature.eOpposite is None
+    position = 0
+    for obj, state, count in zip(objects, mask, counts):
+        if state == UNSET:
+            continue
+        items = values[position:position + count]
+        position += count
+        fill(obj.__getattribute__(name), items)
+        obj._isset[feature] = None
+        if inverse:
+            couple = (obj, feature)
+            for value in items:
+                if not isinstance(value, EProxy):
+                    value._inverse_rels.add(couple)
+
+
+def contain(parent, feature, children, new_value):
+    if feature.many:
+        fill(parent.__getattribute__(feature.name), children)
+    else:
+        parent.__dict__[feature.name] = new_value(parent, children[-1])
+    parent._isset[feature] = None
+    opposite = feature.eOpposite
+    if opposite is None:
+        couple = (parent, feature)
+    else:
+        new_container = value_factory(opposite)
+    for child in children:
+        child._container = parent
+        child._containment_feature = feature
+        if opposite is None:
+            child._inverse_rels.add(couple)
+        else:
+            child.__dict__[opposite.name] = new_container(child, parent)
+            child._isset[opposite] = None
@@ -0,0 +1,265 @@
+"""Parameter sweeps over a Geppetto model.
+
+The parameters of a model are the variables of a ``ParameterType``, the
+value of a parameter is the ``Quantity`` of its initial values. An
+``ExperimentState`` gives the values of some parameters of a run in its
+``setParameters``: a ``VariableValue`` per parameter, the pointer to the
+parameter and its value.
+
+``ParameterSweep`` resolves the pointers of a set of parameters once, down
+to the quantities that hold their values, then applies the rows of a matrix
+(one row per run, one column per parameter) to the model, or gives an
+``ExperimentState`` per row::
+
+    import numpy
+    from model.sweep import ParameterSweep
+
+    sweep = ParameterSweep(model, ['network.pyramidals[0].Ca.conductance',
+                                   'network.pyramidals[0].Ca.m.instances'])
+    matrix = numpy.column_stack((numpy.linspace(5, 15, 1000),
+                                 numpy.full(1000, 2.0)))
+    for row in sweep.run(matrix):
+        save(row, model)  # the values of the row are applied
+    for state in sweep.states(matrix):
+        send(dumps(state))  # the setParameters of each row
+    state = sweep.state(matrix[0])  # a new ExperimentState
+    results = sweep.map(simulate, matrix, processes=8)
+
+The targets are pointers, instance paths (resolved with
+``model.paths.PathIndex``, the model has to be in a resource) or an
+``ExperimentState``, whose ``setParameters`` pointers are the targets. A
+parameter without any value gets a ``PhysicalQuantity`` (with the value of
+the default value of its type, if any).
+
+``apply()`` and ``run()`` write the values directly into the quantities,
+without creating any object and without notifications, the listeners of
+the model (_e.g_: ``model.sync.SyncTracker``) do not see them. ``run()``
+gives the original values back to the parameters at its end, ``restore()``
+does it after ``apply()``.
+
+The ``ExperimentState`` of the sweep (``template()``) has a ``VariableValue``
+per parameter, with a copy of its pointer and of its quantity. ``states()``
+writes the values of each row into it and gives it again for each row,
+without creating any object, it has to be copied to be kept. ``state()``
+gives a new copy, made with a ``model.clone.Copier``. The pointers of the
+states are not recorded on the side of the variables they target.
+
+``map()`` calls ``function(sweep, index, row)`` for each row, once the
+values of the row are applied, and gives the results in the order of the
+rows. With several processes, each worker decodes a snapshot of the
+resource of the model (see ``model.snapshot``) and resolves the targets
+again by their instance paths, the rows are then sent by chunks. function
+and its results must be picklable.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+from pyecore.resources import URI
+from .model import ExperimentState, VariableValue
+from .types import ParameterType
+from .values import Pointer, Quantity, PhysicalQuantity
+from .variables import TypeToValueMap
+from .paths import PathIndex
+from .clone import Copier
+from .snapshot import encode_snapshot, decode_snapshot
+from .batch import new_resource_set
+
+__all__ = ['ParameterSweep']
+
+
+class ParameterSweep(object):
+    """Applies the values of a matrix to parameters of a model, see the
+    module.
+    """
+    def __init__(self, model, targets):
+        self.model = model
+        if isinstance(targets, ExperimentState):
+            targets = [x.pointer for x in targets.setParameters]
+        self.pointers = []  # the pointer of each parameter
+        self.quantities = []  # the quantity of each parameter
+        for target in targets:
+            pointer = self._pointer(target)
+            self.pointers.append(pointer)
+            self.quantities.append(self._quantity(pointer))
+        self.original = numpy.array([x.value for x in self.quantities],
+                                    dtype=numpy.float64)
+        self._template = None
+        self._template_quantities = None
+
+    def __len__(self):
+        """Number of parameters."""
+        return len(self.quantities)
+
+    def _pointer(self, target):
+        if isinstance(target, Pointer):
+            return target
+        resource = self.model.eResource
+        if resource is None:
+            raise ValueError('the paths are resolved in the resource of the '
+                             'model, it has none')
+        pointer = PathIndex.of(resource).pointer(target)
+        if pointer is None:
+            raise ValueError('no variable at {!r}'.format(target))
+        return pointer
+
+    @staticmethod
+    def _quantity(pointer):
+        """Gives the quantity of the parameter pointer targets, creates it
+        if required.
+        """
+        if not pointer.elements:
+            raise ValueError('the pointer has no element')
+        variable = pointer.elements[-1].variable
+        for initial_value in variable.initialValues:
+            if isinstance(initial_value.value, Quantity):
+                quantity = initial_value.value
+                break
+        else:
+            parameter_type = next((x for x in variable.types
+                                   if isinstance(x, ParameterType)), None)
+            if parameter_type is None:
+                raise ValueError('{!r} is not a parameter'.format(
+                    pointer.getInstancePath()))
+            quantity = PhysicalQuantity()
+            default = parameter_type.defaultValue
+            if isinstance(default, Quantity):
+                quantity.value = default.value
+            initial_value = TypeToValueMap()
+            initial_value.key = parameter_type
+            initial_value.value = quantity
+            variable.initialValues.append(initial_value)
+        if Quantity.value not in quantity._isset:
+            # the value is written in its EValue, which must exist (reading
+            # an unset value builds it, without setting the value)
+            quantity.value = quantity.value or 0.0
+        return quantity
+
+    def _check(self, matrix):
+        matrix = numpy.asarray(matrix, dtype=numpy.float64)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.quantities):
+            raise ValueError('the rows must have {} values'.format(
+                len(self.quantities)))
+        return matrix
+
+    def apply(self, values):
+        """Sets the values of the parameters, without notifications."""
+        if len(values) != len(self.quantities):
+            raise ValueError('{} values for {} parameters'.format(
+                len(values), len(self.quantities)))
+        if isinstance(values, numpy.ndarray):
+            values = values.tolist()
+        for quantity, value in zip(self.quantities, values):
+            quantity.__dict__['value']._value = value
+
+    def restore(self):
+        """Gives their original values back to the parameters."""
+        self.apply(self.original)
+
+    def run(self, matrix):
+        """Applies the rows of matrix one after the other, gives the index of
+        the row applied.
+        """
+        matrix = self._check(matrix)
+        try:
+            for index, row in enumerate(matrix.tolist()):
+                self.apply(row)
+                yield index
+        finally:
+            self.restore()
+
+    def template(self):
+        """Gives the ``ExperimentState`` of the sweep, see the module."""
+        if self._template is None:
+            state = ExperimentState()
+            copier = Copier(link_external=False)
+            quantities = []
+            for pointer, quantity in zip(self.pointers, self.quantities):
+                variable_value = VariableValue()
+                variable_value.pointer = copier.copy(pointer)
+                variable_value.value = copier.copy(quantity)
+                quantities.append(variable_value.value)
+                state.setParameters.append(variable_value)
+            copier.copy_references()
+            self._template = state
+            self._template_quantities = quantities
+        return self._template
+
+    def state(self, values):
+        """Gives a new ``ExperimentState`` whose ``setParameters`` have the
+        values.
+        """
+        if len(values) != len(self.quantities):
+            raise ValueError('{} values for {} parameters'.format(
+                len(values), len(self.quantities)))
+        if isinstance(values, numpy.ndarray):
+            values = values.tolist()
+        template = self.template()
+        mapping = {}
+        copier = Copier(mapping, link_external=False)
+        state = copier.copy(template)
+        copier.copy_references()
+        for quantity, value in zip(self._template_quantities, values):
+            mapping[quantity].__dict__['value']._value = value
+        return state
+
+    def states(self, matrix):
+        """Gives the ``ExperimentState`` of the sweep for each row of
+        matrix, with the values of the row (the same state for all the rows,
+        see the module).
+        """
+        matrix = self._check(matrix)
+        state = self.template()
+        quantities = self._template_quantities
+        for row in matrix.tolist():
+            for quantity, value in zip(quantities, row):
+                quantity.__dict__['value']._value = value
+            yield state
+
+    def map(self, function, matrix, processes=None, chunk_size=None):
+        """Gives the results of function(sweep, index, row) for the rows of
+        matrix, each one called once the values of its row are applied.
+
+        The rows are split between processes worker processes (as many as
+        CPUs by default), by chunks of chunk_size rows. With a single
+        process, function is called in the calling process.
+        """
+        matrix = self._check(matrix)
+        processes = min(processes or os.cpu_count() or 1, len(matrix))
+        if processes <= 1:
+            return [function(self, index, row)
+                    for index, row in zip(self.run(matrix), matrix)]
+        resource = self.model.eResource
+        if resource is None:
+            raise ValueError('the model is sent to the workers as a snapshot '
+                             'of its resource, it has none')
+        paths = [x.getInstancePath() for x in self.pointers]
+        root = resource.contents.index(self.model)
+        if chunk_size is None:
+            chunk_size = -(-len(matrix) // (4 * processes))
+        starts = range(0, len(matrix), chunk_size)
+        with ProcessPoolExecutor(
+                max_workers=processes, initializer=_start_worker,
+                initargs=(encode_snapshot(resource), str(resource.uri),
+                          root, paths)) as executor:
+            chunks = executor.map(
+                _run_rows, [function] * len(starts), starts,
+                [matrix[x:x + chunk_size] for x in starts])
+            return [result for chunk in chunks for result in chunk]
+
+
+_worker_sweep = None  # the sweep of a worker process
+
+
+def _start_worker(data, uri, root, paths):
+    global _worker_sweep
+    resource = new_resource_set().create_resource(URI(uri))
+    decode_snapshot(resource, data)
+    _worker_sweep = ParameterSweep(resource.contents[root], paths)
+
+
+def _run_rows(function, start, rows):
+    sweep = _worker_sweep
+    return [function(sweep, start + index, row)
+            for index, row in zip(sweep.run(rows), rows)]
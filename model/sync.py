@@ -0,0 +1,403 @@
+"""Dirty tracking of the Geppetto models and delta patches.
+
+Every ``Node``, ``Tag`` and ``Value`` is an ``ISynchable``: its ``synched``
+flag tells if the client already has its current state. ``SyncTracker``
+listens to the modifications of a resource and clears the flag of the
+modified objects and of all their ancestors, so the modified parts of a
+model can be found from the root. It also keeps the modified features of
+each object, and gives them as a patch that can be sent instead of the whole
+model and applied on another copy of it::
+
+    from model.sync import SyncTracker, apply_patch
+
+    tracker = SyncTracker.of(resource)
+    tracker.mark_synched()  # the whole model was sent
+    root.name = 'newName'
+    patch = tracker.delta()  # JSON compatible, the model is synched again
+    apply_patch(other_resource, patch)
+
+A patch is a dict::
+
+    {'classes': [[nsURI, name], ...],
+     'changes': [{'path': '//@libraries.0/@types.3',
+                  'attributes': {name: value},
+                  'references': {name: path or [paths]},
+                  'contents': {name: object or [objects]},
+                  'append': {name: [objects]}}, ...]}
+
+The changes give the current value of the modified features of an object
+(its URI fragment is the path). The attribute values are encoded as strings
+(``EDataType.to_string``), the referenced objects by their path. The
+contained objects are sent whole: ``{'eClass': position in classes,
+'attributes': ..., 'references': ..., 'contents': ...}``. When objects were
+only appended to a containment feature, only the new ones are sent
+(``append``), otherwise the whole content of the feature is. The references
+of the other objects to the objects that are sent again are part of the
+patch as well.
+
+The objects added or removed from the resource itself are not tracked.
+"""
+from pyecore.notification import EObserver, Kind
+from .index import ModelIndex
+from .model import ISynchable
+from .snapshot import value_factory
+
+__all__ = ['SyncTracker', 'apply_patch']
+
+
+class _FeatureChange(object):
+    """Modification of a feature of an object."""
+    __slots__ = ('appended',)
+
+    def __init__(self, appended=None):
+        # number of objects of a containment feature before the first
+        # modification, as long as objects are only appended to it
+        self.appended = appended
+
+
+class SyncTracker(EObserver):
+    """Tracks the modifications of a resource, see the module docstring."""
+    def __init__(self, resource):
+        super().__init__()
+        self.resource = resource
+        self._changes = {}  # object -> {feature: _FeatureChange}
+        self._dirty = []  # the synched objects that were marked as dirty
+        resource.listeners.append(self)
+
+    @classmethod
+    def of(cls, resource):
+        """Gives the tracker of resource, creates it if required."""
+        try:
+            return resource._sync_tracker
+        except AttributeError:
+            tracker = resource._sync_tracker = cls(resource)
+            return tracker
+
+    def is_dirty(self):
+        return bool(self._changes)
+
+    def mark_synched(self, eobject=None):
+        """Marks every object of the resource (or eobject and its content)
+        as synched and forgets the modifications.
+
+        The flags are set without notification, there can be hundreds of
+        thousands of them.
+        """
+        if eobject is None:
+            for root in self.resource.contents:
+                self.mark_synched(root)
+            self._changes.clear()
+            self._dirty = []
+            return
+        feature = ISynchable.synched
+        new_value = value_factory(feature)
+        for child in _all_contents(eobject):
+            if isinstance(child, ISynchable):
+                evalue = child.__dict__.get('synched')
+                if evalue is None:
+                    child.__dict__['synched'] = new_value(child, True)
+                else:
+                    evalue._value = True
+                child._isset[feature] = None
+
+    def notifyChanged(self, notification):
+        feature = notification.feature
+        if feature is ISynchable.synched or feature.derived \
+                or feature.transient:
+            return
+        if feature.is_reference and not feature.containment \
+                and feature.eOpposite is not None \
+                and feature.eOpposite.containment:
+            return
+        notifier = notification.notifier
+        features = self._changes.setdefault(notifier, {})
+        change = features.get(feature)
+        if feature.is_reference and feature.containment and feature.many:
+            appended = self._appended(notifier, feature, notification)
+            if change is None:
+                change = features[feature] = _FeatureChange(appended)
+            elif change.appended is not None and appended is None:
+                change.appended = None
+        elif change is None:
+            features[feature] = _FeatureChange()
+        self._mark_dirty(notifier)
+
+    @staticmethod
+    def _appended(owner, feature, notification):
+        # number of objects before the added ones if they were appended
+        values = owner.__getattribute__(feature.name)
+        kind = notification.kind
+        if kind == Kind.ADD:
+            added = [notification.new]
+        elif kind == Kind.ADD_MANY:
+            added = list(notification.new)
+        else:
+            return None
+        start = len(values) - len(added)
+        if all(x is y for x, y in zip(values[start:], added)):
+            return start
+        return None
+
+    def _mark_dirty(self, eobject):
+        # the ancestors of a dirty object are dirty, going up stops at the
+        # first one that is
+        while eobject is not None:
+            if isinstance(eobject, ISynchable):
+                if not eobject.synched:
+                    return
+                eobject.synched = False
+                self._dirty.append(eobject)
+            eobject = eobject._container
+
+    def delta(self, clear=True):
+        """Gives the patch of the modifications since the last time the model
+        was synched, and marks the model as synched unless clear is False.
+        """
+        index = ModelIndex.of(self.resource)
+        encoder = _Encoder(index)
+        sent = set()  # the objects sent whole
+        entries = {}
+        for eobject, features in self._changes.items():
+            if not self._in_resource(eobject, index):
+                continue
+            entry = entries[eobject] = {}
+            for feature, change in features.items():
+                value = eobject.__getattribute__(feature.name)
+                if feature.is_attribute:
+                    entry.setdefault('attributes', {})[feature.name] = \
+                        encoder.attribute(feature, value)
+                elif not feature.containment:
+                    entry.setdefault('references', {})[feature.name] = \
+                        encoder.reference(feature, value)
+                elif feature.many and change.appended is not None:
+                    added = value[change.appended:]
+                    sent.update(added)
+                    entry.setdefault('append', {})[feature.name] = \
+                        [encoder.eobject(x) for x in added]
+                else:
+                    children = value if feature.many else [value]
+                    sent.update(x for x in children if x is not None)
+                    entry.setdefault('contents', {})[feature.name] = \
+                        encoder.contents(feature, value)
+
+        # the objects sent whole are new objects for the other copy, the
+        # references to them are sent again
+        fixes = {}
+        for root in sent:
+            for eobject in _all_contents(root):
+                for owner, feature in encoder.referrers(eobject):
+                    if not self._is_sent(owner, sent):
+                        fixes.setdefault(owner, set()).add(feature)
+        for owner, features in fixes.items():
+            if not self._in_resource(owner, index):
+                continue
+            references = entries.setdefault(owner, {}) \
+                .setdefault('references', {})
+            for feature in features:
+                references[feature.name] = encoder.reference(
+                    feature, owner.__getattribute__(feature.name))
+
+        changes = []
+        for eobject, entry in entries.items():
+            if self._is_sent(eobject, sent):
+                continue  # its current state is sent with its container
+            entry['path'] = index.fragment(eobject)
+            changes.append(entry)
+        # the objects are modified from the root, their path is the one
+        # they have once their ancestors are modified
+        changes.sort(key=lambda x: x['path'].count('/'))
+        patch = {'classes': encoder.classes, 'changes': changes}
+        if clear:
+            self._clear(sent)
+        return patch
+
+    def _clear(self, sent):
+        for eobject in self._dirty:
+            eobject.synched = True
+        for eobject in sent:
+            self.mark_synched(eobject)
+        self._changes.clear()
+        self._dirty = []
+
+    @staticmethod
+    def _in_resource(eobject, index):
+        try:
+            index.fragment(eobject)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _is_sent(eobject, sent):
+        while eobject is not None:
+            if eobject in sent:
+                return True
+            eobject = eobject._container
+        return False
+
+
+def _all_contents(eobject):
+    yield eobject
+    yield from eobject.eAllContents()
+
+
+def _stored(feature):
+    if feature.derived or feature.transient:
+        return False
+    opposite = feature.eOpposite if feature.is_reference else None
+    return not (opposite is not None and opposite.containment)
+
+
+class _Encoder(object):
+    """Encodes the values of the features for a patch."""
+    def __init__(self, index):
+        self.index = index
+        self.classes = []
+        self._class_positions = {}
+
+    def attribute(self, feature, value):
+        to_string = feature._eType.to_string
+        if feature.many:
+            return [None if x is None else to_string(x) for x in value]
+        return None if value is None else to_string(value)
+
+    def reference(self, feature, value):
+        # the objects out of the resource (removed from it) are not sent
+        if feature.many:
+            return [x for x in map(self._fragment, value) if x is not None]
+        return None if value is None else self._fragment(value)
+
+    def _fragment(self, eobject):
+        try:
+            return self.index.fragment(eobject)
+        except ValueError:
+            return None
+
+    def contents(self, feature, value):
+        if feature.many:
+            return [self.eobject(x) for x in value]
+        return None if value is None else self.eobject(value)
+
+    def eobject(self, eobject):
+        eclass = eobject.eClass
+        try:
+            position = self._class_positions[eclass]
+        except KeyError:
+            position = self._class_positions[eclass] = len(self.classes)
+            self.classes.append([eclass.ePackage.nsURI, eclass.name])
+        data = {'eClass': position}
+        for feature in eobject._isset:
+            if not _stored(feature):
+                continue
+            value = eobject.__getattribute__(feature.name)
+            if feature.is_attribute:
+                kind, value = 'attributes', self.attribute(feature, value)
+            elif feature.containment:
+                kind, value = 'contents', self.contents(feature, value)
+            else:
+                kind, value = 'references', self.reference(feature, value)
+            data.setdefault(kind, {})[feature.name] = value
+        return data
+
+    @staticmethod
+    def referrers(eobject):
+        """Gives the (owner, feature) that refer to eobject."""
+        for owner, feature in eobject._inverse_rels:
+            if not feature.containment:
+                yield owner, feature
+        for feature in eobject.eClass.eAllReferences():
+            opposite = feature.eOpposite
+            if feature.containment or opposite is None \
+                    or opposite.containment:
+                continue
+            value = eobject.__getattribute__(feature.name)
+            for target in (value if feature.many else [value]):
+                if target is not None:
+                    yield target, opposite
+
+
+def apply_patch(resource, patch):
+    """Applies a patch of ``SyncTracker.delta()`` on resource."""
+    index = ModelIndex.of(resource)
+    classes = []
+    for nsuri, name in patch['classes']:
+        eclass = resource.get_metamodel(nsuri).getEClassifier(name)
+        if eclass is None:
+            raise ValueError('Unknown EClass {} in {}'.format(name, nsuri))
+        classes.append(eclass)
+    decoder = _Decoder(classes)
+    for entry in patch['changes']:
+        eobject = index.get(entry['path'])
+        if eobject is None:
+            raise ValueError('No object at {}'.format(entry['path']))
+        decoder.update(eobject, entry)
+    # the paths of the references are the ones of the modified model
+    for eobject, feature, value in decoder.references:
+        if feature.many:
+            targets = [index.get(x) for x in value]
+        else:
+            targets = None if value is None else index.get(value)
+        _set_references(eobject, feature, targets)
+
+
+class _Decoder(object):
+    """Builds the objects of a patch and sets their features."""
+    def __init__(self, classes):
+        self.classes = classes
+        self.references = []  # (eobject, feature, paths) set at the end
+
+    def update(self, eobject, data):
+        eclass = eobject.eClass
+        for name, value in data.get('attributes', {}).items():
+            feature = eclass.findEStructuralFeature(name)
+            _set_attribute(eobject, feature, value)
+        for name, value in data.get('references', {}).items():
+            feature = eclass.findEStructuralFeature(name)
+            self.references.append((eobject, feature, value))
+        for name, value in data.get('contents', {}).items():
+            feature = eclass.findEStructuralFeature(name)
+            if feature.many:
+                collection = eobject.__getattribute__(name)
+                for child in list(collection):
+                    child.delete()
+                collection.extend([self.eobject(x) for x in value])
+            else:
+                child = eobject.__getattribute__(name)
+                if child is not None:
+                    child.delete()
+                eobject.__setattr__(name, None if value is None
+                                    else self.eobject(value))
+        for name, value in data.get('append', {}).items():
+            eobject.__getattribute__(name).extend(
+                [self.eobject(x) for x in value])
+
+    def eobject(self, data):
+        eobject = self.classes[data['eClass']]()
+        self.update(eobject, data)
+        return eobject
+
+
+def _set_attribute(eobject, feature, value):
+    from_string = feature._eType.from_string
+    if feature.many:
+        collection = eobject.__getattribute__(feature.name)
+        collection.clear()
+        collection.extend([None if x is None else from_string(x)
+                           for x in value])
+    else:
+        eobject.__setattr__(feature.name,
+                            None if value is None else from_string(value))
+
+
+def _set_references(eobject, feature, value):
+    # both sides of the references with an opposite are in the patch, they
+    # are set as they are to keep their order
+    if not feature.many:
+        eobject.__setattr__(feature.name, value)
+        return
+    update_opposite = feature.eOpposite is None
+    collection = eobject.__getattribute__(feature.name)
+    for target in list(collection):
+        collection.remove(target, update_opposite)
+    for target in value:
+        collection.append(target, update_opposite)
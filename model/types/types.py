@@ -1,7 +1,7 @@
 from pyecore.ecore import *
 import pyecore.ecore as Ecore
-from model import ISynchable
-from model import Node
+from ..model import ISynchable
+from ..model import Node
 
 name = 'types'
 nsURI = 'https://raw.githubusercontent.com/openworm/org.geppetto.model/development/src/main/resources/geppettoModel.ecore#//types'
@@ -24,10 +24,12 @@ class Type(Node):
         super().__init__()
 
     def getDefaultValue(self):
-        raise NotImplementedError('Operation getDefaultValue(...) is not yet implemented')
+        from ..hierarchy import default_value
+        return default_value(self)
 
     def extendsType(self, type):
-        raise NotImplementedError('Operation extendsType(...) is not yet implemented')
+        from ..hierarchy import extends_type
+        return extends_type(self, type)
 
 
 class VisualType(Type):
@@ -1,7 +1,7 @@
 from pyecore.ecore import *
 import pyecore.ecore as Ecore
-from model import ISynchable
-from model import Node
+from ..model import ISynchable
+from ..model import Node
 
 name = 'values'
 nsURI = 'https://raw.githubusercontent.com/openworm/org.geppetto.model/development/src/main/resources/geppettoModel.ecore#//values'
@@ -23,7 +23,7 @@ class StringToValueMap(EObject, metaclass=MetaEClass):
 
 
 class PointerElement(EObject, metaclass=MetaEClass):
-    index = EAttribute(eType=EInteger)
+    index = EAttribute(eType=EInteger, default_value=-1)
     variable = EReference()
     type = EReference()
 
@@ -80,7 +80,7 @@ class Unit(Value):
 
 class TimeSeries(Value):
     scalingFactor = EAttribute(eType=EInt)
-    value = EAttribute(eType=EDouble, upper=-1)
+    value = EAttribute(eType=EDouble, unique=False, upper=-1)
     unit = EReference(containment=True)
 
     def __init__(self):
@@ -102,7 +102,8 @@ class Pointer(Value):
         super().__init__()
 
     def getInstancePath(self):
-        raise NotImplementedError('Operation getInstancePath(...) is not yet implemented')
+        from ..paths import instance_path
+        return instance_path(self)
 
 
 class Point(Value):
@@ -1,7 +1,7 @@
 from pyecore.ecore import *
 import pyecore.ecore as Ecore
-from model import ISynchable
-from model import Node
+from ..model import ISynchable
+from ..model import Node
 
 name = 'variables'
 nsURI = 'https://raw.githubusercontent.com/openworm/org.geppetto.model/development/src/main/resources/geppettoModel.ecore#//variables'
@@ -0,0 +1,251 @@
+"""Streaming XMI writer of the Geppetto resources.
+
+PyEcore saves a resource by building the lxml tree of the whole document
+before writing it, the tree of a big network takes as much memory as the
+model itself. ``XMIWriter`` walks the containment tree and writes each
+element as soon as it is visited, and the URI fragments of the references
+are computed on demand using the index of the resource
+(``model.index.ModelIndex``), each one only once.
+
+The output is byte for byte the one of ``XMIResource.save()``: the same
+elements and attributes in the same order, the same indentation and
+escaping, and the same namespace prefixes. As the namespaces declared on the
+root element depend on the types of the whole content, the content is
+written to a temporary file first, and copied after the root start tag.
+
+``GeppettoXMIResource.save()`` uses it::
+
+    resource.save(output=URI('network.xmi'))
+"""
+import re
+import shutil
+import tempfile
+from io import TextIOWrapper
+from pyecore.ecore import EProxy, EDouble
+from pyecore.resources.xmi import XMIOptions, XMI, XMI_URL, XSI, XSI_URL
+from .arrays import pack_doubles
+from .index import ModelIndex
+
+__all__ = ['XMIWriter']
+
+_ATTRIBUTE_ESCAPES = re.compile('[&<>"\n\r\t]')
+_ATTRIBUTE_ENTITIES = {'&': '&amp;', '<': '&lt;', '>': '&gt;',
+                       '"': '&quot;', '\n': '&#10;', '\r': '&#13;',
+                       '\t': '&#9;'}
+_TEXT_ESCAPES = re.compile('[&<>\r]')
+_TEXT_ENTITIES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '\r': '&#13;'}
+
+
+def _attribute_entity(match):
+    return _ATTRIBUTE_ENTITIES[match.group()]
+
+
+def _text_entity(match):
+    return _TEXT_ENTITIES[match.group()]
+
+
+def escape_attribute(value):
+    """Escapes an attribute value the way libxml2 does."""
+    return _ATTRIBUTE_ESCAPES.sub(_attribute_entity, value)
+
+
+def escape_text(value):
+    """Escapes a text content the way libxml2 does."""
+    return _TEXT_ESCAPES.sub(_text_entity, value)
+
+
+class XMIWriter(object):
+    """Writes the content of a resource as XMI in a binary stream.
+
+    The namespace prefixes are registered in the resource (``prefixes`` and
+    ``reverse_nsmap``) as ``XMIResource.save()`` does.
+    """
+    def __init__(self, resource, options=None, packed_arrays=False):
+        self.resource = resource
+        self.options = options or {}
+        self.serialize_default = \
+            self.options.get(XMIOptions.SERIALIZE_DEFAULT_VALUES, False)
+        self.packed_arrays = packed_arrays
+        self._root = None
+        self._index = ModelIndex.of(resource)
+        self._id_attributes = {}
+
+    def write(self, stream, encoding='UTF-8'):
+        """Writes the resource, which must have a single root, in stream."""
+        resource = self.resource
+        resource.prefixes.clear()
+        resource.reverse_nsmap.clear()
+        root = resource.contents[0]
+        resource.register_eobject_epackage(root)
+        with tempfile.TemporaryFile() as content:
+            text = TextIOWrapper(content, encoding=encoding, newline='')
+            self._write(text, root, None, 0)
+            text.flush()
+            content.seek(0)
+            nsmap = {XMI: XMI_URL}
+            nsmap.update(resource.prefixes)
+            tag, attributes, end = self._root
+            root_tag = ["<?xml version='1.0' encoding='{}'?>\n<{}"
+                        .format(encoding, tag)]
+            root_tag.extend(' xmlns:{}="{}"'.format(prefix,
+                                                   escape_attribute(uri))
+                            for prefix, uri in nsmap.items())
+            root_tag.extend(attributes)
+            root_tag.append(' {}:version="2.0"{}'.format(XMI, end))
+            stream.write(''.join(root_tag).encode(encoding))
+            shutil.copyfileobj(content, stream)
+
+    def _write(self, text, obj, feature, depth):
+        # Writes the element of obj and its content. The start tag of the
+        # root element is only kept, its namespaces are not known yet.
+        resource = self.resource
+        eclass = obj.eClass
+        start = []
+        if feature is None:
+            prefix = resource.reverse_nsmap.get(eclass.ePackage.nsURI)
+            tag = '{}:{}'.format(prefix, eclass.name) if prefix \
+                else eclass.name
+        else:
+            tag = feature._name
+            if feature._eType != eclass:
+                start.append(self._explicit_type(obj))
+        if resource.use_uuid:
+            resource._assign_uuid(obj)
+            start.append(' {}:id="{}"'.format(
+                XMI, escape_attribute(obj._internal_id)))
+
+        # the attributes are all known before the sub elements are written,
+        # the sub elements are kept as (kind, feature, value)
+        elements = []
+        packed = []
+        for feat in obj._isset:
+            if feat.derived or feat.transient:
+                continue
+            name = feat._name
+            value = obj.__getattribute__(name)
+            if value is None:
+                if self.serialize_default:
+                    elements.append(('none', feat, None))
+                continue
+            if hasattr(feat._eType, 'eType') and feat._eType.eType is dict:
+                elements.append(('dict', feat, value))
+            elif feat.is_attribute:
+                etype = feat._eType
+                if feat.many:
+                    if self.packed_arrays and etype is EDouble:
+                        packed.append((name, value))
+                        continue
+                    if not value:
+                        continue
+                    to_str = etype.to_string
+                    strings = [None if x is None else to_str(x)
+                               for x in value]
+                    if any(not x or any(c.isspace() for c in x)
+                           for x in strings):
+                        elements.append(('text', feat, strings))
+                    else:
+                        start.append(' {}="{}"'.format(
+                            name, escape_attribute(' '.join(strings))))
+                elif value != feat.get_default_value() \
+                        or self.serialize_default:
+                    start.append(' {}="{}"'.format(
+                        name, escape_attribute(etype.to_string(value))))
+            elif feat.eOpposite and feat.eOpposite.containment:
+                continue
+            elif not feat.containment:
+                if feat.many:
+                    embedded = []
+                    crossrefs = []
+                    for x in value:
+                        fragment, crossref = self._reference(x)
+                        if crossref:
+                            crossrefs.append((fragment, x))
+                        else:
+                            embedded.append(fragment)
+                    if embedded:
+                        start.append(' {}="{}"'.format(
+                            name, escape_attribute(' '.join(embedded))))
+                    if crossrefs:
+                        elements.append(('href', feat, crossrefs))
+                else:
+                    fragment, crossref = self._reference(value)
+                    if crossref:
+                        elements.append(('href', feat, [(fragment, value)]))
+                    else:
+                        start.append(' {}="{}"'.format(
+                            name, escape_attribute(fragment)))
+            else:
+                elements.append(('child', feat, value))
+        for name, value in packed:
+            if len(value):
+                start.append(' {}="{}"'.format(name, pack_doubles(value)))
+
+        end = '>\n' if elements else '/>\n'
+        if feature is None:
+            self._root = (tag, start, end)
+        else:
+            text.write('{}<{}{}{}'.format('  ' * depth, tag, ''.join(start),
+                                          end))
+        if not elements:
+            return
+        indent = '  ' * (depth + 1)
+        for kind, feat, value in elements:
+            name = feat._name
+            if kind == 'child':
+                for child in (value if feat.many else [value]):
+                    self._write(text, child, feat, depth + 1)
+            elif kind == 'text':
+                for x in value:
+                    if x is None:
+                        text.write(self._none(indent, name))
+                    else:
+                        text.write('{}<{}>{}</{}>\n'.format(
+                            indent, name, escape_text(x), name))
+            elif kind == 'href':
+                for fragment, x in value:
+                    text.write('{}<{} href="{}"{}/>\n'.format(
+                        indent, name, escape_attribute(fragment),
+                        self._explicit_type(x)))
+            elif kind == 'dict':
+                for key, x in value.items():
+                    text.write('{}<{} key="{}" value="{}"/>\n'.format(
+                        indent, name, escape_attribute(key),
+                        escape_attribute(x)))
+            else:
+                text.write(self._none(indent, name))
+        text.write('{}</{}>\n'.format('  ' * depth, tag))
+
+    def _none(self, indent, name):
+        # lxml declares the xsi namespace on the element if it is not
+        # registered yet, it is declared on the root element instead
+        self.resource.prefixes.setdefault(XSI, XSI_URL)
+        return '{}<{} {}:nil="true"/>\n'.format(indent, name, XSI)
+
+    def _explicit_type(self, obj):
+        resource = self.resource
+        resource.prefixes[XSI] = XSI_URL
+        epackage = obj.eClass.ePackage
+        uri = epackage.nsURI
+        if uri not in resource.reverse_nsmap:
+            resource.register_nsmap(epackage.nsPrefix, uri)
+        return ' {}:type="{}:{}"'.format(XSI, resource.reverse_nsmap[uri],
+                                         obj.eClass.name)
+
+    def _reference(self, obj):
+        # gives (fragment, is_crossref) as XMIResource._build_path_from
+        resource = self.resource
+        if isinstance(obj, (type, EProxy)) or resource.use_uuid:
+            return resource._build_path_from(obj)
+        eclass = obj.eClass
+        try:
+            id_attribute = self._id_attributes[eclass]
+        except KeyError:
+            id_attribute = self._id_attributes[eclass] = \
+                resource.get_id_attribute(eclass)
+        if id_attribute is not None:
+            # the id is only used for the objects of the resource
+            return resource._build_path_from(obj)
+        try:
+            return self._index.fragment(obj), False
+        except ValueError:  # an object of another resource
+            return resource._build_path_from(obj)
@@ -0,0 +1,517 @@
+"""Geppetto-aware XMI resource.
+
+``GeppettoXMIResource`` is a drop-in replacement for PyEcore's
+``XMIResource``. Instead of parsing the whole document into an lxml tree and
+then walking it, the XMI is read with ``iterparse``: each EObject is created
+as soon as its start tag is read, and XML elements are released as soon as
+they are closed. Peak memory therefore stays close to the size of the final
+object graph. The resulting root object is the same as the one produced by
+the stock loader.
+
+The resource is registered for the ``xmi`` extension of a ``ResourceSet``::
+
+    from pyecore.resources import ResourceSet, URI
+    from model.xmi import GeppettoXMIResource
+
+    rset = ResourceSet()
+    rset.resource_factory['xmi'] = GeppettoXMIResource
+
+Using the ``GeppettoXMIOptions.LAZY_TYPES`` option, the content of each type
+of the model libraries (``//@libraries.N/@types.M``) is only built the first
+time one of its containment features is accessed::
+
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = rset.get_resource(URI('model.xmi'), options=options)
+
+The resource is saved by the streaming ``model.writer.XMIWriter``, which
+writes the same file as PyEcore without building the lxml tree first.
+
+Using the ``GeppettoXMIOptions.PACKED_ARRAYS`` option when saving, the
+double lists (``TimeSeries.value``...) are written as packed base64 blocks
+instead of one token per value (see ``model.arrays``). The resource reads
+both forms, other XMI readers only the default one::
+
+    resource.save(options={GeppettoXMIOptions.PACKED_ARRAYS: True})
+
+Using the ``GeppettoXMIOptions.INTERN_STRINGS`` option when loading, the
+string values and the ids are interned as they are read, all the
+occurrences of a string share the same object (see ``model.canonical``).
+"""
+import os
+import sys
+from enum import unique, Enum
+from functools import lru_cache
+from io import BytesIO
+from xml.parsers import expat
+from lxml.etree import iterparse
+from pyecore.ecore import EProxy, EDouble, EString
+from pyecore.resources import URI
+from pyecore.resources.xmi import XMIResource, XMI, XSI, XSI_URL
+from .arrays import DoubleArray, is_packed, pack_doubles, unpack_doubles
+from .index import ModelIndex
+from .writer import XMIWriter
+
+__all__ = ['GeppettoXMIResource', 'GeppettoXMIOptions']
+
+
+@unique
+class GeppettoXMIOptions(Enum):
+    LAZY_TYPES = 0
+    PACKED_ARRAYS = 1
+    INTERN_STRINGS = 2
+
+
+class DeferredContent(object):
+    """Stands for the not yet built value of a feature of a lazy type.
+
+    It is placed in the instance dictionary of the type, in place of the
+    value of its containment features, and builds the type content as soon as
+    PyEcore asks it for the feature value.
+    """
+    __slots__ = ('owner', 'name', 'resource')
+
+    def __init__(self, owner, name, resource):
+        self.owner = owner
+        self.name = name
+        self.resource = resource
+
+    def _get(self):
+        self.resource.materialize(self.owner)
+        return self.owner.__getattribute__(self.name)
+
+    def _set(self, value, update_opposite=True):
+        self.resource.materialize(self.owner)
+        self.owner.__setattr__(self.name, value)
+
+    def remove_or_unset(self, value, update_opposite=True):
+        self.resource.materialize(self.owner)
+        self.owner.__getattribute__(self.name)  # creates the real value
+        self.owner.__dict__[self.name].remove_or_unset(value,
+                                                       update_opposite)
+
+
+class TypeSpan(object):
+    """Position of a library type in the XMI file."""
+    __slots__ = ('start', 'end', 'children')
+
+    def __init__(self, start):
+        self.start = start
+        self.end = None
+        self.children = []
+
+
+class GeppettoXMIResource(XMIResource):
+    """XMI resource that builds the Geppetto model while streaming the file.
+    """
+    # tags and attribute keys are repeated thousands of times in a Geppetto
+    # XMI, splitting them once is enough
+    extract_namespace = staticmethod(
+        lru_cache(maxsize=None)(XMIResource.extract_namespace))
+
+    def __init__(self, uri=None, use_uuid=False):
+        super().__init__(uri, use_uuid)
+        self._deferred = {}
+        self._type_cache = {}
+        self._attribute_cache = {}
+        self._intern = False
+
+    def load(self, options=None):
+        self.options = options or {}
+        self.cache_enabled = True
+        self._intern = self.options.get(GeppettoXMIOptions.INTERN_STRINGS,
+                                        False)
+        spans = None
+        if self.options.get(GeppettoXMIOptions.LAZY_TYPES, False):
+            spans = self._scan_types()
+        stream = self.uri.create_instream()
+        try:
+            context = iterparse(stream,
+                                events=('start-ns', 'start', 'end'),
+                                huge_tree=True)
+            self._decode_events(context, self._decode_root, spans)
+        finally:
+            self.uri.close_stream()
+        if self._deferred:
+            self._nsmap = dict(self.prefixes)
+
+        if self.contents:
+            self._decode_ereferences()
+        self._clean_registers()
+
+    def save(self, output=None, options=None):
+        # the saved file could be the one the deferred types come from
+        self.materialize()
+        if len(self.contents) != 1:
+            super().save(output, options)
+            return
+        self.options = options or {}
+        packed = self.options.get(GeppettoXMIOptions.PACKED_ARRAYS, False)
+        writer = XMIWriter(self, self.options, packed_arrays=packed)
+        uri = output if isinstance(output, URI) \
+            else URI(output) if output else self.uri
+        stream = uri.create_outstream()
+        try:
+            writer.write(stream)
+            stream.flush()
+        finally:
+            uri.close_stream()
+
+    def _go_across(self, obj, serialize_default=False):
+        packed = None
+        if self.options.get(GeppettoXMIOptions.PACKED_ARRAYS, False):
+            packed = [x for x in obj._isset
+                      if x.many and x.is_attribute and x._eType is EDouble
+                      and not (x.derived or x.transient)]
+        if not packed:
+            return super()._go_across(obj, serialize_default)
+        # the packed features are hidden from the stock serialization
+        isset = obj._isset
+        obj._isset = {x: None for x in isset if x not in packed}
+        try:
+            node = super()._go_across(obj, serialize_default)
+        finally:
+            obj._isset = isset
+        for feature in packed:
+            values = obj.__getattribute__(feature._name)
+            if len(values):
+                node.attrib[feature._name] = pack_doubles(values)
+        return node
+
+    def _decode_eattribute_value(self, eobject, eattribute, value,
+                                 from_tag=False):
+        if eattribute.many and eattribute._eType is EDouble \
+                and is_packed(value):
+            values = unpack_doubles(value)
+            collection = eobject.__getattribute__(eattribute._name)
+            if not isinstance(collection, DoubleArray):
+                values = values.tolist()
+            collection.extend(values)
+            return
+        super()._decode_eattribute_value(eobject, eattribute, value,
+                                         from_tag)
+
+    def resolve(self, fragment, resource=None):
+        if not self.use_uuid:
+            eobject = ModelIndex.of(self).get(self.normalize(fragment))
+            if eobject is not None:
+                return eobject
+        # the content of a lazy type, or a path PyEcore knows how to follow
+        return super().resolve(fragment, resource)
+
+    def _clean_registers(self):
+        super()._clean_registers()
+        self._type_cache = {}
+        self._attribute_cache = {}
+
+    def _init_namespaces(self, xmlroot):
+        self.reverse_nsmap = {v: k for k, v in self.prefixes.items()}
+        self.xsitype = '{{{}}}type'.format(self.prefixes.get(XSI))
+        self.xmiid = '{{{}}}id'.format(self.prefixes.get(XMI))
+        self.schema_tag = '{{{}}}schemaLocation'.format(self.prefixes.get(XSI))
+        self.schema_locations = {}
+        schema_list = xmlroot.attrib.get(self.schema_tag, '').split()
+        for prefix, path in zip(schema_list[::2], schema_list[1::2]):
+            if '#' not in path:
+                path = path + '#'
+            self.schema_locations[prefix] = EProxy(path, self)
+        return '{{{}}}XMI'.format(self.prefixes.get(XMI)) == xmlroot.tag
+
+    def _decode_root(self, elem):
+        if self._init_namespaces(elem):
+            return (None, lambda child: (self._init_modelroot(child), None))
+        return (self._init_modelroot(elem), None)
+
+    def _decode_events(self, context, decode_root, spans=None):
+        # Each stack entry describes the currently open element:
+        # * (eobject, feature) for an EObject that will be attached to the
+        #   previous entry through feature once its element is closed
+        #   (feature is None for the model roots),
+        # * (owner, eattribute) for an element whose text is the value of a
+        #   many EAttribute of owner,
+        # * (None, decode_child) for a wrapper element, decode_child gives
+        #   the entry of its children,
+        # * None for an ignored subtree (nil nodes, deferred content...).
+        # Attaching objects only once they are fully built keeps the
+        # notification cost low: they are not yet part of the resource.
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        find_feature = self._find_feature
+        extract_namespace = self.extract_namespace
+        decode_start = self._decode_start
+        deferring = False
+        for event, elem in context:
+            if event == 'start':
+                if not stack:
+                    push(decode_root(elem))
+                    continue
+                parent = stack[-1]
+                if parent is None or deferring:
+                    push(None)
+                    continue
+                parent_eobj, parent_feature = parent
+                if parent_eobj is None:
+                    push(parent_feature(elem))
+                    continue
+                if parent_feature is not None and parent_feature.is_attribute:
+                    push(None)
+                    continue
+                _, tag = extract_namespace(elem.tag)
+                feature = find_feature(parent_eobj.eClass, tag)
+                if feature is not None and feature.is_attribute:
+                    push((parent_eobj, feature))
+                    continue
+                current = decode_start(elem, parent_eobj)
+                push(current)
+                if spans and len(stack) == 3 and tag == 'types':
+                    span = spans.pop()
+                    if current is not None and self._can_defer(current[0],
+                                                               span):
+                        self._deferred[current[0]] = span
+                        deferring = True
+            elif event == 'end':
+                current = pop()
+                if current is not None:
+                    eobject, feature = current
+                    if eobject is None or feature is None:
+                        pass  # a wrapper or a model root
+                    elif feature.is_attribute:
+                        self._decode_eattribute_value(eobject, feature,
+                                                      elem.text or '',
+                                                      from_tag=True)
+                    else:
+                        if deferring:
+                            deferring = False
+                            self._defer_content(eobject)
+                        parent_eobj = stack[-1][0]
+                        if feature.many:
+                            parent_eobj.__getattribute__(feature._name) \
+                                       .append(eobject)
+                        else:
+                            parent_eobj.__setattr__(feature._name, eobject)
+                # Free the already decoded XML elements
+                elem.clear()
+                previous = elem.getprevious()
+                while previous is not None:
+                    del elem.getparent()[0]
+                    previous = elem.getprevious()
+            else:  # start-ns
+                prefix, uri = elem
+                self.prefixes[prefix] = uri
+
+    def _decode_start(self, node, parent_eobj):
+        """Decodes a start tag into a new EObject and its attributes.
+
+        Returns ``(eobject, containment feature)``, or None if the node does
+        not produce a new EObject. The EObject is not attached to its
+        parent yet.
+        """
+        _, tag = self.extract_namespace(node.tag)
+        feature = self._find_feature(parent_eobj.eClass, tag)
+        attrib = node.attrib
+        if (feature is None or 'href' in attrib
+                or '{{{}}}nil'.format(XSI_URL) in attrib):
+            return self._decode_special(node, parent_eobj)
+
+        type_name = attrib.get(self.xsitype)
+        if type_name is None:
+            type_name = self._type_attribute(node)
+        if type_name is None:
+            etype = feature._eType
+            if isinstance(etype, EProxy):
+                etype = etype.force_resolve()
+        else:
+            etype = self._get_type(type_name, node)
+        eobject = etype()
+
+        attribute_cache = self._attribute_cache
+        intern = self._intern
+        eclass = eobject.eClass
+        erefs = []
+        for key, value in attrib.items():
+            try:
+                eattribute = attribute_cache[eclass, key]
+            except KeyError:
+                eattribute = self._decode_attribute(eobject, key, value, node)
+                attribute_cache[eclass, key] = eattribute
+            if intern and (eattribute is None
+                           or eattribute._eType is EString):
+                value = sys.intern(value)
+            if eattribute is None:
+                if key == self.xmiid:
+                    eobject._internal_id = value
+                    self.uuid_dict[value] = eobject
+                continue
+            if not eattribute.is_attribute:
+                erefs.append((eattribute, value))
+                continue
+            self._decode_eattribute_value(eobject, eattribute, value)
+            if eattribute.iD:
+                self.uuid_dict[value] = eobject
+        if erefs:
+            self._later.append((eobject, erefs))
+        return (eobject, feature)
+
+    def _get_type(self, type_name, node):
+        try:
+            return self._type_cache[type_name]
+        except KeyError:
+            pass
+        prefix, name = type_name.split(':')
+        epackage = self.prefix2epackage(prefix)
+        etype = epackage.getEClassifier(name)
+        if not etype:
+            raise ValueError('Type {} is unknown in {}, {} line {}'
+                             .format(name, epackage, node.tag,
+                                     node.sourceline))
+        self._type_cache[type_name] = etype
+        return etype
+
+    def _decode_special(self, node, parent_eobj):
+        # nil nodes, proxies and unknown features are rare in Geppetto
+        # models, PyEcore knows how to deal with them
+        decoded = self._decode_node(parent_eobj, node)
+        feat_container, eobject, eatts, erefs, from_tag = decoded
+        if not feat_container:
+            return None
+        for eattribute, value in eatts:
+            self._decode_eattribute_value(eobject, eattribute, value,
+                                          from_tag)
+        if erefs:
+            self._later.append((eobject, erefs))
+        return (eobject, feat_container)
+
+    def _scan_types(self):
+        """Finds the position of each library type in the XMI file.
+
+        Returns the spans of the types in reverse document order, or None if
+        the document cannot be lazily loaded.
+        """
+        spans = []
+        depth = 0
+        parser = expat.ParserCreate()
+
+        def start(name, attrs):
+            nonlocal depth
+            depth += 1
+            if depth == 3 and name == 'types':
+                spans.append(TypeSpan(parser.CurrentByteIndex))
+            elif depth == 4 and spans and spans[-1].end is None:
+                if name not in spans[-1].children:
+                    spans[-1].children.append(name)
+            elif depth == 1 and name.endswith(':XMI'):
+                raise StopIteration()
+
+        def end(name):
+            nonlocal depth
+            if depth == 3 and name == 'types':
+                spans[-1].end = parser.CurrentByteIndex
+            depth -= 1
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        stream = self.uri.create_instream()
+        try:
+            parser.ParseFile(stream)
+        except StopIteration:
+            return None  # many roots, the full model is loaded
+        finally:
+            self.uri.close_stream()
+        self._source_stat = self._stat_source()
+        spans.reverse()
+        return spans
+
+    def _stat_source(self):
+        try:
+            stat = os.stat(self.uri.plain)
+            return (stat.st_size, stat.st_mtime)
+        except (OSError, TypeError):
+            return None
+
+    def _can_defer(self, eobject, span):
+        if not span.children:
+            return False
+        eclass = eobject.eClass
+        for name in span.children:
+            feature = self._find_feature(eclass, name)
+            if feature is None or not feature.is_reference:
+                return False
+        return True
+
+    def _defer_content(self, eobject):
+        eclass = eobject.eClass
+        instance_dict = eobject.__dict__
+        isset = eobject._isset
+        for name in self._deferred[eobject].children:
+            feature = self._find_feature(eclass, name)
+            instance_dict[name] = DeferredContent(eobject, name, self)
+            isset[feature] = None
+
+    def is_deferred(self, eobject):
+        """Tells if the content of eobject has not been built yet."""
+        return eobject in self._deferred
+
+    @property
+    def deferred_count(self):
+        """Number of objects whose content has not been built yet."""
+        return len(self._deferred)
+
+    def materialize(self, eobject=None):
+        """Builds the deferred content of eobject.
+
+        If eobject is None, all the deferred types of the resource are built.
+        """
+        if eobject is None:
+            while self._deferred:
+                self.materialize(next(iter(self._deferred)))
+        elif eobject in self._deferred:
+            self._materialize(eobject)
+
+    def _materialize(self, eobject):
+        if self._stat_source() != self._source_stat:
+            raise IOError('"{}" changed since it has been loaded, the content '
+                          'of "{}" cannot be read'.format(self.uri.plain,
+                                                          eobject.name))
+        span = self._deferred[eobject]
+        stream = self.uri.create_instream()
+        try:
+            stream.seek(span.start)
+            data = stream.read(span.end - span.start)
+        finally:
+            self.uri.close_stream()
+        nsmap = ' '.join('xmlns:{}="{}"'.format(prefix, uri)
+                         for prefix, uri in self._nsmap.items() if prefix)
+        data = b''.join((b'<deferred ', nsmap.encode(), b'>', data,
+                         b'</types></deferred>'))
+
+        # the resource could have been saved in the meantime (which clears
+        # the prefixes), or we could be in the middle of another decoding
+        saved_state = (self.prefixes, self.reverse_nsmap, self._later,
+                       self.cache_enabled)
+        self.prefixes = dict(self._nsmap)
+        self.reverse_nsmap = {v: k for k, v in self._nsmap.items()}
+        self._later = []
+        self.cache_enabled = True
+        # the content is added to the real values of the features, the
+        # deferred state is restored if it cannot be built
+        del self._deferred[eobject]
+        instance_dict = eobject.__dict__
+        deferred = {name: value for name, value in instance_dict.items()
+                    if isinstance(value, DeferredContent)}
+        for name in deferred:
+            del instance_dict[name]
+        try:
+            context = iterparse(BytesIO(data), events=('start', 'end'),
+                                huge_tree=True)
+            self._decode_events(context,
+                                lambda elem: (None, lambda child:
+                                              (eobject, None)))
+            self._decode_ereferences()
+            self._clean_registers()
+        except BaseException:
+            instance_dict.update(deferred)
+            self._deferred[eobject] = span
+            raise
+        finally:
+            (self.prefixes, self.reverse_nsmap, self._later,
+             self.cache_enabled) = saved_state
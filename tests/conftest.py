@@ -0,0 +1,71 @@
+import os
+import pytest
+from itertools import chain
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.json import GeppettoJSONResource
+from model.snapshot import GeppettoSnapshotResource
+from model.xmi import GeppettoXMIResource
+
+DATA = 'tests/xmi-data'
+
+
+def new_rset(resource_factory=GeppettoXMIResource):
+    """Gives a resource set with the Geppetto packages registered, that reads
+    the .xmi files with resource_factory, the .json and the .snapshot files
+    with the Geppetto resources.
+    """
+    rset = pygeppetto.register(ResourceSet())
+    rset.resource_factory['xmi'] = resource_factory
+    rset.resource_factory['json'] = GeppettoJSONResource
+    rset.resource_factory['snapshot'] = GeppettoSnapshotResource
+    return rset
+
+
+def signature(root, isset_order=True):
+    """Gives a comparable description of root and of its content: the
+    features, the _isset and the inverse references of each object.
+
+    The order of _isset (the order the features are set in) is ignored if
+    not isset_order.
+    """
+    signature = []
+    for obj in chain([root], root.eAllContents()):
+        isset = [f.name for f in obj._isset]
+        entry = [obj.eClass.name, obj.eURIFragment(),
+                 isset if isset_order else sorted(isset),
+                 sorted((x.eURIFragment(), f.name)
+                        for x, f in obj._inverse_rels)]
+        for feature in obj.eClass.eAllStructuralFeatures():
+            value = obj.eGet(feature)
+            if feature.is_attribute:
+                entry.append(list(value) if feature.many else value)
+            elif not feature.containment:
+                values = value if feature.many else [value]
+                entry.append([x.eURIFragment() for x in values if x])
+        signature.append(entry)
+    return signature
+
+
+@pytest.fixture
+def model_signature():
+    """Gives signature(), see above."""
+    return signature
+
+
+@pytest.fixture
+def rset():
+    """Gives a new resource set, see new_rset()."""
+    return new_rset()
+
+
+@pytest.fixture(scope='session')
+def load():
+    """Gives load(filename, options, resource_factory), that reads a file
+    (relative to tests/xmi-data) in a new resource set.
+    """
+    def load(filename='MediumNet.net.nml.xmi', options=None,
+             resource_factory=GeppettoXMIResource):
+        uri = URI(os.path.join(DATA, str(filename)))
+        return new_rset(resource_factory).get_resource(uri, options=options)
+    return load
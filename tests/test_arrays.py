@@ -0,0 +1,136 @@
+import numpy
+import pytest
+from pyecore.resources import URI
+import model as pygeppetto
+from model.arrays import DoubleArray, enable_arrays, disable_arrays, \
+                         as_array, pack_doubles, unpack_doubles
+from model.snapshot import save_snapshot
+from model.xmi import GeppettoXMIOptions
+
+
+@pytest.fixture
+def arrays():
+    enable_arrays()
+    yield
+    disable_arrays()
+
+
+def series_model(values):
+    root = pygeppetto.GeppettoModel()
+    root.name = 'series'
+    library = pygeppetto.GeppettoLibrary()
+    library.id = 'library'
+    root.libraries.append(library)
+    state = pygeppetto.StateVariableType()
+    state.id = 'state'
+    library.types.append(state)
+    variable = pygeppetto.Variable()
+    variable.id = 'trace'
+    variable.types.append(state)
+    root.variables.append(variable)
+    series = pygeppetto.TimeSeries()
+    series.value = values
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.key = state
+    initial_value.value = series
+    variable.initialValues.append(initial_value)
+    return root
+
+
+def series_values(root):
+    return root.variables[0].initialValues[0].value.value
+
+
+def test_double_array_list_operations(arrays):
+    series = pygeppetto.TimeSeries()
+    values = series.value
+    assert isinstance(values, DoubleArray)
+    expected = []
+    operations = [lambda x: x.append(1.5),
+                  lambda x: x.extend([2.0, 3.0, 3.0]),
+                  lambda x: x.insert(1, 9.0),
+                  lambda x: x.insert(-1, 7.0),
+                  lambda x: x.__setitem__(0, 4.0),
+                  lambda x: x.__setitem__(slice(1, 3), [5.0, 6.0, 8.0]),
+                  lambda x: x.__delitem__(-1),
+                  lambda x: x.pop(0),
+                  lambda x: x.remove(3.0),
+                  lambda x: x.__delitem__(slice(0, 1))]
+    for operation in operations:
+        operation(values)
+        operation(expected)
+        assert values == expected
+        assert list(values) == expected
+        assert values[:] == expected
+    assert pygeppetto.TimeSeries.value in series._isset
+    assert values.count(3.0) == expected.count(3.0)
+    with pytest.raises(TypeError):
+        values.append('1.0')
+
+
+def test_double_array_bulk(arrays):
+    series = pygeppetto.TimeSeries()
+    samples = numpy.linspace(0, 1, 100001)
+    series.value = samples
+    view = series.value.array
+    assert numpy.array_equal(view, samples)
+    assert numpy.shares_memory(view, numpy.asarray(series.value))
+    view[0] = 42.0
+    assert series.value[0] == 42.0
+
+    transformation = pygeppetto.SkeletonTransformation()
+    transformation.skeletonTransformation = numpy.eye(4).ravel()
+    assert len(transformation.skeletonTransformation) == 16
+
+
+def test_as_array():
+    series = pygeppetto.TimeSeries()
+    series.value.extend([1.0, 1.0, 2.0])
+    assert not isinstance(series.value, DoubleArray)
+    values = as_array(series, 'value')
+    assert series.value is values
+    assert values == [1.0, 1.0, 2.0]
+
+
+def test_packed_doubles():
+    samples = numpy.random.RandomState(0).normal(size=1000)
+    packed = pack_doubles(samples)
+    assert packed.startswith('base64:')
+    assert numpy.array_equal(unpack_doubles(packed), samples)
+
+
+def test_arrays_xmi(tmpdir, arrays, rset, load):
+    samples = numpy.random.RandomState(0).normal(size=1000)
+    resource = rset.create_resource(URI(str(tmpdir.join('arrays.xmi'))))
+    resource.append(series_model(samples))
+    resource.save()
+    packed = tmpdir.join('packed.xmi')
+    resource.save(output=URI(str(packed)),
+                  options={GeppettoXMIOptions.PACKED_ARRAYS: True})
+
+    disable_arrays()
+    resource = rset.create_resource(URI(str(tmpdir.join('lists.xmi'))))
+    resource.append(series_model(samples.tolist()))
+    resource.save()
+    assert tmpdir.join('lists.xmi').read() == \
+        tmpdir.join('arrays.xmi').read()
+    assert tmpdir.join('packed.xmi').size() < \
+        tmpdir.join('lists.xmi').size()
+
+    values = series_values(load(packed).contents[0])
+    assert values == samples.tolist()
+    enable_arrays()
+    values = series_values(load(packed).contents[0])
+    assert isinstance(values, DoubleArray)
+    assert numpy.array_equal(values.array, samples)
+
+
+def test_arrays_snapshot(tmpdir, arrays, rset, load):
+    samples = numpy.random.RandomState(0).normal(size=1000)
+    resource = rset.create_resource(URI(str(tmpdir.join('arrays.xmi'))))
+    resource.append(series_model(samples))
+    snapshot = tmpdir.join('arrays.snapshot')
+    save_snapshot(resource, URI(str(snapshot)))
+    values = series_values(load(snapshot).contents[0])
+    assert isinstance(values, DoubleArray)
+    assert numpy.array_equal(values.array, samples)
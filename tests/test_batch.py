@@ -0,0 +1,32 @@
+import pytest
+from pyecore.resources import URI
+from model.batch import load_files, new_resource_set, LoadError
+
+FILES = ['tests/xmi-data/MediumNet.net.nml.xmi',
+         'tests/xmi-data/BigCA1.net.nml.xmi']
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_load_files(tmpdir, processes, model_signature):
+    broken = tmpdir.join('broken.xmi')
+    broken.write('<?xml version="1.0"?>\n<model:GeppettoModel')
+    missing = str(tmpdir.join('missing.xmi'))
+    paths = FILES + [str(broken), missing]
+
+    rset = new_resource_set()
+    results = load_files(paths, rset, processes=processes)
+    assert [x.path for x in results] == paths
+    for path, result in zip(FILES, results):
+        assert result.error is None
+        assert rset.get_resource(URI(path)) is result.resource
+        expected = new_resource_set().get_resource(URI(path))
+        assert model_signature(result.resource.contents[0]) == \
+            model_signature(expected.contents[0])
+
+    for path, result in zip(paths[2:], results[2:]):
+        assert result.resource is None
+        assert isinstance(result.error, LoadError)
+        assert result.error.path == path
+        assert str(result.error).startswith(path)
+        assert 'Traceback' in result.error.remote_traceback
+    assert results[3].error.error_type == 'FileNotFoundError'
@@ -0,0 +1,85 @@
+import sys
+import pytest
+from itertools import chain
+import model as pygeppetto
+from model.canonical import canonicalize
+from model.compact import compact
+from model.xmi import GeppettoXMIOptions
+
+FILES = ['MediumNet.net.nml.xmi', 'BigCA1.net.nml.xmi']
+
+
+def strings_by_value(root, feature_name):
+    strings = {}
+    for obj in chain([root], root.eAllContents()):
+        feature = obj.eClass.findEStructuralFeature(feature_name)
+        value = obj.eGet(feature) if feature is not None else None
+        if isinstance(value, str):
+            strings.setdefault(value, set()).add(id(value))
+    return strings
+
+
+@pytest.mark.parametrize('name', FILES)
+def test_canonicalize(name, model_signature, load):
+    reference = load(name)
+    resource = load(name)
+    report = canonicalize(resource)
+    assert report.bytes > 0
+    assert report['Variable'].objects == \
+        len([x for x in resource.contents[0].eAllContents()
+             if isinstance(x, pygeppetto.Variable)])
+    for feature_name in ('id', 'name', 'unit'):
+        strings = strings_by_value(resource.contents[0], feature_name)
+        assert all(len(x) == 1 for x in strings.values())
+    assert model_signature(resource.contents[0]) == \
+        model_signature(reference.contents[0])
+    assert canonicalize(resource).bytes == 0
+
+
+def test_canonicalize_subtree(load):
+    resource = load('MediumNet.net.nml.xmi')
+    compact(resource)
+    library = resource.contents[0].libraries[0]
+    report = canonicalize(library)
+    assert 'GeppettoModel' not in report
+    assert report['Variable'].strings > 0
+    # the units are interned by compact()
+    assert report['Unit'].objects > 0 and report['Unit'].strings == 0
+    units = strings_by_value(library, 'unit')
+    assert all(len(x) == 1 for x in units.values())
+    assert str(report).splitlines()[-1].split()[-1] == str(report.bytes)
+
+
+def test_canonicalize_sets():
+    results = pygeppetto.QueryResults()
+    names = ['ID', 'name', 'description']
+    # strings built at run time, they are not interned
+    results.header.extend(''.join(list(x)) for x in names)
+    assert not any(x is y for x, y in zip(results.header, names))
+    report = canonicalize(results)
+    assert report['QueryResults'].strings == len(names)
+    assert all(x is sys.intern(y) for x, y in zip(results.header, names))
+    assert list(results.header) == names
+    assert results.header.index('name') == 1 and 'description' in \
+        results.header
+
+
+def test_intern_strings_option(model_signature, load):
+    options = {GeppettoXMIOptions.INTERN_STRINGS: True}
+    resource = load('MediumNet.net.nml.xmi', options)
+    for feature_name in ('id', 'name', 'unit'):
+        strings = strings_by_value(resource.contents[0], feature_name)
+        assert all(len(x) == 1 for x in strings.values())
+    assert canonicalize(resource).bytes == 0
+    reference = load('MediumNet.net.nml.xmi')
+    assert model_signature(resource.contents[0]) == \
+        model_signature(reference.contents[0])
+
+
+def test_canonicalize_lazy_types(load):
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = load('MediumNet.net.nml.xmi', options)
+    deferred = [x for x in resource._deferred]
+    assert deferred
+    canonicalize(resource)
+    assert all(resource.is_deferred(x) for x in deferred)
@@ -0,0 +1,167 @@
+import pytest
+from itertools import chain
+from pyecore.resources import URI
+import model as pygeppetto
+from model.clone import clone, Fork
+
+
+@pytest.fixture
+def resource(load):
+    resource = load()
+    root = resource.contents[0]
+    # the instance of the network, as Geppetto adds it
+    network = pygeppetto.Variable()
+    network.id = 'network'
+    network.types.append(root.libraries[0].types[-1])
+    root.variables.append(network)
+    return resource
+
+
+def all_objects(root):
+    return list(chain([root], root.eAllContents()))
+
+
+def check_references(root, shared=()):
+    """The references of the objects of root target objects of root (or
+    shared objects), and the opposites are consistent.
+    """
+    objects = set(all_objects(root))
+    for obj in objects:
+        for feature in obj.eClass.eAllStructuralFeatures():
+            if not feature.is_reference or feature.containment \
+                    or feature.derived:
+                continue
+            value = obj.eGet(feature)
+            for target in (value if feature.many else [value]):
+                if target is None:
+                    continue
+                assert target in objects or target.eRoot() in shared
+                opposite = feature.eOpposite
+                if opposite is not None and target in objects \
+                        and not opposite.containment:
+                    assert obj in target.eGet(opposite)
+
+
+def test_clone_model(resource, model_signature):
+    root = resource.contents[0]
+    before = model_signature(root)
+    copy = clone(root)
+    assert copy is not root and copy.eResource is None
+    assert not set(all_objects(root)) & set(all_objects(copy))
+    check_references(copy)
+    assert copy.variables[0].types[0] is copy.libraries[0].types[-1]
+    assert model_signature(root) == before
+    # the copy is the same model
+    other = resource.resource_set.create_resource(URI('copy.xmi'))
+    other.append(copy)
+    assert model_signature(copy) == before
+
+
+def test_clone_subtree(resource):
+    root = resource.contents[0]
+    network = root.libraries[0].types[-1]
+    mapping = {}
+    copy = clone(network, mapping)
+    assert mapping[network] is copy
+    assert len(mapping) == len(all_objects(network))
+    assert copy.eContainer() is None
+    population = network.variables[1]
+    population_copy = mapping[population]
+    assert population_copy.id == population.id
+    # the types that are not copied are shared, with the opposite updated
+    array_type = population.types[0]
+    assert population_copy.types[0] is array_type
+    assert population_copy in array_type.referencedVariables
+    root.libraries[0].types.append(copy)
+    check_references(root)
+
+
+def test_fork(resource, model_signature):
+    root = resource.contents[0]
+    before = model_signature(root)
+    library = root.libraries[0]
+    network = library.types[-1]
+    fork = Fork(root)
+    model = fork.model
+    fork_library = model.libraries[0]
+    assert len(fork_library.types) == 0
+    assert list(fork_library.sharedTypes) == list(library.types)
+    assert model.variables[0] is not root.variables[0]
+    assert model.variables[0].types[0] is network
+    assert fork.is_shared(network) and not fork.is_shared(model.variables[0])
+    check_references(model, shared={root})
+    assert model_signature(root) == before
+
+    cell = network.variables[1].types[0].arrayType
+    variable = cell.variables[0]
+    edited = fork.edit(variable)
+    assert edited is not variable and edited.id == variable.id
+    assert edited.eRoot() is model
+    assert fork.edit(variable) is edited and fork.edit(edited) is edited
+    # the types that refer to the cell are copied as well
+    assert [x.id for x in fork_library.types] == \
+        [cell.id, network.variables[1].types[0].id, network.id]
+    assert cell not in fork_library.sharedTypes
+    assert len(fork_library.sharedTypes) == len(library.types) - 3
+    network_copy = model.variables[0].types[0]
+    assert network_copy is fork_library.types[-1]
+    assert network_copy.variables[1].types[0].arrayType is \
+        fork_library.types[0]
+    check_references(model, shared={root})
+    edited.name = 'changed'
+    assert variable.name != 'changed'
+    assert model_signature(root) == before
+
+    assert fork.edit(root.variables[0]) is model.variables[0]
+    with pytest.raises(ValueError):
+        fork.edit(pygeppetto.Variable())
+    with pytest.raises(TypeError):
+        Fork(library)
+
+
+def test_fork_references(resource, model_signature):
+    root = resource.contents[0]
+    before = model_signature(root)
+    library = root.libraries[0]
+    network = library.types[-1]
+    cell = network.variables[1].types[0].arrayType
+    parameter = root.libraries[1].types[0]
+    referenced = list(cell.referencedVariables)
+    fork = Fork(root)
+    model = fork.model
+
+    # the references of the fork to the shared types are modified
+    variable = model.variables[-1]
+    variable.types.remove(network)
+    assert list(variable.types) == []
+    variable.types.append(cell)
+    assert list(cell.referencedVariables) == referenced
+    # in the objects added to the fork as well
+    added = pygeppetto.Variable()
+    added.id = 'added'
+    added.types.append(network)
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.key = parameter
+    added.initialValues.append(initial_value)
+    model.variables.append(added)
+    added.types.append(cell)
+    initial_value.key = cell
+    initial_value.key = parameter
+    assert (initial_value, pygeppetto.TypeToValueMap.key) not in \
+        parameter._inverse_rels
+    assert list(cell.referencedVariables) == referenced
+    assert added not in network.referencedVariables
+    assert model_signature(root) == before
+    check_references(model, shared={root})
+
+    # they move to the copy of the types edited in the fork
+    cell_copy = fork.edit(cell)
+    network_copy = fork.edit(network)
+    assert list(variable.types) == [cell_copy]
+    assert list(added.types) == [network_copy, cell_copy]
+    assert set(cell_copy.referencedVariables) >= {variable, added}
+    variable.types.remove(cell_copy)
+    assert variable not in cell_copy.referencedVariables
+    assert list(cell.referencedVariables) == referenced
+    assert model_signature(root) == before
+    check_references(model, shared={root})
@@ -0,0 +1,103 @@
+import numpy
+import pytest
+from model.coloring import GroupColoring, parse_color, DEFAULT_COLOR
+
+
+@pytest.fixture(scope='module')
+def morphology(load):
+    resource = load('BigCA1.net.nml.xmi')
+    return resource.contents[0].libraries[0].types[5]
+
+
+def rgb(color):
+    color = parse_color(color)
+    return [(color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF]
+
+
+def naive_colors(coloring, group, default=DEFAULT_COLOR):
+    """Colors of the segments, walking the group elements of each one."""
+    elements = list(group.visualGroupElements)
+    values = [x.parameter.value for x in elements if x.parameter is not None]
+    low, high = rgb(group.lowSpectrumColor or '0'), \
+        rgb(group.highSpectrumColor or '0')
+    colors = []
+    for segment, variable in zip(coloring.table.segments,
+                                 coloring.table.variables):
+        element = next((x for x in elements
+                        if x in segment.groupElements
+                        or x.id == variable.id), None)
+        if element is None:
+            colors.append(rgb(default))
+        elif element.parameter is not None and group.lowSpectrumColor:
+            ratio = (element.parameter.value - min(values)) \
+                / ((max(values) - min(values)) or 1)
+            colors.append([round(x + ratio * (y - x))
+                           for x, y in zip(low, high)])
+        elif element.defaultColor:
+            colors.append(rgb(element.defaultColor))
+        else:
+            colors.append(rgb(default))
+    return colors
+
+
+def test_parse_color():
+    assert parse_color('0XFF6600') == 0xFF6600
+    assert parse_color('#0066ff') == 0x0066FF
+    assert parse_color(0x123456) == 0x123456
+    assert parse_color('red') is None
+    assert parse_color(None) is None
+
+
+def test_group_colors(morphology):
+    coloring = GroupColoring(morphology)
+    for group in morphology.visualGroups[:5]:
+        colors = coloring.colors(group)
+        assert colors.shape == (len(coloring.table), 3)
+        assert colors.dtype == numpy.uint8
+        assert colors.tolist() == naive_colors(coloring, group)
+
+
+def test_live_colors(morphology):
+    coloring = GroupColoring(morphology)
+    group = morphology.visualGroups[2]
+    size = len(coloring.table)
+    values = numpy.linspace(-80, 20, size)
+    values[0] = numpy.nan
+    colors = coloring.colors(group, values=values, default=0)
+    assert colors[0].tolist() == [0, 0, 0]
+    # the segments outside of the group keep the default color
+    outside = coloring.members(group).segment_elements < 0
+    assert outside.any()
+    assert not colors[outside].any()
+    assert colors[1].tolist() == rgb(group.lowSpectrumColor)
+    assert colors[-1].tolist() == rgb(group.highSpectrumColor)
+    clipped = coloring.colors(group, values=values, limits=(-100, 0))
+    assert clipped[-1].tolist() == rgb(group.highSpectrumColor)
+    with pytest.raises(ValueError):
+        coloring.colors(group, values=values[1:])
+    colors = coloring.colors(group, values=values, default=None)
+    assert colors[0].tolist() == rgb(DEFAULT_COLOR)
+    assert coloring.colors(group, values=values, default='#ff0000')[0] \
+        .tolist() == [255, 0, 0]
+    with pytest.raises(ValueError):
+        coloring.colors(group, values=values, default='red')
+
+    buffer = numpy.frombuffer(coloring.buffer(group, values=values),
+                              dtype='<u4')
+    assert len(buffer) == size
+    assert buffer[-1] == parse_color(group.highSpectrumColor)
+
+
+def test_parameter_update(morphology):
+    coloring = GroupColoring(morphology)
+    group = morphology.visualGroups[1]
+    element = group.visualGroupElements[0]
+    previous = element.parameter.value
+    try:
+        element.parameter.value = 1e6
+        colors = coloring.colors(group)
+        row = coloring.table.variables.index(
+            next(x for x in coloring.table.variables if x.id == element.id))
+        assert colors[row].tolist() == rgb(group.highSpectrumColor)
+    finally:
+        element.parameter.value = previous
@@ -0,0 +1,137 @@
+import pytest
+from pyecore.ecore import EObject
+from pyecore.notification import EObserver, Kind
+from pyecore.resources import URI
+import model as pygeppetto
+from model.compact import CompactValue, compact, enable_compact, \
+                          disable_compact
+
+
+@pytest.fixture
+def compact_new():
+    enable_compact()
+    yield
+    disable_compact()
+
+
+class Recorder(EObserver):
+    def __init__(self, notifier):
+        super().__init__(notifier)
+        self.notifications = []
+
+    def notifyChanged(self, notification):
+        self.notifications.append(notification)
+
+
+def quantity_model():
+    root = pygeppetto.GeppettoModel()
+    variable = pygeppetto.Variable()
+    variable.id = 'v'
+    root.variables.append(variable)
+    for value in (1.5, -65.0):
+        quantity = pygeppetto.PhysicalQuantity()
+        quantity.value = value
+        quantity.unit = pygeppetto.Unit()
+        quantity.unit.unit = ''.join(['m', 'V'])
+        entry = pygeppetto.TypeToValueMap()
+        entry.value = quantity
+        variable.initialValues.append(entry)
+    return root
+
+
+def quantities(root):
+    return [x.value for x in root.variables[0].initialValues]
+
+
+@pytest.mark.parametrize('name', ['MediumNet.net.nml.xmi',
+                                  'BigCA1.net.nml.xmi'])
+def test_compact_model(tmpdir, name, model_signature, load):
+    reference = load(name)
+    resource = load(name)
+    compact(resource)
+    for resource, f in ((reference, 'reference.xmi'),
+                        (resource, 'compact.xmi')):
+        resource.save(output=URI(str(tmpdir.join(f))))
+    assert tmpdir.join('compact.xmi').read() == \
+        tmpdir.join('reference.xmi').read()
+    assert model_signature(resource.contents[0]) == \
+        model_signature(reference.contents[0])
+
+
+def test_compact_objects():
+    root = quantity_model()
+    quantity = quantities(root)[0]
+    compact(root)
+    attributes = vars(quantity)
+    assert isinstance(attributes['value'], CompactValue)
+    for name in ('_isset', 'listeners', '_inverse_rels', 'dyn_inst'):
+        assert name not in attributes
+    assert quantity not in EObject._instances
+    assert quantity.value == 1.5
+    assert quantity.eIsSet('value') and not quantity.eIsSet('scalingFactor')
+    assert quantity.eContainer() is root.variables[0].initialValues[0]
+    assert quantity.dyn_inst is quantity
+    units = [x.unit.unit for x in quantities(root)]
+    assert units == ['mV', 'mV'] and units[0] is units[1]
+
+
+def test_compact_modification():
+    root = quantity_model()
+    quantity = quantities(root)[0]
+    compact(root)
+    assert quantity.scalingFactor == 0  # read before it is set
+    recorder = Recorder(quantity)
+    quantity.value = 2.5
+    quantity.scalingFactor = 3
+    assert quantity.value == 2.5
+    assert [x.feature.name for x in recorder.notifications] == \
+        ['value', 'scalingFactor']
+    assert recorder.notifications[0].old == 1.5
+    assert list(quantity._isset) == [pygeppetto.PhysicalQuantity.value,
+                                     pygeppetto.PhysicalQuantity.unit,
+                                     pygeppetto.PhysicalQuantity.scalingFactor]
+    unit = quantity.unit
+    quantity.unit = None
+    assert unit.eContainer() is None
+    assert quantity.eIsSet('unit')
+
+
+def test_compact_move():
+    root = quantity_model()
+    first, second = root.variables[0].initialValues
+    quantity = first.value
+    compact(root)
+    second.value = quantity
+    assert first.value is None and quantity.eContainer() is second
+    assert quantity._inverse_rels == {
+        (second, pygeppetto.TypeToValueMap.value)}
+    second.value = None
+    assert quantity.eContainer() is None and not quantity._inverse_rels
+
+
+def test_compact_listeners():
+    root = quantity_model()
+    quantity = quantities(root)[0]
+    recorder = Recorder(quantity)
+    compact(root)
+    assert not isinstance(vars(quantity)['value'], CompactValue)
+    quantity.value = 0.0
+    assert recorder.notifications[0].kind is Kind.SET
+
+
+def test_enable_compact(compact_new, tmpdir, model_signature, rset, load):
+    root = quantity_model()
+    quantity = quantities(root)[0]
+    for name in ('listeners', '_inverse_rels', '_eresource', 'dyn_inst'):
+        assert name not in vars(quantity)
+    assert quantity.unit._inverse_rels == {
+        (quantity, pygeppetto.PhysicalQuantity.unit)}
+    assert not pygeppetto.PhysicalQuantity.value.many
+    resource = rset.create_resource(URI(str(tmpdir.join('model.xmi'))))
+    resource.append(root)
+    assert quantity.eResource is resource
+    resource.save()
+    loaded = load(tmpdir.join('model.xmi'))
+    assert model_signature(loaded.contents[0]) == model_signature(root)
+    disable_compact()
+    assert 'listeners' in vars(pygeppetto.PhysicalQuantity())
@@ -0,0 +1,244 @@
+import random
+import numpy
+import pytest
+from collections import Counter
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.connectivity import ConnectivityGraph, MIN_PENDING
+from model.values import Connectivity
+
+
+def new_pointer(population, index):
+    pointer = pygeppetto.Pointer()
+    element = pygeppetto.PointerElement()
+    element.variable = population
+    element.index = index
+    pointer.elements.append(element)
+    return pointer
+
+
+def new_connection(pre, pre_index, post, post_index,
+                   connectivity=Connectivity.DIRECTIONAL):
+    connection = pygeppetto.Connection()
+    connection.connectivity = connectivity
+    connection.a = new_pointer(pre, pre_index)
+    connection.b = new_pointer(post, post_index)
+    return connection
+
+
+def add_connection(projection, connection):
+    variable = pygeppetto.Variable()
+    variable.id = 'connection{}'.format(len(projection.variables))
+    entry = pygeppetto.TypeToValueMap()
+    entry.value = connection
+    variable.initialValues.append(entry)
+    projection.variables.append(variable)
+    return variable
+
+
+def network(connections=300, seed=0):
+    rng = random.Random(seed)
+    root = pygeppetto.GeppettoModel()
+    library = pygeppetto.GeppettoLibrary()
+    library.id = 'network'
+    root.libraries.append(library)
+    populations = []
+    for i in range(3):
+        population = pygeppetto.Variable()
+        population.id = 'population{}'.format(i)
+        root.variables.append(population)
+        populations.append(population)
+    projection = pygeppetto.CompositeType()
+    projection.id = 'projection'
+    library.types.append(projection)
+    for _ in range(connections):
+        pre, post = rng.sample(populations, 2)
+        connectivity = rng.choice([Connectivity.DIRECTIONAL,
+                                   Connectivity.BIDIRECTIONAL])
+        add_connection(projection, new_connection(
+            pre, rng.randrange(20), post, rng.randrange(20), connectivity))
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.create_resource(URI('network.xmi'))
+    resource.append(root)
+    return resource, projection, populations
+
+
+def expected_arcs(resource):
+    arcs = Counter()
+    for connection in resource.contents[0].eAllContents():
+        if isinstance(connection, pygeppetto.Connection):
+            a = connection.a.getInstancePath()
+            b = connection.b.getInstancePath()
+            arcs[a, b, connection] += 1
+            if connection.connectivity is not Connectivity.DIRECTIONAL:
+                arcs[b, a, connection] += 1
+    return arcs
+
+
+def other_end(connection, path):
+    a, b = connection.a.getInstancePath(), connection.b.getInstancePath()
+    return b if a == path else a
+
+
+def graph_arcs(graph, direction='out'):
+    arcs = Counter()
+    for node in graph.nodes:
+        path = graph.path(node)
+        if direction == 'out':
+            for connection in graph.fan_out(node):
+                arcs[path, other_end(connection, path), connection] += 1
+        else:
+            for connection in graph.fan_in(node):
+                arcs[other_end(connection, path), path, connection] += 1
+    return arcs
+
+
+def check(graph, resource):
+    expected = expected_arcs(resource)
+    assert graph_arcs(graph) == expected
+    assert graph_arcs(graph, 'in') == expected
+    indptr, indices, numbers = graph.csr()
+    compiled = Counter()
+    for node in graph.nodes:
+        for i in range(indptr[node], indptr[node + 1]):
+            compiled[graph.path(node), graph.path(indices[i]),
+                     graph.connection(numbers[i])] += 1
+    assert compiled == expected
+    fan_in = Counter(x[1] for x in expected.elements())
+    degrees = graph.degrees('in')
+    assert {graph.path(i): x for i, x in enumerate(degrees) if x} == fan_in
+
+
+def test_graph():
+    resource, _, populations = network()
+    graph = ConnectivityGraph.of(resource)
+    assert ConnectivityGraph.of(resource) is graph
+    check(graph, resource)
+    connection = graph.connections[0]
+    node = graph.node(connection.a)
+    assert graph.node(connection.a.getInstancePath()) == node
+    assert graph.node(node) == node
+    assert graph.node('unknown[0]') is None
+    assert connection in graph.fan_out(connection.a)
+    assert graph.node(connection.b) in graph.successors(connection.a)
+    assert node in graph.predecessors(connection.b)
+    degrees = graph.degrees('both')
+    assert degrees.sum() == 2 * sum(expected_arcs(resource).values())
+    histogram = graph.degree_histogram('out')
+    assert histogram.sum() == len(graph)
+    assert (histogram * numpy.arange(len(histogram))).sum() == \
+        graph.degrees('out').sum()
+    with pytest.raises(ValueError):
+        graph.degrees('sideways')
+    with pytest.raises(KeyError):
+        graph.fan_out('unknown[0]')
+
+
+def test_neighbourhood():
+    resource, projection, (a, b, c) = network(connections=0)
+    for i in range(5):
+        add_connection(projection, new_connection(a, i, a, i + 1))
+    add_connection(projection, new_connection(
+        b, 0, a, 2, Connectivity.BIDIRECTIONAL))
+    graph = ConnectivityGraph.of(resource)
+    paths = lambda nodes: sorted(graph.path(x) for x in nodes)
+    assert paths(graph.neighbourhood('population0[0]', hops=2)) == \
+        ['population0[1]', 'population0[2]']
+    assert paths(graph.neighbourhood('population0[0]', hops=3)) == \
+        ['population0[1]', 'population0[2]', 'population0[3]',
+         'population1[0]']
+    assert paths(graph.neighbourhood('population0[3]', 2, 'in')) == \
+        ['population0[1]', 'population0[2]', 'population1[0]']
+    assert paths(graph.neighbourhood('population0[2]', 1, 'both')) == \
+        ['population0[1]', 'population0[3]', 'population1[0]']
+    assert len(graph.neighbourhood('population0[5]')) == 0
+
+
+def test_incremental_update():
+    resource, projection, (a, b, c) = network()
+    graph = ConnectivityGraph.of(resource)
+    graph.csr()
+    # added after the compilation
+    added = new_connection(c, 100, a, 0)
+    add_connection(projection, added)
+    assert graph.fan_out('population2[100]') == [added]
+    assert added in graph.fan_in('population0[0]')
+    check(graph, resource)
+    # removed
+    removed = projection.variables[0].initialValues[0].value
+    projection.variables.remove(projection.variables[0])
+    assert removed not in graph.connections
+    check(graph, resource)
+    # modified
+    modified = projection.variables[3].initialValues[0].value
+    modified.b.elements[0].index = 200
+    modified.connectivity = Connectivity.NON_DIRECTIONAL
+    assert graph.fan_out('population{}[200]'.format(
+        [a, b, c].index(modified.b.elements[0].variable))) == [modified]
+    modified.a = new_pointer(c, 300)
+    assert graph.fan_out('population2[300]') == [modified]
+    check(graph, resource)
+    # many modifications, compiled again
+    for i in range(MIN_PENDING + 1):
+        add_connection(projection, new_connection(a, 0, b, i))
+    assert len(graph.fan_out('population0[0]')) > MIN_PENDING
+    assert graph._csr is not None and not graph._pending_out
+    # a variable renamed
+    a.id = 'renamed'
+    assert graph.node('renamed[0]') is not None
+    assert graph.node('population0[0]') is None
+    check(graph, resource)
+    # the graph built from scratch is the same
+    assert graph_arcs(ConnectivityGraph(resource)) == graph_arcs(graph)
+
+
+def test_pending_update():
+    resource, projection, (a, b, c) = network(50)
+    graph = ConnectivityGraph.of(resource)
+    graph.fan_out('population0[1]')
+    # added after the compilation, then removed before the next one
+    variable = add_connection(projection, new_connection(a, 1, b, 100))
+    projection.variables.remove(variable)
+    assert None not in graph.fan_out('population0[1]')
+    assert graph.node('population1[100]') not in \
+        graph.successors('population0[1]')
+    # added after the compilation, then modified
+    added = new_connection(a, 1, c, 100)
+    add_connection(projection, added)
+    added.connectivity = Connectivity.BIDIRECTIONAL
+    assert graph.fan_out('population2[100]') == [added]
+    assert graph.fan_out('population0[1]').count(added) == 1
+    assert None not in graph.fan_in('population0[1]')
+    assert graph_arcs(graph) == expected_arcs(resource)
+    assert graph_arcs(graph, 'in') == expected_arcs(resource)
+    assert graph._csr is not None and graph._pending_out
+
+
+def test_removed_nodes():
+    resource, projection, (a, b, c) = network(connections=0)
+    add_connection(projection, new_connection(a, 0, b, 0))
+    graph = ConnectivityGraph.of(resource)
+    assert len(graph) == 2
+    # extended with a tuple
+    variables = [pygeppetto.Variable() for _ in range(2)]
+    for i, variable in enumerate(variables):
+        entry = pygeppetto.TypeToValueMap()
+        entry.value = new_connection(a, 0, c, i)
+        variable.initialValues.append(entry)
+    projection.variables.extend(tuple(variables))
+    assert len(graph) == 4 and len(graph.fan_out('population0[0]')) == 3
+    check(graph, resource)
+    # the nodes left without connections are removed
+    node = graph.node('population2[1]')
+    projection.variables.remove(variables[1])
+    assert len(graph) == 3 and graph.node('population2[1]') is None
+    assert graph.node(node) is None and graph.path(node) is None
+    assert graph.degree_histogram('in').tolist() == [1, 2]
+    check(graph, resource)
+    variables[0].initialValues[0].value.b = new_pointer(b, 0)
+    assert graph.node('population2[0]') is None
+    assert len(graph) == 2
+    assert graph.degrees('in')[graph.node('population1[0]')] == 2
+    assert graph.degree_histogram('out').tolist() == [1, 0, 1]
+    check(graph, resource)
+    assert graph_arcs(ConnectivityGraph(resource)) == graph_arcs(graph)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.datasources import SimpleQuery
+from model.fetch import Fetcher, FetchError, ConnectionPool, ResultCache
+from model.json import dumps
+
+
+def data_model(url):
+    root = pygeppetto.GeppettoModel()
+    dependencies = pygeppetto.GeppettoLibrary()
+    dependencies.id = 'common'
+    cell = pygeppetto.CompositeType()
+    cell.id = 'cell'
+    dependencies.types.append(cell)
+    target = pygeppetto.GeppettoLibrary()
+    target.id = 'fetched'
+    root.libraries.extend([dependencies, target])
+    source = pygeppetto.DataSource()
+    source.id = 'neurons'
+    source.url = url
+    source.dependenciesLibrary.append(dependencies)
+    source.targetLibrary = target
+    query = SimpleQuery()
+    query.id = 'fetchNeuron'
+    query.query = 'MATCH (n {id: $ID}) RETURN n'
+    source.fetchVariableQuery = query
+    root.dataSources.append(source)
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.create_resource(URI('model.xmi'))
+    resource.append(root)
+    return root
+
+
+class StandIn(object):
+    """Local HTTP server answering the fetch requests.
+
+    An id starting with ``variable`` gives a variable of the cell type, an
+    id starting with ``tag`` a tag, another one a composite type with a cell
+    variable; the ``missing`` ids are not found and the ``fail`` query is an
+    error.
+    """
+    def __init__(self):
+        self.requests = []
+        self.paths = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with standin.lock:
+                    standin.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(
+                    int(self.headers['Content-Length'])))
+                with standin.lock:
+                    standin.requests.append(body)
+                    standin.paths.append(self.path)
+                    payload = standin.answer(body)
+                status = 500 if payload is None else 200
+                payload = payload or b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/query?key=k1'.format(
+            self.server.server_address[1])
+        self.model = data_model(self.url)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    def answer(self, body):
+        if body['query'] == 'fail':
+            return None
+        cell = self.model.libraries[0].types[0]
+        objects = []
+        for identifier in body['ids']:
+            if identifier.startswith('missing'):
+                continue
+            if identifier.startswith('tag'):
+                tag = pygeppetto.Tag()
+                tag.name = identifier
+                objects.append(tag)
+                continue
+            variable = pygeppetto.Variable()
+            variable.id = identifier
+            variable.name = body['parameters'].get('name', '')
+            variable.types.append(cell)
+            if not identifier.startswith('variable'):
+                composite = pygeppetto.CompositeType()
+                composite.id = identifier
+                variable.id = 'soma'
+                composite.variables.append(variable)
+                variable = composite
+            objects.append(variable)
+        self.model.libraries[1].types.extend(
+            x for x in objects if isinstance(x, pygeppetto.CompositeType))
+        self.model.variables.extend(
+            x for x in objects if isinstance(x, pygeppetto.Variable))
+        self.model.tags.extend(
+            x for x in objects if isinstance(x, pygeppetto.Tag))
+        try:
+            return dumps(*objects).encode('utf-8')
+        finally:
+            for obj in objects:
+                obj.delete()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def standin():
+    with StandIn() as standin:
+        yield standin
+
+
+def test_fetch(standin):
+    root = data_model(standin.url)
+    source = root.dataSources[0]
+    cell = root.libraries[0].types[0]
+
+    async def fetch():
+        async with Fetcher() as fetcher:
+            first = await fetcher.fetch(source, 'neuron0')
+            again = await fetcher.fetch(source, 'neuron0')
+            variable = await fetcher.fetch(source, 'variable0',
+                                           {'name': 'v'})
+            return first, again, variable
+
+    neuron, again, variable = asyncio.run(fetch())
+    assert again is neuron and len(standin.requests) == 2
+    assert standin.requests[0] == {'query': 'MATCH (n {id: $ID}) RETURN n',
+                                   'ids': ['neuron0'], 'parameters': {}}
+    assert standin.requests[1]['parameters'] == {'name': 'v'}
+    assert standin.paths == ['/query?key=k1'] * 2
+    assert list(root.libraries[1].types) == [neuron]
+    assert neuron.variables[0].id == 'soma'
+    assert neuron.variables[0].types[0].id == 'cell'
+    assert neuron.variables[0].types[0].eResource is cell.eResource
+    assert list(root.variables) == [variable]
+    assert variable.name == 'v'
+
+
+def test_batching_and_pool(standin):
+    root = data_model(standin.url)
+    source = root.dataSources[0]
+    ids = ['neuron{}'.format(i) for i in range(50)]
+
+    async def fetch():
+        async with Fetcher(pool_size=2, batch_size=10) as fetcher:
+            types = await fetcher.fetch_many(source, ids + ids[:5])
+            return types, fetcher.requests, fetcher.pool(source.url).opened
+
+    types, requests, opened = asyncio.run(fetch())
+    assert [x.id for x in types] == ids + ids[:5]
+    assert requests == len(standin.requests) == 5
+    assert sorted(sum((x['ids'] for x in standin.requests), [])) == \
+        sorted(ids)
+    assert opened <= 2 and standin.connections == opened
+    assert sorted(x.id for x in root.libraries[1].types) == sorted(ids)
+
+    async def refetch():
+        # an expired entry is fetched again and replaces the old type
+        async with Fetcher(ttl=0) as fetcher:
+            return await fetcher.fetch_many(source, ids[:3])
+
+    position = [x.id for x in root.libraries[1].types].index(ids[1])
+    old = root.libraries[1].types[position]
+    # the references to the old type move to the new one
+    variable = pygeppetto.Variable()
+    variable.id = 'instance'
+    variable.types.append(old)
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.key = old
+    variable.initialValues.append(initial_value)
+    root.variables.append(variable)
+    refetched = asyncio.run(refetch())
+    assert root.libraries[1].types[position] is refetched[1] is not old
+    assert len(root.libraries[1].types) == len(ids)
+    assert list(variable.types) == [refetched[1]]
+    assert list(refetched[1].referencedVariables) == [variable]
+    assert not old.referencedVariables
+    assert initial_value.key is refetched[1]
+
+
+def test_errors(standin):
+    root = data_model(standin.url)
+    source = root.dataSources[0]
+
+    async def fetch(*ids):
+        async with Fetcher() as fetcher:
+            return await asyncio.gather(
+                *(fetcher.fetch(source, x) for x in ids),
+                return_exceptions=True)
+
+    found, missing = asyncio.run(fetch('neuron0', 'missing0'))
+    assert found.id == 'neuron0'
+    assert isinstance(missing, FetchError)
+    # nothing is added when a fetched object cannot be added
+    types = list(root.libraries[1].types)
+    found, tag = asyncio.run(fetch('neuron3', 'tag0'))
+    assert isinstance(found, FetchError) and isinstance(tag, FetchError)
+    assert list(root.libraries[1].types) == types
+    source.fetchVariableQuery.query = 'fail'
+    assert all(isinstance(x, FetchError)
+               for x in asyncio.run(fetch('neuron1', 'neuron2')))
+    source.fetchVariableQuery = None
+    with pytest.raises(FetchError):
+        asyncio.run(Fetcher().fetch(source, 'neuron0'))
+
+
+def test_connection_reuse():
+    # the server answers the first request of a connection and closes it on
+    # the next one, once processed, without answering; it closes it after
+    # answering the /close requests
+    requests = []
+
+    async def serve(reader, writer):
+        first = True
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = int(head.split(b'Content-Length: ')[1]
+                             .split(b'\r')[0])
+                await reader.readexactly(length)
+                method, path = head.split()[:2]
+                requests.append(method.decode())
+                if not first and path != b'/close':
+                    break
+                first = False
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                             b'\r\nok')
+                await writer.drain()
+                if path == b'/close':
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        pool = ConnectionPool('http://127.0.0.1:{}/'.format(
+            server.sockets[0].getsockname()[1]), size=1)
+        results = []
+        async with server:
+            for method, path in [('POST', '/'), ('POST', '/'),
+                                 ('GET', '/'), ('GET', '/'),
+                                 ('POST', '/close'), ('POST', '/')]:
+                try:
+                    results.append((await pool.request(method, path))[2])
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    results.append(None)
+                await asyncio.sleep(0.05)
+            pool.close()
+        return results, pool.opened
+
+    results, opened = asyncio.run(run())
+    # the POST processed by the server is not sent again, the GET is, and
+    # the idle connection closed by the server is not used
+    assert results == [b'ok', None, b'ok', b'ok', b'ok', b'ok']
+    assert requests == ['POST', 'POST', 'GET', 'GET', 'GET', 'POST', 'POST']
+    assert opened == 4
+
+
+def test_result_cache():
+    now = [0.0]
+    cache = ResultCache(size=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)  # b is the least recently used
+    assert cache.get('b') is None and len(cache) == 2
+    now[0] = 10
+    assert cache.get('a') is None and cache.get('c') is None
+    assert len(cache) == 0
@@ -0,0 +1,78 @@
+import pytest
+from itertools import chain
+import model as pygeppetto
+from model.hierarchy import ancestors
+
+
+def naive_extends(type_, other):
+    return any(x is other or naive_extends(x, other) for x in type_.superType)
+
+
+def new_type(identifier, *super_types, cls=pygeppetto.CompositeType):
+    type_ = cls()
+    type_.id = identifier
+    type_.superType.extend(super_types)
+    return type_
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_extends_type(filename, load):
+    root = load(filename).contents[0]
+    types = [x for x in chain([root], root.eAllContents())
+             if isinstance(x, pygeppetto.Type)]
+    assert any(x.superType for x in types)
+    for type_ in types:
+        for other in types:
+            if other.superType or other in type_.superType:
+                assert type_.extendsType(other) == naive_extends(type_, other)
+        assert not type_.extendsType(type_)
+
+
+def test_extends_type_update():
+    base = new_type('base')
+    middle = new_type('middle', base)
+    other = new_type('other')
+    leaf = new_type('leaf', middle)
+    assert leaf.extendsType(base)
+    assert not leaf.extendsType(other)
+    assert ancestors(leaf) == [middle, base]
+
+    middle.superType.append(other)
+    assert leaf.extendsType(other)
+    middle.superType.remove(base)
+    assert not leaf.extendsType(base)
+    assert ancestors(leaf) == [middle, other]
+
+    # the caches of the types that do not extend a modified type are kept
+    unrelated = new_type('unrelated', base)
+    assert unrelated.extendsType(base)
+    cache = unrelated._type_cache
+    middle.superType.append(base)
+    assert unrelated._type_cache is cache
+
+    # cycles do not loop
+    base.superType.append(leaf)
+    assert leaf.extendsType(leaf)
+    assert base.extendsType(middle)
+
+
+def test_default_value():
+    base = new_type('base')
+    composite = pygeppetto.Composite()
+    base.defaultValue = composite
+    middle = new_type('middle', base)
+    leaf = new_type('leaf', middle)
+    imported = new_type('imported', middle, cls=pygeppetto.types.ImportType)
+    assert leaf.getDefaultValue() is composite
+    assert imported.getDefaultValue() is composite
+    assert new_type('alone').getDefaultValue() is None
+
+    own = pygeppetto.Composite()
+    middle.defaultValue = own
+    assert leaf.getDefaultValue() is own
+    assert base.getDefaultValue() is composite
+    middle.defaultValue = None
+    assert leaf.getDefaultValue() is composite
+    base.defaultValue = None
+    assert leaf.getDefaultValue() is None
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import pytest
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+
+
+def run_lazy(code):
+    environment = dict(os.environ, PYGEPPETTO_LAZY_IMPORT='1')
+    subprocess.check_call([sys.executable, '-c', code], env=environment)
+
+
+def test_register():
+    rset = ResourceSet()
+    assert pygeppetto.register(rset) is rset
+    assert rset.metamodel_registry[pygeppetto.nsURI] is pygeppetto
+    for subpack in pygeppetto.eSubpackages:
+        assert rset.metamodel_registry[subpack.nsURI] is subpack
+    resource = rset.get_resource(URI('tests/xmi-data/MediumNet.net.nml.xmi'))
+    assert isinstance(resource.contents[0], pygeppetto.GeppettoModel)
+
+
+def test_lazy_import():
+    run_lazy('''
+import sys
+import model
+assert not [x for x in sys.modules if x.startswith('model.')]
+assert model.LAZY_IMPORT
+root = model.GeppettoModel()
+assert model.Variable.types.eOpposite is model.Type.referencedVariables
+assert model.PointerElement.variable.eType is model.Variable
+assert len(model.eSubpackages) == 4
+assert model.model is sys.modules['model.model']
+assert model.model.GeppettoModel is model.GeppettoModel
+''')
+
+
+@pytest.mark.parametrize('statement', [
+    'from model.values import PointerElement',
+    'from model.types import Type',
+    'from model.json import dumps',
+    'from model import *'])
+def test_lazy_import_wiring(statement):
+    run_lazy('''
+import sys
+{}
+# without any access to the attributes of the package
+values = sys.modules['model.values']
+variables = sys.modules['model.variables']
+types = sys.modules['model.types']
+assert values.PointerElement.variable.eType is variables.Variable
+assert variables.Variable.types.eOpposite is types.Type.referencedVariables
+assert sys.modules['model.model'].eClass.eSubpackages
+'''.format(statement))
@@ -0,0 +1,100 @@
+import pytest
+from itertools import chain
+import model as pygeppetto
+from model.index import ModelIndex
+from model.xmi import GeppettoXMIOptions
+
+
+def check_index(resource):
+    index = ModelIndex.of(resource)
+    root = resource.contents[0]
+    for obj in chain([root], root.eAllContents()):
+        fragment = obj.eURIFragment()
+        assert index.get(fragment) is obj
+        assert index.fragment(obj) == fragment
+        if isinstance(obj, pygeppetto.Node) and obj.id is not None:
+            assert obj in index.nodes(obj.id)
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_index_lookup(filename, load):
+    resource = load(filename)
+    index = ModelIndex.of(resource)
+    assert ModelIndex.of(resource) is index
+    check_index(resource)
+    assert index.get('//@libraries.0/@types.1000') is None
+    assert index.nodes('unknown id') == []
+
+
+def test_index_node_ids(load):
+    resource = load()
+    index = ModelIndex.of(resource)
+    nodes = index.nodes('conductance')
+    assert len(nodes) > 1
+    assert all(x.id == 'conductance' for x in nodes)
+
+    node = nodes[0]
+    node.id = 'newId'
+    assert index.nodes('newId') == [node]
+    assert node not in index.nodes('conductance')
+
+
+def test_index_add_remove(load):
+    resource = load()
+    index = ModelIndex.of(resource)
+    root = resource.contents[0]
+    library = root.libraries[0]
+    check_index(resource)
+
+    # appended objects are indexed
+    new_type = pygeppetto.CompositeType()
+    new_type.id = 'newType'
+    variable = pygeppetto.Variable()
+    variable.id = 'newVariable'
+    new_type.variables.append(variable)
+    library.types.append(new_type)
+    fragment = new_type.eURIFragment()
+    assert index.get(fragment) is new_type
+    assert index.get(fragment + '/@variables.0') is new_type.variables[0]
+    assert index.nodes('newType') == [new_type]
+    assert index.nodes('newVariable') == [new_type.variables[0]]
+
+    # removed objects are not
+    removed = library.types[-2]
+    removed_fragment = removed.eURIFragment()
+    library.types.remove(removed)
+    assert removed not in index.nodes(removed.id)
+    assert index.get(removed_fragment) is new_type
+    check_index(resource)
+
+    # moved objects neither
+    fragment = new_type.eURIFragment()
+    other = root.libraries[1]
+    other.types.append(new_type)
+    assert index.get(fragment) is None
+    check_index(resource)
+    assert index.nodes('newType') == [new_type]
+
+    # and roots can change
+    resource.remove(root)
+    assert index.get('/') is None
+    resource.append(root)
+    check_index(resource)
+
+
+def test_index_lazy_types(load):
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = load('BigCA1.net.nml.xmi', options)
+    index = ModelIndex.of(resource)
+    morphology = resource.contents[0].libraries[0].types[5]
+    assert index.get('//@libraries.0/@types.5') is morphology
+    assert index.nodes(morphology.id) == [morphology]
+    assert resource.is_deferred(morphology)
+
+    variable = index.get('//@libraries.0/@types.5/@variables.0')
+    assert not resource.is_deferred(morphology)
+    assert variable is morphology.variables[0]
+    assert variable in index.nodes(variable.id)
+    resource.materialize()
+    check_index(resource)
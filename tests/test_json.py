@@ -0,0 +1,91 @@
+import json
+import math
+import pytest
+from pyecore.resources import URI
+import model as pygeppetto
+from model.json import GeppettoJSONResource, dumps, loads
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_json_roundtrip(tmpdir, rset, filename, model_signature):
+    xmi_resource = rset.get_resource(URI('tests/xmi-data/' + filename))
+    f = tmpdir.join('model.json')
+    GeppettoJSONResource.save(xmi_resource, output=URI(str(f)))
+    document = json.loads(f.read())
+    assert document['version'] == 1
+
+    resource = rset.get_resource(URI(str(f)))
+    assert isinstance(resource, GeppettoJSONResource)
+    root = resource.contents[0]
+    assert root.eResource is resource
+    # the features are set in the EMF order by the reader
+    assert model_signature(root, isset_order=False) == \
+        model_signature(xmi_resource.contents[0], isset_order=False)
+
+    output = tmpdir.join('copy.json')
+    resource.save(output=URI(str(output)))
+    assert output.read() == f.read()
+
+
+def test_save_output(tmpdir, rset):
+    xmi_resource = rset.get_resource(
+        URI('tests/xmi-data/MediumNet.net.nml.xmi'))
+    f = tmpdir.join('model.json')
+    GeppettoJSONResource.save(xmi_resource, output=URI(str(f)))
+    resource = rset.get_resource(URI(str(f)))
+    output = URI(str(tmpdir.join('copy.json')))
+    resource.save(output=output)
+    # the stream of the output is closed, the file is complete
+    assert output._URI__stream.closed
+    copy = rset.get_resource(output)
+    assert copy is not resource
+    assert [x.id for x in copy.contents[0].variables] == \
+        [x.id for x in resource.contents[0].variables]
+    assert tmpdir.join('copy.json').read() == f.read()
+
+
+def test_dumps_subtree(rset):
+    resource = rset.get_resource(URI('tests/xmi-data/BigCA1.net.nml.xmi'))
+    morphology = next(x for x in resource.contents[0].libraries[0].types
+                      if isinstance(x, pygeppetto.CompositeVisualType))
+    cylinders = [x.initialValues[0].value for x in morphology.variables]
+    document = json.loads(dumps(morphology))
+
+    classes = [name for _, name in document['classes']]
+    assert classes[0] == 'CompositeVisualType'
+    block = document['cylinders']
+    assert block['shape'] == [len(cylinders), 8]
+    data = document['contents'][0]
+    value = data['variables'][0]['initialValues'][0]['value']
+    assert classes[value['eClass']] == 'Cylinder'
+    assert 'position' not in value and 'distal' not in value
+    # the group elements are part of the document, the types are not
+    assert all(isinstance(x, int) for x in value['groupElements'])
+    assert all(isinstance(x, str) for x in data['variables'][0]['types'])
+
+    copy, = loads(dumps(morphology), resource)
+    copied = [x.initialValues[0].value for x in copy.variables]
+    for cylinder, other in zip(cylinders, copied):
+        assert other.distal.x == cylinder.distal.x
+        assert other.position.z == cylinder.position.z
+        assert other.topRadius == cylinder.topRadius
+        assert [x.id for x in other.groupElements] == \
+            [x.id for x in cylinder.groupElements]
+        assert other.groupElements[0].eContainer().eContainer() is copy
+    assert copy.variables[0].types[0] == morphology.variables[0].types[0]
+
+
+def test_typed_blocks():
+    series = pygeppetto.TimeSeries()
+    series.value.extend([0.5, -1.0, math.inf, 3.0])
+    quantity = pygeppetto.PhysicalQuantity()
+    quantity.value = math.nan
+    data = dumps(series, quantity)
+    document = json.loads(data)
+    block = document['contents'][0]['value']
+    assert block['dtype'] == 'float64'
+    assert document['contents'][1]['value'] == 'NaN'
+    copy, other = loads(data)
+    assert list(copy.value) == [0.5, -1.0, math.inf, 3.0]
+    assert math.isnan(other.value)
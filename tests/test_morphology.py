@@ -0,0 +1,71 @@
+import numpy
+import pytest
+import model as pygeppetto
+from model.morphology import MorphologyTable
+
+
+def morphologies(resource):
+    root = resource.contents[0]
+    return [x for x in root.eAllContents()
+            if isinstance(x, pygeppetto.CompositeVisualType)]
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_morphology_table(filename, load):
+    for visual_type in morphologies(load(filename)):
+        table = MorphologyTable(visual_type)
+        length = 0
+        for row, cylinder in enumerate(table.segments):
+            proximal, distal = cylinder.position, cylinder.distal
+            assert tuple(table.proximal[row]) == (proximal.x, proximal.y,
+                                                  proximal.z)
+            assert tuple(table.distal[row]) == (distal.x, distal.y, distal.z)
+            assert table.bottom_radius[row] == cylinder.bottomRadius
+            assert table.top_radius[row] == cylinder.topRadius
+            length += ((distal.x - proximal.x) ** 2
+                       + (distal.y - proximal.y) ** 2
+                       + (distal.z - proximal.z) ** 2) ** 0.5
+            if row < 5:
+                for element in table.group_elements:
+                    assert table.group_mask(element)[row] == \
+                        (element in cylinder.groupElements
+                         or element.id == table.variables[row].id)
+        assert table.total_length() == pytest.approx(length)
+        lower, upper = table.bounding_box()
+        assert (lower <= table.proximal).all()
+        assert (upper >= table.distal).all()
+
+
+def test_morphology_groups(load):
+    visual_type = morphologies(load('BigCA1.net.nml.xmi'))[0]
+    table = MorphologyTable(visual_type)
+    dendrites = table.group_mask('dendrite_group')
+    assert 0 < dendrites.sum() < len(table)
+    expected = [any(x.id == 'dendrite_group' for x in segment.groupElements)
+                for segment in table.segments]
+    assert dendrites.tolist() == expected
+    assert table.total_length(dendrites) < table.total_length()
+    assert not table.group_mask('unknown').any()
+
+
+def test_morphology_write_back(load):
+    visual_type = morphologies(load('MediumNet.net.nml.xmi'))[0]
+    table = MorphologyTable(visual_type)
+    assert table.write_back() == 0
+    segment = table.segments[0]
+    x = segment.position.x
+    table.proximal[0] += (1.5, 0, 0)
+    table.top_radius[1:] *= 2
+    assert table.write_back() == len(table)
+    assert segment.position.x == x + 1.5
+    assert segment.topRadius == table.top_radius[0]
+    assert table.segments[1].topRadius == table.top_radius[1]
+    assert table.write_back() == 0
+
+    table = MorphologyTable(visual_type)
+    assert table.proximal[0][0] == x + 1.5
+    volume = table.volumes()[0]
+    r1, r2 = table.bottom_radius[0], table.top_radius[0]
+    assert volume == pytest.approx(numpy.pi * table.lengths()[0]
+                                   * (r1 * r1 + r1 * r2 + r2 * r2) / 3)
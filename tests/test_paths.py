@@ -0,0 +1,128 @@
+import pytest
+from itertools import chain
+import model as pygeppetto
+from model.paths import PathIndex
+
+
+def expected_path(node):
+    ids = []
+    while isinstance(node, pygeppetto.Node):
+        ids.append(node.id or '')
+        node = node.eContainer()
+    return '.'.join(reversed(ids))
+
+
+def all_nodes(resource):
+    root = resource.contents[0]
+    return [x for x in chain([root], root.eAllContents())
+            if isinstance(x, pygeppetto.Node)]
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_node_paths(filename, load):
+    resource = load(filename)
+    index = PathIndex.of(resource)
+    assert PathIndex.of(resource) is index
+    for node in all_nodes(resource):
+        path = node.getPath()
+        assert path == expected_path(node)
+        assert node.getPath() == path
+        assert index.node(path).getPath() == path
+    assert index.node('unknown.path') is None
+
+
+def test_node_paths_invalidation(load):
+    resource = load()
+    root = resource.contents[0]
+    library = root.libraries[0]
+    composite = next(x for x in library.types if x.variables)
+    variable = composite.variables[0]
+    path = variable.getPath()
+    index = PathIndex.of(resource)
+    assert index.node(path) is variable
+
+    # id change
+    composite.id = 'renamed'
+    new_path = expected_path(variable)
+    assert new_path.endswith('renamed.' + variable.id)
+    assert variable.getPath() == new_path
+    assert index.node(path) is None
+    assert index.node(new_path) is variable
+
+    # move to another node
+    other = pygeppetto.CompositeType()
+    other.id = 'other'
+    library.types.append(other)
+    other.variables.append(variable)
+    moved_path = expected_path(variable)
+    assert variable.getPath() == moved_path
+    assert index.node(new_path) is not variable
+    assert index.node(moved_path) is variable
+
+    # out of the model
+    other.variables.remove(variable)
+    assert variable.getPath() == variable.id
+    assert index.node(moved_path) is None
+
+    # roots can change
+    path = other.getPath()
+    resource.remove(root)
+    assert index.node(path) is None
+    resource.append(root)
+    assert index.node(path) is other
+
+
+def test_instance_paths(load):
+    resource = load()
+    root = resource.contents[0]
+    index = PathIndex.of(resource)
+    cell = pygeppetto.CompositeType()
+    cell.id = 'cell'
+    soma = pygeppetto.Variable()
+    soma.id = 'soma'
+    cell.variables.append(soma)
+    population = pygeppetto.ArrayType()
+    population.id = 'population'
+    population.arrayType = cell
+    network = pygeppetto.CompositeType()
+    network.id = 'network'
+    cells = pygeppetto.Variable()
+    cells.id = 'cells'
+    cells.types.append(population)
+    network.variables.append(cells)
+    top = pygeppetto.Variable()
+    top.id = 'top'
+    top.types.append(network)
+    root.libraries[0].types.extend([cell, population, network])
+    root.variables.append(top)
+
+    pointer = pygeppetto.Pointer()
+    for variable, position in ((top, None), (cells, 3), (soma, None)):
+        element = pygeppetto.PointerElement()
+        element.variable = variable
+        if position is not None:
+            element.index = position
+        pointer.elements.append(element)
+    assert pointer.elements[0].index == -1
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.key = network
+    initial_value.value = pointer
+    top.initialValues.append(initial_value)
+
+    assert pointer.getInstancePath() == 'top.cells[3].soma'
+    assert index.variable('top.cells[3].soma') is soma
+    assert index.variable('top.cells') is cells
+    assert index.variable('top.unknown[3].soma') is None
+    built = index.pointer('top.cells[3].soma')
+    assert built.getInstancePath() == 'top.cells[3].soma'
+    assert [x.variable for x in built.elements] == [top, cells, soma]
+    assert index.pointer('top.unknown') is None
+
+    pointer.elements[1].index = 4
+    assert pointer.getInstancePath() == 'top.cells[4].soma'
+    soma.id = 'axon'
+    assert pointer.getInstancePath() == 'top.cells[4].axon'
+    assert index.variable('top.cells[4].axon') is soma
+    del pointer.elements[2]
+    assert pointer.getInstancePath() == 'top.cells[4]'
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import pytest
+from pyecore.resources import ResourceSet, URI
+import model as pygeppetto
+from model.datasources import SimpleQuery, ProcessQuery, CompoundQuery, \
+                               CompoundRefQuery, RunnableQuery, \
+                               BooleanOperator
+from model.queries import QueryBackend, QueryEngine, QueryError, combine
+
+NEURONS = [{'ID': 'n{}'.format(i), 'name': 'neuron {}'.format(i)}
+           for i in range(10)]
+SYNAPSES = [{'ID': 's{}'.format(i), 'pre': 'n{}'.format(i % 3),
+             'post': 'n{}'.format(i % 5)} for i in range(30)]
+
+
+class TableBackend(QueryBackend):
+    """In-process stand-in of a data source.
+
+    The query ``table`` gives the rows of a table, ``table?field`` the rows
+    of the table whose field is the ID of one of the given rows, and
+    ``variable`` a row with the ID of the variable. The count query is the
+    name of a table.
+    """
+    def __init__(self, tables):
+        self.tables = tables
+        self.produced = 0
+        self.counted = []
+
+    def execute(self, query, variable, rows):
+        if query.query == 'variable':
+            yield {'ID': variable.id}
+            return
+        table, _, field = query.query.partition('?')
+        for row in rows if field else [None]:
+            for x in self.tables[table]:
+                if row is None or x[field] == row['ID']:
+                    self.produced += 1
+                    yield dict(x)
+
+    def count(self, query, variable, rows):
+        self.counted.append(query.countQuery)
+        if rows is None:
+            return len(self.tables[query.countQuery])
+        return super().count(query, variable, rows)
+
+
+class BarrierBackend(QueryBackend):
+    """Only answers when parties queries are run at the same time."""
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def execute(self, query, variable, rows):
+        self.barrier.wait()
+        return [dict(x) for x in NEURONS if x['ID'] in query.query.split()]
+
+
+def simple_query(identifier, text, count_query=None):
+    query = SimpleQuery()
+    query.id = identifier
+    query.query = text
+    query.countQuery = count_query
+    return query
+
+
+def rename(query, variable, rows):
+    for row in rows:
+        yield {'ID': row['ID'], 'target': row['post']}
+
+
+def data_model():
+    root = pygeppetto.GeppettoModel()
+    source = pygeppetto.DataSource()
+    source.id = 'tables'
+    source.dataSourceService = 'tableService'
+    root.dataSources.append(source)
+    neurons = simple_query('neurons', 'neurons', 'neurons')
+    source.queries.append(neurons)
+    chain = CompoundQuery()
+    chain.id = 'targets'
+    renaming = ProcessQuery()
+    renaming.id = 'rename'
+    renaming.queryProcessorId = 'rename'
+    chain.queryChain.extend([
+        simple_query('self', 'variable'),
+        simple_query('outgoing', 'synapses?pre', 'synapses'),
+        renaming])
+    source.queries.append(chain)
+    references = CompoundRefQuery()
+    references.id = 'references'
+    references.queryChain.extend([neurons, chain.queryChain[1]])
+    source.queries.append(references)
+    variable = pygeppetto.Variable()
+    variable.id = 'n1'
+    root.variables.append(variable)
+    return root
+
+
+@pytest.fixture
+def engine():
+    backend = TableBackend({'neurons': NEURONS, 'synapses': SYNAPSES})
+    return QueryEngine(backends={'tableService': backend},
+                       processors={'rename': rename})
+
+
+def queries(root):
+    return {x.id: x for x in root.dataSources[0].queries}
+
+
+def test_simple_query(engine):
+    root = data_model()
+    neurons = queries(root)['neurons']
+    results = engine.results(neurons)
+    assert results.id == 'neurons'
+    assert list(results.header) == ['ID', 'name']
+    assert [list(x.values) for x in results.results] == \
+        [[x['ID'], x['name']] for x in NEURONS]
+    backend = engine.backend(neurons)
+    backend.produced = 0
+    assert engine.count(neurons) == len(NEURONS)
+    assert backend.produced == 0 and backend.counted == ['neurons']
+    neurons.runForCount = False
+    assert engine.count(neurons) is None
+
+
+def test_compound_query(engine):
+    root = data_model()
+    chain = queries(root)['targets']
+    variable = root.variables[0]
+    rows = list(engine.execute(chain, variable))
+    expected = [{'ID': x['ID'], 'target': x['post']} for x in SYNAPSES
+                if x['pre'] == 'n1']
+    assert rows == expected
+    assert engine.count(chain, variable) == len(expected)
+    # a processor is counted by going through the rows
+    assert engine.backend(chain.queryChain[1]).counted == []
+
+    references = queries(root)['references']
+    assert engine.count(references) == len(SYNAPSES)
+    assert engine.backend(chain.queryChain[1]).counted == ['synapses']
+
+
+def test_streaming(engine):
+    root = data_model()
+    backend = engine.backend(queries(root)['neurons'])
+    rows = engine.execute(queries(root)['references'])
+    assert backend.produced == 0
+    first = next(rows)
+    assert first['pre'] == 'n0'
+    assert backend.produced == 2  # a neuron and one of its synapses
+    assert len(list(rows)) == len(SYNAPSES) - 1
+
+
+def test_errors(engine):
+    root = data_model()
+    chain = queries(root)['targets']
+    del engine.processors['rename']
+    with pytest.raises(QueryError):
+        list(engine.execute(chain, root.variables[0]))
+    root.dataSources[0].dataSourceService = 'unknown'
+    with pytest.raises(QueryError):
+        engine.results(queries(root)['neurons'])
+    engine.backends[None] = TableBackend({'neurons': NEURONS})
+    assert len(engine.results(queries(root)['neurons']).results) == 10
+
+
+def test_combine():
+    a = [{'ID': 1}, {'ID': 2}, {'ID': 3}]
+    b = [{'ID': 2}, {'ID': 4}]
+    assert combine(a, b, BooleanOperator.AND) == [{'ID': 2}]
+    assert combine(a, b, BooleanOperator.NAND) == [{'ID': 1}, {'ID': 3}]
+    assert combine(a, b, BooleanOperator.OR) == a + [{'ID': 4}]
+
+
+def test_run_queries():
+    root = data_model()
+    source = root.dataSources[0]
+    del source.queries[:]
+    texts = ['n1 n2 n3', 'n2 n3 n4', 'n3 n5']
+    for i, text in enumerate(texts):
+        source.queries.append(simple_query('query{}'.format(i), text))
+    rset = pygeppetto.register(ResourceSet())
+    resource = rset.create_resource(URI('queries.xmi'))
+    resource.append(root)
+    engine = QueryEngine(backends={None: BarrierBackend(len(texts))},
+                         resource=resource)
+    runnables = []
+    operators = [BooleanOperator.AND, BooleanOperator.OR,
+                 BooleanOperator.NAND]
+    for query, operator in zip(source.queries, operators):
+        runnable = RunnableQuery()
+        runnable.queryPath = query.getPath()
+        runnable.targetVariablePath = 'n1'
+        runnable.booleanOperator = operator
+        runnables.append(runnable)
+    # the barrier is only passed if the queries run concurrently
+    results = asyncio.run(engine.run_queries(runnables))
+    assert [x.values[0] for x in results.results] == ['n1', 'n2', 'n4']
+    count = asyncio.run(engine.count_queries(runnables))
+    assert count == 3
+    # a single query is counted with count()
+    engine.backends[None] = BarrierBackend(1)
+    assert asyncio.run(engine.count_queries(runnables[:1])) == 3
+    source.queries[0].runForCount = False
+    assert asyncio.run(engine.count_queries(runnables[:1])) is None
+
+    runnables[0].queryPath = 'tables.unknown'
+    with pytest.raises(QueryError):
+        asyncio.run(engine.run_queries(runnables))
+
+
+def test_run(engine):
+    root = data_model()
+    chain = queries(root)['targets']
+
+    async def run_both():
+        return await asyncio.gather(
+            engine.run(chain, root.variables[0]),
+            engine.run_count(queries(root)['neurons']))
+
+    results, count = asyncio.run(run_both())
+    assert list(results.header) == ['ID', 'target']
+    assert count == len(NEURONS)
+
+
+def test_table(engine):
+    root = data_model()
+    table = engine.table(queries(root)['neurons'])
+    assert table.id == 'neurons'
+    assert table.header == ['ID', 'name']
+    assert table.column('ID').tolist() == [x['ID'] for x in NEURONS]
+    assert [list(x.values) for x in table.to_results().results] == \
+        [list(x.values) for x in engine.results(
+            queries(root)['neurons']).results]
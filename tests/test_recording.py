@@ -0,0 +1,136 @@
+import numpy
+import pytest
+import model as pygeppetto
+from model.arrays import DoubleArray, enable_arrays, disable_arrays
+from model.recording import Recorder
+
+
+def pointer(*ids):
+    pointer = pygeppetto.Pointer()
+    for identifier in ids:
+        name, _, index = identifier.partition('[')
+        variable = pygeppetto.Variable()
+        variable.id = name
+        element = pygeppetto.PointerElement()
+        element.variable = variable
+        if index:
+            element.index = int(index[:-1])
+        pointer.elements.append(element)
+    return pointer
+
+
+def experiment_state(*paths):
+    state = pygeppetto.ExperimentState()
+    for path in paths:
+        variable_value = pygeppetto.VariableValue()
+        variable_value.pointer = pointer(*path.split('.'))
+        state.recordedVariables.append(variable_value)
+    return state
+
+
+def test_slots_and_record():
+    state = experiment_state('network.cells[0].v', 'network.cells[1].v')
+    first, second = state.recordedVariables
+    recorder = Recorder(state)
+    assert recorder.slots == 2
+    assert recorder.slot('network.cells[1].v') == 1
+    assert recorder.slot(first.pointer) == 0 and recorder.slot(second) == 1
+    with pytest.raises(KeyError):
+        recorder.slot('network.cells[2].v')
+    recorder.append(0.0, [1.0, 2.0])
+    third = pointer('network', 'cells[2]', 'v')
+    assert recorder.record(third) == 2 and recorder.record(third) == 2
+    assert state.recordedVariables[2].pointer is third
+    assert recorder.slot('network.cells[2].v') == 2
+    recorder.append(1.0, [3.0, 4.0, 5.0])
+    times, values = recorder.read(2)
+    assert times.tolist() == [0.0, 1.0]
+    assert numpy.isnan(values[0]) and values[1] == 5.0
+    with pytest.raises(ValueError):
+        recorder.append(2.0, [1.0])
+    with pytest.raises(ValueError):
+        recorder.append(0.5, [1.0, 2.0, 3.0])
+
+
+def test_append_extend_and_windows():
+    recorder = Recorder(experiment_state('a', 'b'), chunk_size=16)
+    times = numpy.arange(100) * 0.5
+    values = numpy.column_stack((numpy.sin(times), numpy.cos(times)))
+    for time, row in zip(times[:10], values[:10]):
+        recorder.append(time, row)
+    recorder.extend(times[10:], values[10:])
+    assert len(recorder) == recorder.count == 100
+    read_times, read_values = recorder.read(1)
+    assert (read_times == times).all() and (read_values == values[:, 1]).all()
+    # the window includes its bounds, across the chunks
+    read_times, read_values = recorder.read(0, start=7.0, stop=20.0)
+    assert read_times[0] == 7.0 and read_times[-1] == 20.0
+    assert (read_values == values[14:41, 0]).all()
+    assert recorder.read(0, start=100.0)[0].size == 0
+    assert (recorder.times(stop=1.0) == [0.0, 0.5, 1.0]).all()
+    # the reads are copies
+    read_values[:] = 0
+    assert (recorder.read(0, start=7.0, stop=20.0)[1] != 0).any()
+    with pytest.raises(ValueError):
+        recorder.extend([60.0, 59.0], [[0, 0], [0, 0]])
+
+
+def test_downsampled_read():
+    recorder = Recorder(experiment_state('v'), chunk_size=100)
+    times = numpy.arange(1000, dtype=float)
+    values = numpy.zeros(1000)
+    values[[123, 456, 789]] = [5.0, -3.0, 7.0]  # spikes
+    recorder.extend(times, values[:, None])
+    read_times, read_values = recorder.read(0, max_points=20)
+    assert len(read_values) <= 20
+    assert (numpy.diff(read_times) > 0).all()
+    assert {123.0, 456.0, 789.0} <= set(read_times.tolist())
+    assert (read_values == values[read_times.astype(int)]).all()
+    assert len(recorder.read(0, max_points=1000)[1]) == 1000
+
+
+def test_ring_buffer():
+    recorder = Recorder(experiment_state('v'), chunk_size=10, capacity=25)
+    times = numpy.arange(100, dtype=float)
+    recorder.extend(times[:50], times[:50, None])
+    chunks = recorder._chunks + recorder._free
+    for time in times[50:]:
+        recorder.append(time, [time])
+    assert recorder.dropped == 70 and len(recorder) == 30
+    read_times, read_values = recorder.read(0)
+    assert (read_times == times[70:]).all()
+    assert (read_values == times[70:]).all()
+    # the chunks are reused
+    assert all(any(x is y for y in chunks) for x in recorder._chunks)
+
+
+@pytest.mark.parametrize('arrays', [False, True])
+def test_series(arrays):
+    if arrays:
+        enable_arrays()
+    try:
+        state = experiment_state('a', 'b')
+        unit = pygeppetto.Unit()
+        unit.unit = 'mV'
+        existing = pygeppetto.TimeSeries()
+        existing.unit = unit
+        state.recordedVariables[0].value = existing
+        recorder = Recorder(state, chunk_size=8, capacity=16)
+        recorder.extend(numpy.arange(10.0), numpy.ones((10, 2)))
+        series = recorder.series(0)
+        assert series is existing and series.unit is unit
+        assert isinstance(series.value, DoubleArray) is arrays
+        assert list(series.value) == [1.0] * 10
+        recorder.append(10.0, [2.0, 3.0])
+        assert list(recorder.series(0).value) == [1.0] * 10 + [2.0]
+        recorder.materialize()
+        second = state.recordedVariables[1].value
+        assert list(second.value) == [1.0] * 10 + [3.0]
+        # the dropped samples are removed from the series
+        recorder.extend(numpy.arange(11.0, 24.0), numpy.zeros((13, 2)))
+        assert recorder.dropped == 8
+        assert len(recorder.series(1).value) == 16
+        recorder.clear()
+        assert len(recorder) == 0 and len(recorder.series(0).value) == 0
+    finally:
+        disable_arrays()
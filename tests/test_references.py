@@ -0,0 +1,140 @@
+import pytest
+import model as pygeppetto
+from model.references import ReferenceIndex, indexed_references
+from model.xmi import GeppettoXMIOptions
+
+
+def scan(resource):
+    """Gives the inverse references of the objects of resource, found by
+    walking the whole resource.
+    """
+    is_deferred = getattr(resource, 'is_deferred', lambda x: False)
+    references = set(indexed_references())
+    inverse = {}
+    stack = list(resource.contents)
+    while stack:
+        source = stack.pop()
+        if not is_deferred(source):
+            stack.extend(source.eContents)
+        for reference in source.eClass.eAllReferences():
+            if reference not in references:
+                continue
+            value = source.eGet(reference)
+            for target in (value if reference.many else [value]):
+                if target is not None:
+                    inverse.setdefault(target, set()).add(
+                        (source, reference))
+    return inverse
+
+
+def check(resource):
+    index = ReferenceIndex.of(resource)
+    expected = scan(resource)
+    for target, pairs in expected.items():
+        assert set(index.referrers(target)) == pairs
+        for source, reference in pairs:
+            assert source in index.referrers(target, reference)
+    assert set(index._inverse) == set(expected)
+
+
+def test_references():
+    references = indexed_references()
+    assert pygeppetto.VisualValue.groupElements in references
+    assert pygeppetto.TypeToValueMap.key in references
+    assert pygeppetto.QueryMatchingCriteria.type in references
+    assert pygeppetto.Variable.types in references
+    assert not any(x.containment for x in references)
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_referrers(filename, load):
+    resource = load(filename)
+    check(resource)
+    index = ReferenceIndex.of(resource)
+    assert ReferenceIndex.of(resource) is index
+    root = resource.contents[0]
+    parameter = root.libraries[1].types[0]
+    keys = index.referrers(parameter, pygeppetto.TypeToValueMap.key)
+    assert keys and all(x.key is parameter for x in keys)
+    assert set(index.referrers(parameter, pygeppetto.Variable.types)) == \
+        set(parameter.referencedVariables)
+    assert index.referrers(pygeppetto.Variable()) == []
+
+
+def test_updates(load):
+    resource = load()
+    index = ReferenceIndex.of(resource)
+    check(resource)
+    root = resource.contents[0]
+    library = root.libraries[0]
+    types = {x.id: x for x in library.types}
+    parameter = root.libraries[1].types[0]
+    cell = types['pyr_4_sym']
+    key = pygeppetto.TypeToValueMap.key
+
+    # a new variable, then its references
+    variable = pygeppetto.Variable()
+    variable.id = 'network'
+    variable.types.append(types['network_ACnet2'])
+    root.variables.append(variable)
+    assert index.referrers(types['network_ACnet2'],
+                           pygeppetto.Variable.types)[-1] is variable
+    variable.types.append(cell)
+    initial_value = pygeppetto.TypeToValueMap()
+    initial_value.key = cell
+    variable.initialValues.append(initial_value)
+    assert index.referrers(cell, key) == [initial_value]
+    initial_value.key = parameter
+    assert index.referrers(cell, key) == []
+    assert initial_value in index.referrers(parameter, key)
+    variable.types.remove(cell)
+    check(resource)
+
+    # removed and moved objects
+    channel = types['Ca_pyr']
+    conductance = channel.variables[0]
+    channel.variables.remove(conductance)
+    assert conductance not in index.referrers(parameter,
+                                              pygeppetto.Variable.types)
+    assert not any(x.eContainer() is conductance
+                   for x in index.referrers(parameter, key))
+    check(resource)
+    types['Kdr_pyr'].variables.append(conductance)
+    assert conductance in index.referrers(parameter,
+                                          pygeppetto.Variable.types)
+    check(resource)
+    variable.delete()
+    assert index.referrers(types['network_ACnet2'],
+                           pygeppetto.Variable.types) == []
+    check(resource)
+    library.types.remove(cell)
+    check(resource)
+
+    # the roots added to the resource are indexed
+    other = pygeppetto.GeppettoModel()
+    other_variable = pygeppetto.Variable()
+    other_variable.types.append(parameter)
+    other.variables.append(other_variable)
+    resource.append(other)
+    assert other_variable in index.referrers(parameter,
+                                             pygeppetto.Variable.types)
+    check(resource)
+
+
+def test_lazy_types(load):
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = load(options=options)
+    deferred = list(resource._deferred)
+    assert deferred and resource.deferred_count == len(deferred)
+    index = ReferenceIndex.of(resource)
+    check(resource)
+    assert all(resource.is_deferred(x) for x in deferred)
+    parameter = resource.contents[0].libraries[1].types[0]
+    before = len(index.referrers(parameter))
+    resource.materialize(deferred[0])
+    assert resource.deferred_count == len(deferred) - 1
+    check(resource)
+    resource.materialize()
+    check(resource)
+    assert len(index.referrers(parameter)) > before
@@ -0,0 +1,135 @@
+import numpy
+import pytest
+import model as pygeppetto
+from model.datasources import QueryResult, SerializableQueryResult
+from model.results import ResultTable
+
+HEADER = ['ID', 'name', 'size', 'active']
+ROWS = [['n3', 'gamma', 12, True],
+        ['n1', 'alpha', 7.5, False],
+        ['n2', None, 7.5, True],
+        ['n0', 'beta', None, False]]
+
+
+def query_results(rows=ROWS, row_class=QueryResult):
+    results = pygeppetto.QueryResults()
+    results.id = 'neurons'
+    results.header.extend(HEADER)
+    for values in rows:
+        result = row_class()
+        result.values.extend(values)
+        results.results.append(result)
+    return results
+
+
+def test_get_value():
+    results = query_results()
+    for i, row in enumerate(ROWS):
+        for field, value in zip(HEADER, row):
+            assert results.getValue(field, i) == value
+    assert results.getValue('ID', 0) == 'n3'
+    assert type(results.getValue('active', 0)) is bool
+    with pytest.raises(KeyError):
+        results.getValue('unknown', 0)
+    table = ResultTable.of(results)
+    assert table is ResultTable.of(results)
+    assert table.column('size').dtype == numpy.float64
+    assert table.column('active').dtype == bool
+    assert table.column('ID').dtype == object
+    assert list(table.valid('name')) == [True, True, False, True]
+    assert table.getValue(2, 1) == 7.5
+    assert table.row(3) == dict(zip(HEADER, ROWS[3]))
+
+
+def test_cache_invalidation():
+    results = query_results()
+    table = ResultTable.of(results)
+    results.results[1].values[0] = 'n9'
+    assert results.getValue('ID', 1) == 'n9'
+    assert ResultTable.of(results) is not table
+    result = QueryResult()
+    result.values.extend(['n4', 'delta', 1, True])
+    results.results.append(result)
+    assert results.getValue('name', 4) == 'delta'
+    results.header[1] = 'label'
+    assert results.getValue('label', 4) == 'delta'
+    # the observer does not stay on the rows after an invalidation
+    assert all(len(x.listeners) <= 1 for x in results.results)
+
+
+def test_filter_sort():
+    table = ResultTable.of(query_results())
+    small = table.filter(table.column('size') < 10)
+    assert small.column('ID').tolist() == ['n1', 'n2', 'n0']
+    small = small.filter(small.valid('size'))
+    assert small.column('ID').tolist() == ['n1', 'n2']
+    assert table.sort('ID').column('ID').tolist() == ['n0', 'n1', 'n2', 'n3']
+    assert table.sort('size', 'ID').column('ID').tolist() == \
+        ['n1', 'n2', 'n3', 'n0']
+    assert table.sort('size', 'ID', reverse=True).column('ID').tolist() == \
+        ['n3', 'n2', 'n1', 'n0']
+    # missing values last, stable
+    assert table.sort('name').column('ID').tolist() == \
+        ['n1', 'n0', 'n3', 'n2']
+    assert table.sort('active').column('ID').tolist() == \
+        ['n1', 'n0', 'n3', 'n2']
+    with pytest.raises(ValueError):
+        table.filter([True])
+
+    # an object column of values of different types
+    mixed = ResultTable.from_columns({'ID': ['a', 'b', 'c', 'd', 'e', 'f'],
+                                      'value': ['x', 2, None, 1.5, 'a', 2]})
+    assert mixed.column('value').dtype == object
+    assert mixed.sort('value').column('ID').tolist() == \
+        ['d', 'b', 'f', 'e', 'a', 'c']
+    assert mixed.sort('value', reverse=True).column('ID').tolist() == \
+        ['a', 'e', 'b', 'f', 'd', 'c']
+
+
+def test_conversions():
+    results = query_results()
+    table = ResultTable.of(results)
+    copy = table.to_results()
+    assert list(copy.header) == HEADER
+    assert [list(x.values) for x in copy.results] == ROWS
+    serializable = table.to_results(serializable=True)
+    assert all(isinstance(x, SerializableQueryResult)
+               for x in serializable.results)
+    assert list(serializable.results[1].values) == ['n1', 'alpha', '7.5',
+                                                    'false']
+    parsed = ResultTable.from_results(serializable, types={'size': float})
+    assert parsed.column('size').dtype == numpy.float64
+    assert parsed.getValue('size', 3) is None
+    assert parsed.getValue('name', 0) == 'gamma'
+
+    rows = [{'ID': 'a', 'x': 1}, {'ID': 'b', 'y': 2.0}]
+    table = ResultTable.from_rows(rows, identifier='rows')
+    assert table.header == ['ID', 'x', 'y']
+    assert table.column('x').dtype == numpy.int64
+    assert table.rows() == [{'ID': 'a', 'x': 1, 'y': None},
+                            {'ID': 'b', 'x': None, 'y': 2.0}]
+    assert table.to_results().id == 'rows'
+
+
+def test_export():
+    table = ResultTable.of(query_results())
+    arrays = table.to_numpy()
+    assert arrays['size'] is not table.column('size')
+    assert numpy.shares_memory(arrays['size'], table.column('size'))
+    assert arrays['size'].mask.tolist() == [False, False, False, True]
+    assert arrays['ID'] is table.column('ID')
+
+    validity, offsets, data = table.buffers('size')
+    assert offsets is None
+    assert numpy.shares_memory(numpy.frombuffer(data), table.column('size'))
+    assert numpy.unpackbits(numpy.frombuffer(validity, numpy.uint8),
+                            bitorder='little')[:4].tolist() == [1, 1, 1, 0]
+    validity, offsets, data = table.buffers('name')
+    offsets = numpy.frombuffer(offsets, numpy.int32)
+    assert offsets.tolist() == [0, 5, 10, 10, 14]
+    assert bytes(data) == b'gammaalphabeta'
+    _, _, data = table.buffers('active')
+    assert numpy.frombuffer(data, numpy.uint8).tolist() == [0b0101]
+    mixed = ResultTable.from_rows([{'x': 'a'}, {'x': 1}])
+    with pytest.raises(TypeError):
+        mixed.buffers('x')
@@ -0,0 +1,83 @@
+import pytest
+from pyecore.resources import URI
+import model as pygeppetto
+from model.snapshot import GeppettoSnapshotResource, save_snapshot
+
+
+@pytest.fixture(scope='module', params=['MediumNet.net.nml.xmi',
+                                        'BigCA1.net.nml.xmi'])
+def xmi_resource(request, load):
+    return load(request.param)
+
+
+def snapshot_of(resource, tmpdir, name='model.snapshot'):
+    f = tmpdir.join(name)
+    save_snapshot(resource, URI(str(f)))
+    return f
+
+
+def test_read_snapshot(tmpdir, rset, xmi_resource, model_signature):
+    f = snapshot_of(xmi_resource, tmpdir)
+    resource = rset.get_resource(URI(str(f)))
+    assert isinstance(resource, GeppettoSnapshotResource)
+    root = resource.contents[0]
+    assert isinstance(root, pygeppetto.GeppettoModel)
+    assert root.eResource is resource
+    assert model_signature(root) == \
+        model_signature(xmi_resource.contents[0])
+
+
+def test_readwrite_snapshot(tmpdir, rset, xmi_resource):
+    f = snapshot_of(xmi_resource, tmpdir)
+    resource = rset.get_resource(URI(str(f)))
+    output = tmpdir.join('copy.snapshot')
+    resource.save(output=URI(str(output)))
+    assert output.read_binary() == f.read_binary()
+
+
+def test_roundtrip_snapshot(tmpdir, rset, xmi_resource):
+    f = snapshot_of(xmi_resource, tmpdir)
+    resource = rset.get_resource(URI(str(f)))
+    root = resource.contents[0]
+
+    # We change the root name
+    root.name = 'testModel'
+
+    # We serialize the modifications
+    output = tmpdir.join('modified.snapshot')
+    resource.save(output=URI(str(output)))
+
+    # We read again the file
+    resource = rset.get_resource(URI(str(output)))
+    root = resource.contents[0]
+    assert root.name == 'testModel'
+
+
+def test_snapshot_to_xmi(tmpdir, rset, xmi_resource):
+    f = snapshot_of(xmi_resource, tmpdir)
+    resource = rset.get_resource(URI(str(f)))
+    expected = tmpdir.join('expected.xmi')
+    xmi_resource.save(output=URI(str(expected)))
+
+    # The XMI of the reloaded model is the same
+    xmi = rset.create_resource(URI(str(tmpdir.join('model.xmi'))))
+    xmi.extend(list(resource.contents))
+    xmi.save()
+    assert tmpdir.join('model.xmi').read_binary() == expected.read_binary()
+
+
+def test_snapshot_opposites(tmpdir, rset, load):
+    resource = load()
+    f = snapshot_of(resource, tmpdir)
+    root = rset.get_resource(URI(str(f))).contents[0]
+    variable = next(x for x in root.eAllContents()
+                    if isinstance(x, pygeppetto.Variable) and x.types)
+    for type_ in variable.types:
+        assert variable in type_.referencedVariables
+
+
+def test_not_a_snapshot(tmpdir, rset):
+    f = tmpdir.join('wrong.snapshot')
+    f.write_binary(b'<xmi:XMI/>' + b'\x00' * 16)
+    with pytest.raises(ValueError):
+        rset.get_resource(URI(str(f)))
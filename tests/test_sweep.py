@@ -0,0 +1,136 @@
+import numpy
+import pytest
+import model as pygeppetto
+from model.sweep import ParameterSweep
+
+PATHS = ['network.temperature', 'syn.gbase', 'syn.erev']
+
+
+@pytest.fixture
+def model(load):
+    resource = load()
+    root = resource.contents[0]
+    types = {x.id: x for x in root.libraries[0].types}
+    for identifier, type_id in (('network', 'network_ACnet2'),
+                                ('syn', 'AMPA_syn')):
+        variable = pygeppetto.Variable()
+        variable.id = identifier
+        variable.types.append(types[type_id])
+        root.variables.append(variable)
+    return root
+
+
+def parameter_values(model):
+    types = {x.id: x for x in model.libraries[0].types}
+    variables = [types['network_ACnet2'].variables,
+                 types['AMPA_syn'].variables, types['AMPA_syn'].variables]
+    return [next(x for x in variables[i] if x.id == path.split('.')[1])
+            .initialValues[0].value.value for i, path in enumerate(PATHS)]
+
+
+def test_apply_and_run(model):
+    original = parameter_values(model)
+    sweep = ParameterSweep(model, PATHS)
+    assert len(sweep) == 3
+    assert [x.getInstancePath() for x in sweep.pointers] == PATHS
+    assert sweep.original.tolist() == original
+
+    notifications = []
+
+    class Listener(object):
+        def notifyChanged(self, notification):
+            notifications.append(notification)
+
+    model.eResource.listeners.append(Listener())
+    sweep.apply([1.0, 2.0, 3.0])
+    assert parameter_values(model) == [1.0, 2.0, 3.0]
+    assert not notifications
+    sweep.restore()
+    assert parameter_values(model) == original
+
+    matrix = numpy.arange(12, dtype=float).reshape(4, 3)
+    seen = []
+    for index in sweep.run(matrix):
+        seen.append((index, parameter_values(model)))
+    assert seen == [(i, matrix[i].tolist()) for i in range(4)]
+    assert parameter_values(model) == original
+
+    with pytest.raises(ValueError):
+        sweep.apply([1.0])
+    with pytest.raises(ValueError):
+        list(sweep.run(numpy.zeros((2, 2))))
+    with pytest.raises(ValueError):
+        ParameterSweep(model, ['network.unknown'])
+    with pytest.raises(ValueError):
+        ParameterSweep(model, ['syn'])
+
+
+def test_states(model):
+    original = parameter_values(model)
+    sweep = ParameterSweep(model, PATHS)
+    matrix = numpy.random.default_rng(0).random((5, 3))
+    for state, row in zip(sweep.states(matrix), matrix):
+        assert state is sweep.template()
+        assert [x.value.value for x in state.setParameters] == row.tolist()
+    states = [sweep.state(row) for row in matrix]
+    for state, row in zip(states, matrix):
+        parameters = state.setParameters
+        assert [x.pointer.getInstancePath() for x in parameters] == PATHS
+        assert [x.value.value for x in parameters] == row.tolist()
+        assert parameters[1].value.unit.unit == \
+            sweep.quantities[1].unit.unit
+        assert parameters[1].value is not sweep.quantities[1]
+        assert parameters[0].pointer.elements[0].variable is \
+            model.variables[0]
+    assert states[0].setParameters[0] is not states[1].setParameters[0]
+    assert parameter_values(model) == original
+
+    # the set parameters of a state give the same parameters
+    other = ParameterSweep(model, states[2])
+    assert other.quantities == sweep.quantities
+    other.apply(matrix[2])
+    assert parameter_values(model) == matrix[2].tolist()
+
+
+def test_missing_value(model):
+    parameter_type = model.libraries[1].types[0]
+    assert isinstance(parameter_type, pygeppetto.ParameterType)
+    default = pygeppetto.PhysicalQuantity()
+    default.value = 4.5
+    parameter_type.defaultValue = default
+    holder = pygeppetto.CompositeType()
+    holder.id = 'holder'
+    parameter = pygeppetto.Variable()
+    parameter.id = 'weight'
+    parameter.types.append(parameter_type)
+    holder.variables.append(parameter)
+    model.libraries[0].types.append(holder)
+    variable = pygeppetto.Variable()
+    variable.id = 'holder'
+    variable.types.append(holder)
+    model.variables.append(variable)
+
+    sweep = ParameterSweep(model, ['holder.weight'])
+    quantity = parameter.initialValues[0].value
+    assert sweep.quantities == [quantity]
+    assert parameter.initialValues[0].key is parameter_type
+    assert quantity.value == 4.5
+    sweep.apply([1.5])
+    assert quantity.value == 1.5
+
+
+def scaled_temperature(sweep, index, row):
+    temperature = sweep.quantities[0].value
+    assert temperature == row[0]
+    return index, temperature * 2
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_map(model, processes):
+    sweep = ParameterSweep(model, PATHS)
+    matrix = numpy.column_stack((numpy.arange(10.0), numpy.ones(10),
+                                 numpy.zeros(10)))
+    results = sweep.map(scaled_temperature, matrix, processes=processes,
+                        chunk_size=3)
+    assert results == [(i, 2.0 * i) for i in range(10)]
+    assert sweep.original.tolist() == parameter_values(model)
@@ -0,0 +1,83 @@
+import json
+import pytest
+from pyecore.resources import URI
+import model as pygeppetto
+from model.sync import SyncTracker, apply_patch
+
+
+def test_dirty_tracking(load):
+    resource = load()
+    tracker = SyncTracker.of(resource)
+    assert SyncTracker.of(resource) is tracker
+    tracker.mark_synched()
+    library = resource.contents[0].libraries[0]
+    type_ = library.types[0]
+    variable = type_.variables[0]
+    assert not tracker.is_dirty()
+    assert variable.synched and type_.synched and library.synched
+
+    variable.name = 'renamed'
+    assert tracker.is_dirty()
+    assert not variable.synched
+    assert not type_.synched
+    assert not library.synched
+    assert type_.variables[1].synched
+    assert library.types[1].synched
+
+    patch = tracker.delta()
+    assert patch == {'classes': [], 'changes': [
+        {'path': '//@libraries.0/@types.0/@variables.0',
+         'attributes': {'name': 'renamed'}}]}
+    assert variable.synched and type_.synched and library.synched
+    assert tracker.delta()['changes'] == []
+
+
+def test_delta_append(load):
+    resource = load()
+    tracker = SyncTracker.of(resource)
+    tracker.mark_synched()
+    type_ = resource.contents[0].libraries[0].types[0]
+    variable = pygeppetto.Variable()
+    variable.id = 'added'
+    variable.types.append(type_)
+    type_.variables.append(variable)
+    assert not variable.synched
+
+    patch = tracker.delta()
+    entry = next(x for x in patch['changes']
+                 if x['path'] == '//@libraries.0/@types.0')
+    added, = entry['append']['variables']
+    assert added['attributes'] == {'id': 'added'}
+    assert added['references'] == {'types': ['//@libraries.0/@types.0']}
+    assert variable.synched
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_apply_patch(tmpdir, filename, load):
+    resource = load(filename)
+    copy = load(filename)
+    tracker = SyncTracker.of(resource)
+    tracker.mark_synched()
+
+    root = resource.contents[0]
+    root.name = 'patched'
+    types = root.libraries[0].types
+    types[3].delete()
+    composites = [x for x in types if isinstance(x, pygeppetto.CompositeType)
+                  and x.variables]
+    composites[1].variables.insert(0, composites[0].variables[-1])
+    variable = pygeppetto.Variable()
+    variable.id = 'added'
+    variable.types.append(composites[2])
+    composites[0].variables.append(variable)
+    composites[3].superType.append(composites[4])
+
+    patch = json.loads(json.dumps(tracker.delta()))
+    apply_patch(copy, patch)
+
+    expected = tmpdir.join('expected.xmi')
+    resource.save(output=URI(str(expected)))
+    patched = tmpdir.join('patched.xmi')
+    copy.save(output=URI(str(patched)))
+    assert patched.read_binary() == expected.read_binary()
@@ -1,14 +1,16 @@
 import pytest
-from pyecore.resources import ResourceSet, URI
+from pyecore.resources import URI
+from pyecore.resources.xmi import XMIResource
 import model as pygeppetto
+from model.xmi import GeppettoXMIResource, GeppettoXMIOptions
 
 
-@pytest.fixture(scope='module')
-def rset():
-    rset = ResourceSet()
-    rset.metamodel_registry[pygeppetto.nsURI] = pygeppetto
-    for subpack in pygeppetto.eSubpackages:
-        rset.metamodel_registry[subpack.nsURI] = subpack
+@pytest.fixture
+def rset(rset):
+    """The resource set of conftest, reading the .xmi files with the pyecore
+    XMIResource.
+    """
+    rset.resource_factory['xmi'] = XMIResource
     return rset
 
 
@@ -103,3 +105,111 @@ def test_roundtrip_LargeXMI(tmpdir, rset):
     root = resource.contents[0]
     assert root
     assert root.name == 'largeTestModel'
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_streaming_loader_same_model(filename, load, model_signature):
+    resource = load(filename)
+    assert isinstance(resource, GeppettoXMIResource)
+    root = resource.contents[0]
+    assert isinstance(root, pygeppetto.GeppettoModel)
+
+    expected = load(filename, resource_factory=XMIResource).contents[0]
+    assert model_signature(root) == model_signature(expected)
+
+
+def test_streaming_loader_roundtrip(tmpdir, load):
+    resource = load()
+    root = resource.contents[0]
+    root.name = 'mediumTestModel'
+    f = tmpdir.mkdir('pyecore-tmp').join('medium.xmi')
+    resource.save(output=URI(str(f)))
+
+    resource = load(f)
+    assert resource.contents[0].name == 'mediumTestModel'
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_lazy_types_same_model(filename, load, model_signature):
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = load(filename, options)
+    root = resource.contents[0]
+    types = [t for lib in root.libraries for t in lib.types]
+    assert any(resource.is_deferred(t) for t in types)
+    assert all(t.name for t in types)
+
+    # opposites are only known once every type is materialized
+    resource.materialize()
+    assert not any(resource.is_deferred(t) for t in types)
+    expected = load(filename, resource_factory=XMIResource).contents[0]
+    assert model_signature(root) == model_signature(expected)
+
+
+def test_lazy_types_materialize_on_access(load):
+    options = {GeppettoXMIOptions.LAZY_TYPES: True}
+    resource = load('BigCA1.net.nml.xmi', options)
+    root = resource.contents[0]
+    morphology = root.libraries[0].types[5]
+    assert resource.is_deferred(morphology)
+    assert morphology.variables
+    assert not resource.is_deferred(morphology)
+    assert resource.is_deferred(root.libraries[0].types[0])
+
+
+def test_lazy_types_source_changed(tmpdir, load):
+    f = tmpdir.join('medium.xmi')
+    f.write_binary(open('tests/xmi-data/MediumNet.net.nml.xmi', 'rb').read())
+    resource = load(f, {GeppettoXMIOptions.LAZY_TYPES: True})
+    cell = resource.contents[0].libraries[0].types[0]
+    assert resource.is_deferred(cell)
+    f.write(b'\n', mode='ab')  # the offsets of the types are kept
+    for _ in range(2):
+        with pytest.raises(IOError):
+            cell.variables
+        assert resource.is_deferred(cell)
+    resource._source_stat = resource._stat_source()
+    assert cell.variables and not resource.is_deferred(cell)
+
+
+def test_lazy_types_roundtrip(tmpdir, load, model_signature):
+    resource = load(options={GeppettoXMIOptions.LAZY_TYPES: True})
+    root = resource.contents[0]
+    f = tmpdir.mkdir('pyecore-tmp').join('medium.xmi')
+    resource.save(output=URI(str(f)))
+
+    expected = load(f, resource_factory=XMIResource).contents[0]
+    assert model_signature(root) == model_signature(expected)
+    assert not resource.is_deferred(root.libraries[0].types[0])
+
+
+@pytest.mark.parametrize('filename', ['MediumNet.net.nml.xmi',
+                                      'BigCA1.net.nml.xmi'])
+def test_streaming_writer_same_output(tmpdir, filename, load):
+    expected = tmpdir.join('expected.xmi')
+    load(filename, resource_factory=XMIResource) \
+        .save(output=URI(str(expected)))
+
+    resource = load(filename)
+    f = tmpdir.join('streamed.xmi')
+    resource.save(output=URI(str(f)))
+    assert f.read_binary() == expected.read_binary()
+
+
+def test_streaming_writer_escaping(tmpdir, rset):
+    def save(resource_factory, filename):
+        rset.resource_factory['xmi'] = resource_factory
+        resource = rset.create_resource(URI(str(tmpdir.join(filename))))
+        results = pygeppetto.QueryResults()
+        results.id = 'a "b" & <c>\t\r\né'
+        results.header.extend(['x y', 'z&<>"\r\t', '', 'w'])
+        result = pygeppetto.datasources.SerializableQueryResult()
+        result.values.extend(['1', '2'])
+        results.results.append(result)
+        resource.append(results)
+        resource.save()
+        return tmpdir.join(filename).read_binary()
+
+    assert save(GeppettoXMIResource, 'streamed.xmi') == \
+        save(XMIResource, 'expected.xmi')